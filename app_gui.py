@@ -1,32 +1,27 @@
 import cv2
 import numpy as np
 import tkinter as tk
-from tkinter import filedialog, messagebox, LabelFrame
+from tkinter import filedialog, messagebox, LabelFrame, ttk
 from PIL import Image, ImageTk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
 
-def adjust_lightness(img_lab, gamma=1.0):
-    l_channel, a_channel, b_channel = cv2.split(img_lab)
-    inv_gamma = 1.0 / gamma
-    table = np.array([((i / 255.0) ** inv_gamma) * 255 for i in np.arange(0, 256)]).astype("uint8")
-    l_channel_adjusted = cv2.LUT(l_channel, table)
-    img_lab_adjusted = cv2.merge((l_channel_adjusted, a_channel, b_channel))
-    return img_lab_adjusted
+from gui_worker import BackgroundAnalyzer
+from image_loader import decode_image, read_image_bytes
+from pipeline_cielab import adjust_lightness, classify_maturity, color_masks
+from result_figure import ResultFigure
 
-def process_image():
-    global img_path, img_gamma, status_kematangan, maturity_persentase
-    
-    if not img_path:
-        messagebox.showerror("Error", "Harap masukkan citra terlebih dahulu.")
-        return
-    
-    img = cv2.imread(img_path)
-    img = cv2.resize(img, (300, 300))
-    
+img_path = None
+img_data = None  # isi file mentah (key cache)
+img_loaded = None  # hasil decode sekali, dipakai preview dan analisis
+
+# Figure hasil dibuat sekali dan dipakai ulang untuk setiap analisis (diperbarui di tempat)
+figure_renderer = ResultFigure(("Gambar Asli", "Gamma Correction", "Masking Merah", "Deteksi Tepi", "Masking Bersih", "Kontur"))
+figure_tk = None
+
+# Fungsi analisis citra (dijalankan di thread latar belakang, tanpa akses widget Tk)
+def analyze_image(img):
     # Konversi ke LAB
     img_lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-    l_channel, a_channel, b_channel = cv2.split(img_lab)
+    l_channel = img_lab[:, :, 0]
     
     # Rata-rata intensitas kanal L
     mean_intensity = np.mean(l_channel)
@@ -38,9 +33,7 @@ def process_image():
     img_gamma = cv2.cvtColor(img_lab_adjusted, cv2.COLOR_LAB2BGR)
     
     # Masking merah dan kuning
-    mask_red = cv2.inRange(a_channel, 140, 210)
-    mask_yellow = cv2.inRange(b_channel, 165, 200)
-    combined_mask = cv2.bitwise_or(mask_red, mask_yellow)
+    mask_red, mask_yellow, combined_mask = color_masks(img)
     kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (11, 11))
     cleaned_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel)
     
@@ -59,62 +52,73 @@ def process_image():
         maturity_persentase = 0.0
     
     # Klasifikasi kematangan
-    if maturity_persentase >= 80:
-        status_kematangan = "Matang"
-    elif 20 < maturity_persentase < 80:
-        status_kematangan = "Setengah Matang"
-    else:
-        status_kematangan = "Mentah"
-    
-    # Tampilkan hasil
-    display_results(img, img_gamma, mask_red, edges, cleaned_mask, contours)
-
-def display_results(img, img_gamma, mask_red, edges, cleaned_mask, contours):
-    for widget in frame_results.winfo_children():
-        widget.destroy()
-    
-    # Buat figure matplotlib
-    fig, ax = plt.subplots(2, 3, figsize=(12, 8))
-    ax[0, 0].imshow(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-    ax[0, 0].set_title("Gambar Asli")
-    ax[0, 0].axis("off")
-    
-    ax[0, 1].imshow(cv2.cvtColor(img_gamma, cv2.COLOR_BGR2RGB))
-    ax[0, 1].set_title("Gamma Correction")
-    ax[0, 1].axis("off")
-    
-    ax[0, 2].imshow(mask_red, cmap="gray")
-    ax[0, 2].set_title("Masking Merah")
-    ax[0, 2].axis("off")
-    
-    ax[1, 0].imshow(edges, cmap="gray")
-    ax[1, 0].set_title("Deteksi Tepi")
-    ax[1, 0].axis("off")
+    status_kematangan = classify_maturity(maturity_persentase, matang_cutoff=80)
     
-    ax[1, 1].imshow(cleaned_mask, cmap="gray")
-    ax[1, 1].set_title("Masking Bersih")
-    ax[1, 1].axis("off")
-    
-    img_with_contours = cv2.cvtColor(img.copy(), cv2.COLOR_BGR2RGB)
+    # Render figure hasil (juga di thread latar belakang)
+    img_with_contours = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
     cv2.drawContours(img_with_contours, contours, -1, (0, 255, 0), 2)
-    ax[1, 2].imshow(img_with_contours)
-    ax[1, 2].set_title("Kontur")
-    ax[1, 2].axis("off")
+    images = (cv2.cvtColor(img, cv2.COLOR_BGR2RGB), cv2.cvtColor(img_gamma, cv2.COLOR_BGR2RGB), mask_red, edges, cleaned_mask, img_with_contours)
+    figure = figure_renderer.render(images, f"Kematangan: {status_kematangan} ({maturity_persentase:.2f}%)")
+    
+    return {
+        "img_gamma": img_gamma,
+        "status_kematangan": status_kematangan,
+        "maturity_persentase": maturity_persentase,
+        "figure": figure,
+    }
+
+def process_image():
+    if not img_path:
+        messagebox.showerror("Error", "Harap masukkan citra terlebih dahulu.")
+        return
     
-    plt.suptitle(f"Kematangan: {status_kematangan} ({maturity_persentase:.2f}%)", fontsize=16)
-    plt.tight_layout()
+    # Analisis berjalan di latar belakang; klik berikutnya menggantikan analisis sebelumnya
+    analyzer.submit(analyze_image, img_loaded)
+
+def on_analysis_done(result):
+    global img_gamma, status_kematangan, maturity_persentase
+    img_gamma = result["img_gamma"]
+    status_kematangan = result["status_kematangan"]
+    maturity_persentase = result["maturity_persentase"]
     
-    # Tampilkan hasil di tkinter
-    canvas = FigureCanvasTkAgg(fig, master=frame_results)
-    canvas.get_tk_widget().pack()
-    canvas.draw()
+    # Tampilkan hasil
+    display_results(result["figure"])
+
+def on_analysis_error(error):
+    messagebox.showerror("Error", str(error))
+
+def set_busy(busy):
+    if busy:
+        lbl_status.config(text="Memproses...")
+        progress.start(10)
+    else:
+        lbl_status.config(text="")
+        progress.stop()
+
+def display_results(figure):
+    global figure_tk
+    # Tempel ke PhotoImage yang sama; buat baru hanya jika ukurannya berubah
+    height, width = figure.shape[:2]
+    if figure_tk is None or (figure_tk.width(), figure_tk.height()) != (width, height):
+        figure_tk = ImageTk.PhotoImage(Image.fromarray(figure))
+        lbl_results.config(image=figure_tk)
+    else:
+        figure_tk.paste(Image.fromarray(figure))
 
 def open_image():
-    global img_path, img_tk
+    global img_path, img_tk, img_data, img_loaded
     img_path = filedialog.askopenfilename(filetypes=[("Image Files", "*.jpg *.png *.jpeg")])
     if img_path:
-        img = Image.open(img_path).resize((300, 300))
-        img_tk = ImageTk.PhotoImage(img)
+        # Citra baru menggantikan analisis yang masih berjalan
+        analyzer.cancel()
+        # Decode sekali (decode JPEG tereduksi); preview dan analisis memakai buffer yang sama
+        img_data = read_image_bytes(img_path)
+        img_loaded = decode_image(img_data, (300, 300))
+        if img_loaded is None:
+            img_path = None
+            messagebox.showerror("Error", "Citra tidak dapat dibaca.")
+            return
+        img_tk = ImageTk.PhotoImage(Image.fromarray(cv2.cvtColor(img_loaded, cv2.COLOR_BGR2RGB)))
         lbl_img.config(image=img_tk)
         lbl_img.image = img_tk
     else:
@@ -138,9 +142,21 @@ btn_load.pack(pady=10)
 btn_process = tk.Button(frame_input, text="Proses Citra", command=process_image, width=20, height=2)
 btn_process.pack(pady=10)
 
+# Indikator proses
+progress = ttk.Progressbar(frame_input, mode="indeterminate", length=150)
+progress.pack(pady=5)
+lbl_status = tk.Label(frame_input, text="")
+lbl_status.pack()
+
 # Frame untuk hasil analisis
 frame_results = LabelFrame(root, text="Hasil Analisis", padx=10, pady=10)
 frame_results.pack(side=tk.RIGHT, padx=20, pady=20, fill=tk.BOTH, expand=True)
 
+lbl_results = tk.Label(frame_results)
+lbl_results.pack()
+
+# Worker analisis di latar belakang
+analyzer = BackgroundAnalyzer(root, on_analysis_done, on_error=on_analysis_error, on_busy=set_busy)
+
 # Mainloop
 root.mainloop()
\ No newline at end of file
@@ -1,57 +1,57 @@
 import cv2
-import numpy as np
 import tkinter as tk
-from tkinter import filedialog, messagebox, LabelFrame
+from tkinter import filedialog, messagebox, LabelFrame, ttk
 from PIL import Image, ImageTk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-
-def adjust_lightness(img_lab, gamma=1.0):
-    l_channel, a_channel, b_channel = cv2.split(img_lab)
-    inv_gamma = 1.0 / gamma
-    table = np.array([((i / 255.0) ** inv_gamma) * 255 for i in np.arange(0, 256)]).astype("uint8")
-    l_channel_adjusted = cv2.LUT(l_channel, table)
-    img_lab_adjusted = cv2.merge((l_channel_adjusted, a_channel, b_channel))
-    return img_lab_adjusted
-
-def draw_bounding_box(img, contours):
-    if not contours:
-        return img, None
-    x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
-    img_with_box = img.copy()
-    cv2.rectangle(img_with_box, (x, y), (x + w, y + h), (255, 0, 0), 2)
-    return img_with_box, (x, y, w, h)
-
-def calculate_yolo_format(img_shape, bbox):
-    if not bbox:
-        return None
-    img_h, img_w = img_shape[:2]
-    x, y, w, h = bbox
-    
-    # Hitung nilai YOLO format
-    x_center = (x + w / 2) / img_w
-    y_center = (y + h / 2) / img_h
-    width = w / img_w
-    height = h / img_h
-    
-    return f"1 {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}"
 
-def process_image():
-    global img_path, img_gamma, status_kematangan, maturity_persentase, img_with_box, yolo_label
-    
-    if not img_path:
-        messagebox.showerror("Error", "Harap masukkan citra terlebih dahulu.")
-        return
-    
-    img = cv2.imread(img_path)
-    img = cv2.resize(img, (300, 300))
+from gui_worker import BackgroundAnalyzer
+from image_loader import decode_image, read_image_bytes
+from morphology import close_mask
+from pipeline_cielab import YOLO_CLASS, adjust_lightness, calculate_yolo_format, classify_maturity, color_masks, draw_bounding_box
+from result_cache import CACHE_FOLDER, ResultCache
+from result_figure import ResultFigure
+
+img_path = None
+img_data = None  # isi file mentah (key cache)
+img_loaded = None  # hasil decode sekali, dipakai preview dan analisis
+
+# Figure hasil dibuat sekali dan dipakai ulang untuk setiap analisis (diperbarui di tempat)
+figure_renderer = ResultFigure(("Gambar Asli", "Gamma Correction", "Masking Merah", "Deteksi Tepi", "Garis Tepi + Morfologi", "Kontur"))
+figure_tk = None
+
+# Parameter pipeline yang mempengaruhi hasil analisis (bagian dari key cache)
+PIPELINE_PARAMS = {
+    "pipeline": "app_gui3",
+    "size": (300, 300),
+    "decode": "reduced",
+    "gamma": 1.0,
+    "red_range": (140, 210),
+    "yellow_range": (165, 200),
+    "kernel": 11,
+    "morphology": "exact",
+    "canny": (50, 150),
+    "matang_cutoff": 80,
+    "mentah_cutoff": 20,
+}
+
+# Cache hasil analisis (LRU di memori + penyimpanan di disk)
+result_cache = ResultCache(PIPELINE_PARAMS, disk_folder=CACHE_FOLDER)
+
+# Fungsi analisis citra (dijalankan di thread latar belakang, tanpa akses widget Tk)
+def analyze_image(img, data):
+    # Pakai hasil dari cache jika citra yang sama sudah pernah dianalisis
+    cache_key = result_cache.key_for_bytes(data)
+    cached = result_cache.get(cache_key, with_masks=True)
+    if cached is not None:
+        masks = cached["masks"]
+        contours, _ = cv2.findContours(masks["cleaned_mask"], cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        result = dict(cached, **masks)
+        result["figure"] = render_panels(masks["img"], masks["img_gamma"], masks["mask_red"], masks["edges"], masks["cleaned_mask"], contours, cached["status_kematangan"], cached["maturity_persentase"])
+        return result
     
     # Konversi ke LAB
     img_lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-    l_channel, a_channel, b_channel = cv2.split(img_lab)
     
-    # Rata-rata intensitas kanal L
-    mean_intensity = np.mean(l_channel)
+    # Gamma target (dibatasi 0.7 - 1)
     target_intensity = 168  # intensitas target
     gamma_suggested = max(0.7, min(1, target_intensity))
     
@@ -60,11 +60,8 @@ def process_image():
     img_gamma = cv2.cvtColor(img_lab_adjusted, cv2.COLOR_LAB2BGR)
     
     # Masking merah dan kuning
-    mask_red = cv2.inRange(a_channel, 140, 210)
-    mask_yellow = cv2.inRange(b_channel, 165, 200)
-    combined_mask = cv2.bitwise_or(mask_red, mask_yellow)
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (11, 11))
-    cleaned_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel)
+    mask_red, mask_yellow, combined_mask = color_masks(img)
+    cleaned_mask = close_mask(combined_mask, PIPELINE_PARAMS["kernel"], PIPELINE_PARAMS["morphology"])
     
     # Deteksi tepi
     gray = cv2.cvtColor(img_gamma, cv2.COLOR_BGR2GRAY)
@@ -81,60 +78,75 @@ def process_image():
         maturity_persentase = 0.0
     
     # Klasifikasi kematangan
-    if maturity_persentase >= 80:
-        status_kematangan = "Matang"
-    elif 20 < maturity_persentase < 80:
-        status_kematangan = "Setengah Matang"
-    else:
-        status_kematangan = "Mentah"
+    status_kematangan = classify_maturity(maturity_persentase, matang_cutoff=80)
     
     # Gambar bounding box dan hitung YOLO format
     img_with_box, bbox = draw_bounding_box(img, contours)
     yolo_label = calculate_yolo_format(img.shape, bbox)
     
-    # Tampilkan hasil
-    display_results(img, img_gamma, mask_red, edges, cleaned_mask, contours, img_with_box)
+    # Simpan hasil beserta citra perantara yang ditampilkan di GUI
+    masks = {"img": img, "img_gamma": img_gamma, "mask_red": mask_red, "edges": edges, "cleaned_mask": cleaned_mask, "img_with_box": img_with_box}
+    result = result_cache.put(
+        cache_key,
+        {"maturity_persentase": maturity_persentase, "status_kematangan": status_kematangan, "bbox": bbox, "yolo_label": yolo_label},
+        masks=masks,
+    )
+    result = dict(result, **masks)
+    result["figure"] = render_panels(img, img_gamma, mask_red, edges, cleaned_mask, contours, status_kematangan, maturity_persentase)
+    return result
 
+# Render figure 6 panel hasil analisis menjadi citra RGB
+def render_panels(img, img_gamma, mask_red, edges, cleaned_mask, contours, status_kematangan, maturity_persentase):
+    img_with_contours = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    cv2.drawContours(img_with_contours, contours, -1, (0, 255, 0), 2)
+    images = (cv2.cvtColor(img, cv2.COLOR_BGR2RGB), cv2.cvtColor(img_gamma, cv2.COLOR_BGR2RGB), mask_red, edges, cleaned_mask, img_with_contours)
+    return figure_renderer.render(images, f"Kematangan: {status_kematangan} ({maturity_persentase:.2f}%)")
 
-def display_results(img, img_gamma, mask_red, edges, cleaned_mask, contours, img_with_box):
-    for widget in frame_results.winfo_children():
-        widget.destroy()
-    
-    # Buat figure matplotlib
-    fig, ax = plt.subplots(2, 3, figsize=(12, 8))
-    ax[0, 0].imshow(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-    ax[0, 0].set_title("Gambar Asli")
-    ax[0, 0].axis("off")
-    
-    ax[0, 1].imshow(cv2.cvtColor(img_gamma, cv2.COLOR_BGR2RGB))
-    ax[0, 1].set_title("Gamma Correction")
-    ax[0, 1].axis("off")
-    
-    ax[0, 2].imshow(mask_red, cmap="gray")
-    ax[0, 2].set_title("Masking Merah")
-    ax[0, 2].axis("off")
-    
-    ax[1, 0].imshow(edges, cmap="gray")
-    ax[1, 0].set_title("Deteksi Tepi")
-    ax[1, 0].axis("off")
-    
-    ax[1, 1].imshow(cleaned_mask, cmap="gray")
-    ax[1, 1].set_title("Garis Tepi + Morfologi")
-    ax[1, 1].axis("off")
+def process_image():
+    if not img_path:
+        messagebox.showerror("Error", "Harap masukkan citra terlebih dahulu.")
+        return
     
-    img_with_contours = cv2.cvtColor(img.copy(), cv2.COLOR_BGR2RGB)
-    cv2.drawContours(img_with_contours, contours, -1, (0, 255, 0), 2)
-    ax[1, 2].imshow(img_with_contours)
-    ax[1, 2].set_title("Kontur")
-    ax[1, 2].axis("off")
+    # Analisis berjalan di latar belakang; klik berikutnya menggantikan analisis sebelumnya
+    analyzer.submit(analyze_image, img_loaded, img_data)
+
+def on_analysis_done(result):
+    global img_gamma, status_kematangan, maturity_persentase, img_with_box, yolo_label
+    img_gamma = result["img_gamma"]
+    status_kematangan = result["status_kematangan"]
+    maturity_persentase = result["maturity_persentase"]
+    img_with_box = result["img_with_box"]
+    yolo_label = result["yolo_label"]
     
-    plt.suptitle(f"Kematangan: {status_kematangan} ({maturity_persentase:.2f}%)", fontsize=16)
-    plt.tight_layout()
+    update_cache_info()
     
-    # Tampilkan hasil di tkinter
-    canvas = FigureCanvasTkAgg(fig, master=frame_results)
-    canvas.get_tk_widget().pack(pady=10, padx=10, expand=True)
-    canvas.draw()
+    # Tampilkan hasil
+    display_results(result["figure"], img_with_box)
+
+def on_analysis_error(error):
+    messagebox.showerror("Error", str(error))
+
+def set_busy(busy):
+    if busy:
+        lbl_status.config(text="Memproses...")
+        progress.start(10)
+    else:
+        lbl_status.config(text="")
+        progress.stop()
+
+def update_cache_info():
+    stats = result_cache.stats()
+    lbl_cache.config(text=f"Cache: {stats['hits_memory'] + stats['hits_disk']} hit / {stats['misses']} miss")
+
+def display_results(figure, img_with_box):
+    global figure_tk
+    # Tempel ke PhotoImage yang sama; buat baru hanya jika ukurannya berubah
+    height, width = figure.shape[:2]
+    if figure_tk is None or (figure_tk.width(), figure_tk.height()) != (width, height):
+        figure_tk = ImageTk.PhotoImage(Image.fromarray(figure))
+        lbl_results.config(image=figure_tk)
+    else:
+        figure_tk.paste(Image.fromarray(figure))
     
     # Tampilkan gambar dengan bounding box di frame baru
     display_bounding_box(img_with_box)
@@ -156,28 +168,32 @@ def display_bounding_box(img_with_box):
         widget.destroy() 
     
     # Tentukan nilai YOLO berdasarkan status kematangan
-    if status_kematangan == "Matang":
-        initial_yolo_value = "1"
-    elif status_kematangan == "Mentah":
-        initial_yolo_value = "0"
-    elif status_kematangan == "Setengah Matang":
-        initial_yolo_value = "2"
-    else:
-        initial_yolo_value = "Unknown"
+    initial_yolo_value = YOLO_CLASS.get(status_kematangan, "Unknown")
     
-    # Format label YOLO dengan status kematangan
-    yolo_label_with_status = f"{initial_yolo_value} {yolo_label[2:]}"  # Ganti nilai pertama dengan status kematangan
+    # Format label YOLO dengan status kematangan (tanpa kontur tidak ada label)
+    if yolo_label:
+        yolo_label_with_status = f"{initial_yolo_value} {yolo_label[2:]}"  # Ganti nilai pertama dengan status kematangan
+    else:
+        yolo_label_with_status = "(tidak ada buah terdeteksi)"
     
     lbl_yolo = tk.Label(frame_bounding_box_info, text=f"YOLO Format Label:\n{yolo_label_with_status}", font=("Arial", 12), padx=10)
     lbl_yolo.pack()
 
 
 def open_image():
-    global img_path, img_tk
+    global img_path, img_tk, img_data, img_loaded
     img_path = filedialog.askopenfilename(filetypes=[("Image Files", "*.jpg *.png *.jpeg")])
     if img_path:
-        img = Image.open(img_path).resize((300, 300))
-        img_tk = ImageTk.PhotoImage(img)
+        # Citra baru menggantikan analisis yang masih berjalan
+        analyzer.cancel()
+        # Decode sekali (decode JPEG tereduksi); preview dan analisis memakai buffer yang sama
+        img_data = read_image_bytes(img_path)
+        img_loaded = decode_image(img_data, (300, 300))
+        if img_loaded is None:
+            img_path = None
+            messagebox.showerror("Error", "Citra tidak dapat dibaca.")
+            return
+        img_tk = ImageTk.PhotoImage(Image.fromarray(cv2.cvtColor(img_loaded, cv2.COLOR_BGR2RGB)))
         lbl_img.config(image=img_tk)
         lbl_img.image = img_tk
     else:
@@ -214,10 +230,23 @@ btn_load.pack(pady=10)
 btn_process = tk.Button(frame_input, text="Proses Citra", command=process_image, width=20, height=2)
 btn_process.pack(pady=10)
 
+# Penghitung hit/miss cache
+lbl_cache = tk.Label(frame_input, text="Cache: 0 hit / 0 miss")
+lbl_cache.pack(pady=5)
+
+# Indikator proses analisis di latar belakang
+progress = ttk.Progressbar(frame_input, mode="indeterminate", length=200)
+progress.pack(pady=5)
+lbl_status = tk.Label(frame_input, text="")
+lbl_status.pack()
+
 # Frame untuk Hasil Analisis
 frame_results = LabelFrame(scrollable_frame, text="Hasil Analisis", padx=10, pady=10)
 frame_results.pack(pady=10, fill=tk.BOTH, expand=True, side=tk.TOP, anchor='n')
 
+lbl_results = tk.Label(frame_results)
+lbl_results.pack(pady=10, padx=10, expand=True)
+
 # Frame untuk Bounding Box
 frame_bounding_box = LabelFrame(scrollable_frame, text="Bounding Box", padx=10, pady=10)
 frame_bounding_box.pack(pady=10, fill=tk.BOTH, expand=True, side=tk.TOP, anchor='n')
@@ -227,6 +256,9 @@ frame_bounding_box_info = LabelFrame(scrollable_frame, text="YOLO Format Label",
 frame_bounding_box_info.pack(pady=10, side=tk.TOP, anchor='n')
 
 
+# Worker analisis latar belakang; hasil dikirim kembali ke main loop Tk
+analyzer = BackgroundAnalyzer(root, on_analysis_done, on_error=on_analysis_error, on_busy=set_busy)
+
 canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
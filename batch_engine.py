@@ -0,0 +1,87 @@
+import math
+import os
+import sys
+import time
+
+import cv2
+
+# Ekstensi citra yang diproses oleh semua skrip batch
+IMAGE_EXTENSIONS = (".jpg", ".png", ".jpeg")
+
+
+# Fungsi untuk mengumpulkan path citra di dalam folder (urutan nama file)
+def list_images(folder):
+    paths = []
+    for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+        if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            paths.append(entry.path)
+    return paths
+
+
+# Inisialisasi worker: OpenCV tidak boleh ikut memecah thread di setiap proses,
+# kalau tidak N proses x N thread saling berebut core dan skalanya tidak linear
+def _init_worker():
+    cv2.setNumThreads(1)
+
+
+# Menentukan ukuran chunk agar tiap worker mendapat beberapa chunk (load balancing)
+def default_chunksize(total, workers):
+    if total == 0:
+        return 1
+    return max(1, min(64, math.ceil(total / (workers * 8))))
+
+
+# Reporter progres tunggal: hanya proses utama yang mencetak ke layar
+class ProgressReporter:
+    def __init__(self, total, stream=None, interval=1.0):
+        self.total = total
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self.done = 0
+        self.start = time.perf_counter()
+        self._last = 0.0
+
+    def update(self, result):
+        self.done += 1
+        now = time.perf_counter()
+        if now - self._last >= self.interval or self.done == self.total:
+            self._last = now
+            elapsed = now - self.start
+            rate = self.done / elapsed if elapsed > 0 else 0.0
+            print(f"\r[{self.done}/{self.total}] {rate:.1f} citra/detik", end="", file=self.stream, flush=True)
+
+    def finish(self):
+        if self.total:
+            print(file=self.stream)
+        return time.perf_counter() - self.start
+
+
+# Menjalankan fungsi worker untuk semua item menggunakan process pool.
+# Hasil dikembalikan sesuai urutan input (imap menjaga urutan).
+def run_batch(worker, items, workers=None, chunksize=None, reporter=None):
+    return list(iter_batch(worker, items, workers=workers, chunksize=chunksize, reporter=reporter))
+
+
+# Seperti run_batch, tetapi hasil di-yield satu per satu sesuai urutan input,
+# sehingga hasil besar (misalnya citra terdecode) tidak perlu ditampung semua
+def iter_batch(worker, items, workers=None, chunksize=None, reporter=None):
+    items = list(items)
+    workers = workers or os.cpu_count() or 1
+    chunksize = chunksize or default_chunksize(len(items), workers)
+
+    if workers == 1:
+        for item in items:
+            result = worker(item)
+            if reporter is not None:
+                reporter.update(result)
+            yield result
+        return
+
+    # multiprocessing baru diimpor jika benar-benar memakai process pool
+    from multiprocessing import Pool
+
+    with Pool(processes=workers, initializer=_init_worker) as pool:
+        for result in pool.imap(worker, items, chunksize=chunksize):
+            if reporter is not None:
+                reporter.update(result)
+            yield result
@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from image_loader import decode_image
+from pipeline_cielab import adjust_lightness, calculate_yolo_format, color_mask_table, color_masks
+
+try:
+    import resource
+except ImportError:  # Windows: puncak RSS lewat psutil jika terpasang
+    resource = None
+
+# Konfigurasi default benchmark: resolusi (lebar, tinggi) dan jumlah buah per scene
+RESOLUTIONS = ((640, 480), (1280, 960), (4000, 3000))
+FRUIT_COUNTS = (1, 5, 20)
+REPEATS = 20
+PERCENTILES = (50, 90, 99)
+
+# Urutan stage pipeline yang diukur
+STAGES = (
+    "decode",
+    "resize",
+    "decode_reduced",
+    "bgr2lab",
+    "gamma_lut",
+    "inrange",
+    "color_table",
+    "morph_close",
+    "canny",
+    "contours_area",
+    "label_write",
+)
+
+# Stage alternatif (implementasi lain dari stage di atas), tidak dijumlahkan ke total
+ALTERNATIVE_STAGES = ("decode_reduced", "color_table")
+
+
+# Fungsi untuk membuat scene strawberry sintetis: latar daun, buah elips
+# merah/kuning/hijau dengan noise, disimpan sebagai JPEG
+def make_scene(width, height, n_fruits, seed=0):
+    rng = np.random.default_rng(seed)
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[:] = (70, 110, 60)
+    noise = rng.integers(0, 30, size=(height, width), dtype=np.uint8)
+    cv2.add(img, cv2.merge((noise, noise, noise)), dst=img)
+
+    scale = min(width, height)
+    colors = ((40, 40, 210), (50, 70, 200), (60, 190, 220), (70, 170, 90))
+    for _ in range(n_fruits):
+        axes = (int(scale * rng.uniform(0.03, 0.12)), int(scale * rng.uniform(0.04, 0.15)))
+        center = (int(rng.integers(axes[0], width - axes[0])), int(rng.integers(axes[1], height - axes[1])))
+        color = colors[rng.integers(0, len(colors))]
+        cv2.ellipse(img, center, axes, float(rng.uniform(0, 180)), 0, 360, color, -1)
+    return cv2.GaussianBlur(img, (5, 5), 0)
+
+
+# Menjalankan satu gambar melalui semua stage dan mencatat durasi per stage (detik)
+def run_stages(image_path, label_path, size=(300, 300)):
+    timings = {}
+    clock = time.perf_counter
+
+    t = clock()
+    img = cv2.imread(image_path)
+    timings["decode"] = clock() - t
+
+    t = clock()
+    img = cv2.resize(img, size)
+    timings["resize"] = clock() - t
+
+    # Alternatif decode + resize: decode JPEG tereduksi (image_loader), dari file
+    t = clock()
+    decode_image(np.fromfile(image_path, dtype=np.uint8), size)
+    timings["decode_reduced"] = clock() - t
+
+    t = clock()
+    img_lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+    timings["bgr2lab"] = clock() - t
+
+    t = clock()
+    adjust_lightness(img_lab.copy(), gamma=0.85)
+    timings["gamma_lut"] = clock() - t
+
+    t = clock()
+    mask_red = cv2.inRange(img_lab[:, :, 1], 140, 210)
+    mask_yellow = cv2.inRange(img_lab[:, :, 2], 165, 200)
+    combined_mask = cv2.bitwise_or(mask_red, mask_yellow)
+    timings["inrange"] = clock() - t
+
+    t = clock()
+    color_masks(img)
+    timings["color_table"] = clock() - t
+
+    t = clock()
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (11, 11))
+    cleaned_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel)
+    timings["morph_close"] = clock() - t
+
+    t = clock()
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    cv2.Canny(gray, 50, 150)
+    timings["canny"] = clock() - t
+
+    t = clock()
+    contours, _ = cv2.findContours(cleaned_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    sum(cv2.contourArea(cnt) for cnt in contours)
+    timings["contours_area"] = clock() - t
+
+    t = clock()
+    bbox = cv2.boundingRect(max(contours, key=cv2.contourArea)) if contours else None
+    with open(label_path, "w") as file:
+        file.write(calculate_yolo_format(img.shape, bbox) or "")
+    timings["label_write"] = clock() - t
+
+    return timings
+
+
+def summarize(samples):
+    samples = np.asarray(samples) * 1000.0
+    summary = {f"p{p}": float(np.percentile(samples, p)) for p in PERCENTILES}
+    summary["mean"] = float(samples.mean())
+    return summary
+
+
+# Benchmark satu kasus (satu file gambar), diulang beberapa kali
+def bench_case(name, image_path, workdir, repeats, size):
+    label_path = os.path.join(workdir, f"{name}.txt")
+    color_mask_table()  # stage color_table mengukur lookup tabel, bukan jalur cvtColor awal
+    run_stages(image_path, label_path, size)  # warm-up (tabel warna, cache file)
+
+    per_stage = {stage: [] for stage in STAGES}
+    totals = []
+    for _ in range(repeats):
+        timings = run_stages(image_path, label_path, size)
+        for stage, seconds in timings.items():
+            per_stage[stage].append(seconds)
+        totals.append(sum(seconds for stage, seconds in timings.items() if stage not in ALTERNATIVE_STAGES))
+
+    # Puncak memori diukur di run terpisah karena tracemalloc memperlambat timing
+    tracemalloc.start()
+    run_stages(image_path, label_path, size)
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    img = cv2.imread(image_path)
+    return {
+        "name": name,
+        "width": img.shape[1],
+        "height": img.shape[0],
+        "file_bytes": os.path.getsize(image_path),
+        "stages_ms": {stage: summarize(values) for stage, values in per_stage.items()},
+        "total_ms": summarize(totals),
+        "images_per_sec": repeats / sum(totals),
+        "peak_traced_bytes": peak_traced,
+    }
+
+
+def run_benchmark(resolutions=RESOLUTIONS, fruit_counts=FRUIT_COUNTS, repeats=REPEATS, size=(300, 300), extra_images=()):
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = []
+        for width, height in resolutions:
+            for n_fruits in fruit_counts:
+                name = f"synthetic_{width}x{height}_{n_fruits}buah"
+                path = os.path.join(workdir, f"{name}.jpg")
+                cv2.imwrite(path, make_scene(width, height, n_fruits, seed=n_fruits), [cv2.IMWRITE_JPEG_QUALITY, 90])
+                cases.append((name, path))
+        for path in extra_images:
+            if os.path.exists(path):
+                cases.append((os.path.splitext(os.path.basename(path))[0], path))
+
+        for name, path in cases:
+            result = bench_case(name, path, workdir, repeats, size)
+            results.append(result)
+            print(f"{name:<32} {result['total_ms']['p50']:8.2f} ms/gambar (p50)  {result['images_per_sec']:8.1f} gambar/detik")
+
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "opencv_threads": cv2.getNumThreads(),
+            "repeats": repeats,
+            "size": list(size),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        # Puncak RSS proses (kB), None jika tidak dapat diukur di platform ini
+        "peak_rss_kb": peak_rss_kb(),
+        "cases": results,
+    }
+
+
+# Puncak RSS proses dalam kB; None jika tidak ada sumber yang tersedia
+def peak_rss_kb():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS melaporkan byte, Linux kB
+        return peak // 1024 if sys.platform == "darwin" else peak
+    try:
+        import psutil
+    except ImportError:
+        return None
+    peak = getattr(psutil.Process().memory_info(), "peak_wset", None)
+    return peak // 1024 if peak is not None else None
+
+
+# Membandingkan hasil dengan baseline: rasio p50 (baru / baseline) per stage
+def compare_with_baseline(report, baseline):
+    baseline_cases = {case["name"]: case for case in baseline["cases"]}
+    print(f"\n{'kasus':<32} {'stage':<14} {'baseline':>10} {'sekarang':>10} {'rasio':>7}")
+    for case in report["cases"]:
+        base = baseline_cases.get(case["name"])
+        if base is None:
+            continue
+        for stage in STAGES + ("total",):
+            if stage == "total":
+                new_ms, old_ms = case["total_ms"]["p50"], base["total_ms"]["p50"]
+            elif stage in base["stages_ms"]:
+                new_ms, old_ms = case["stages_ms"][stage]["p50"], base["stages_ms"][stage]["p50"]
+            else:
+                continue
+            ratio = new_ms / old_ms if old_ms > 0 else float("inf")
+            print(f"{case['name']:<32} {stage:<14} {old_ms:10.3f} {new_ms:10.3f} {ratio:7.2f}")
+
+
+def print_report(report):
+    for case in report["cases"]:
+        print(f"\n----    {case['name']} ({case['width']}x{case['height']})    ----")
+        print(f"{'stage':<14} {'p50':>9} {'p90':>9} {'p99':>9}  (ms)")
+        for stage, summary in case["stages_ms"].items():
+            print(f"{stage:<14} {summary['p50']:9.3f} {summary['p90']:9.3f} {summary['p99']:9.3f}")
+        print(f"Puncak memori (tracemalloc): {case['peak_traced_bytes'] / 1024:.0f} kB")
+    if report["peak_rss_kb"] is not None:
+        print(f"\nPuncak RSS proses: {report['peak_rss_kb'] / 1024:.1f} MB")
+    else:
+        print("\nPuncak RSS proses: tidak tersedia (pasang psutil)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-stage pipeline kematangan CIELAB")
+    parser.add_argument("--output", default="benchmark_results.json", help="File JSON hasil benchmark")
+    parser.add_argument("--baseline", default=None, help="File JSON benchmark sebelumnya untuk dibandingkan")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--quick", action="store_true", help="Hanya resolusi dan jumlah buah terkecil")
+    parser.add_argument("--images", nargs="*", default=[os.path.join(os.path.dirname(os.path.abspath(__file__)), "straw3.jpg")],
+                        help="Gambar nyata tambahan (default: straw3.jpg)")
+    args = parser.parse_args()
+
+    if args.quick:
+        report = run_benchmark(RESOLUTIONS[:1], FRUIT_COUNTS[:1], args.repeats, extra_images=args.images)
+    else:
+        report = run_benchmark(repeats=args.repeats, extra_images=args.images)
+    print_report(report)
+
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nHasil disimpan di {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            compare_with_baseline(report, json.load(file))
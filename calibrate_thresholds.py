@@ -0,0 +1,347 @@
+import argparse
+import csv
+import itertools
+import os
+from functools import partial
+
+import cv2
+import numpy as np
+
+from batch_engine import list_images, run_batch
+from image_pack import is_pack, list_sources, load_source, source_path, source_stat
+from pipeline_cielab import (
+    MATURITY_CLASSES,
+    RED_RANGE,
+    YELLOW_RANGE,
+    YOLO_CLASS,
+    classify_maturity_array,
+    color_masks,
+)
+import proses_dataset_cielab
+
+# Kalibrasi rentang a*/b* dan cutoff kematangan terhadap folder berlabel
+# (<folder>/Matang, <folder>/Setengah Matang, <folder>/Mentah).
+#
+# Statistik per gambar dihitung sekali dan di-cache: histogram joint (a*, b*)
+# seluruh piksel dalam bentuk sparse (hanya bin yang terisi). Untuk satu set
+# kandidat, histogram dipadatkan ke bin yang batasnya tepat di nilai kandidat,
+# lalu dibuat prefix sum 2D; setiap kandidat cukup beberapa lookup per gambar.
+#
+# Persentase kematangan pada pencarian adalah pendekatan dari pipeline label:
+# merah / (merah OR kuning), yaitu luas sebelum morphology close dan kontur.
+# Gunakan --verify untuk menghitung akurasi konfigurasi terbaik dengan pipeline penuh.
+#
+# proses_dataset_cielab tidak memakai b* dan persentasenya adalah luas merah /
+# luas kontur Canny, sehingga tidak bisa dinilai dengan pendekatan histogram;
+# akurasinya hanya dilaporkan lewat --verify dengan classify_image miliknya.
+
+CALIBRATION_SIZE = (300, 300)
+CACHE_VERSION = 1
+
+# Kandidat default (nilai saat ini ada di dalam grid)
+A_LOW = (130, 135, 140, 145, 150)
+A_HIGH = (190, 200, 210, 220)
+B_LOW = (155, 160, 165, 170, 175)
+B_HIGH = (190, 200, 210)
+MATANG_CUTOFFS = (60, 65, 70, 75, 80, 85, 90)
+MENTAH_CUTOFFS = (10, 15, 20, 25, 30, 35)
+
+# Konfigurasi yang dipakai skrip saat ini, dilaporkan sebagai pembanding
+CURRENT_SETTINGS = {
+    "generate_label/gui": {"a_low": RED_RANGE[0], "a_high": RED_RANGE[1], "b_low": YELLOW_RANGE[0], "b_high": YELLOW_RANGE[1], "matang": 80, "mentah": 20},
+}
+PARAMETERS = ("a_low", "a_high", "b_low", "b_high", "matang", "mentah")
+
+
+# Fungsi untuk mengumpulkan gambar berlabel dari subfolder kelas. Pack hasil
+# image_pack.py --recursive dari folder berlabel juga diterima (nama Kelas/file).
+def list_labeled_images(folder):
+    if is_pack(folder):
+        return [
+            (item, int(YOLO_CLASS[item.name.split("/")[0]]))
+            for item in list_sources(folder)
+            if item.name.split("/")[0] in YOLO_CLASS
+        ]
+    items = []
+    for status in MATURITY_CLASSES:
+        class_folder = os.path.join(folder, status)
+        if os.path.isdir(class_folder):
+            items.extend((path, int(YOLO_CLASS[status])) for path in list_images(class_folder))
+    return items
+
+
+# Worker: histogram joint a*b* sparse untuk satu gambar
+# (indeks a*256+b uint16, jumlah piksel uint32). None jika gambar tidak terbaca.
+def image_statistics(path, size=CALIBRATION_SIZE):
+    img_lab = load_source(path, size, color="lab")
+    if img_lab is None:
+        return None
+    joint = cv2.calcHist([img_lab], [1, 2], None, [256, 256], [0, 256, 0, 256]).ravel()
+    index = np.flatnonzero(joint)
+    return index.astype(np.uint16), joint[index].astype(np.uint32)
+
+
+# Statistik semua gambar berlabel, memakai ulang cache untuk file yang tidak
+# berubah (path, ukuran, mtime sama). Cache berupa satu .npz kolumnar.
+def collect_statistics(folder, cache_path=None, workers=None, size=CALIBRATION_SIZE):
+    items = list_labeled_images(folder)
+    stats = [source_stat(path) for path, _ in items]
+
+    cached = {}
+    if cache_path and os.path.exists(cache_path):
+        with np.load(cache_path, allow_pickle=False) as data:
+            if int(data["version"]) == CACHE_VERSION and tuple(data["size"]) == tuple(size):
+                offsets = data["offsets"]
+                for i, path in enumerate(data["paths"]):
+                    cached[(str(path), int(data["file_size"][i]), int(data["mtime_ns"][i]))] = (
+                        data["index"][offsets[i]:offsets[i + 1]],
+                        data["counts"][offsets[i]:offsets[i + 1]],
+                    )
+
+    missing = [path for (path, _), stat in zip(items, stats) if (source_path(path), *stat) not in cached]
+    if missing:
+        print(f"Menghitung statistik {len(missing)} gambar ({len(items) - len(missing)} dari cache)...")
+        for path, result in zip(missing, run_batch(image_statistics, missing, workers=workers)):
+            cached[(source_path(path), *source_stat(path))] = result
+
+    paths, labels, indices, counts, file_stats = [], [], [], [], []
+    for (path, kelas), stat in zip(items, stats):
+        result = cached.get((source_path(path), *stat))
+        if result is None:
+            print(f"Error: Tidak dapat membaca gambar {path}")
+            continue
+        paths.append(path)
+        labels.append(kelas)
+        indices.append(result[0])
+        counts.append(result[1])
+        file_stats.append(stat)
+
+    data = CalibrationData(paths, np.array(labels, dtype=np.int8), indices, counts)
+    if cache_path and missing:
+        data.save(cache_path, file_stats, size)
+    return data
+
+
+class CalibrationData:
+    def __init__(self, paths, labels, indices, counts):
+        self.paths = paths
+        self.labels = labels
+        self.indices = indices
+        self.counts = counts
+
+    def save(self, cache_path, file_stats, size):
+        offsets = np.zeros(len(self.paths) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(index) for index in self.indices])
+        tmp_path = f"{cache_path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            version=np.int64(CACHE_VERSION),
+            size=np.array(size, dtype=np.int64),
+            paths=np.array([source_path(path) for path in self.paths], dtype=np.str_),
+            file_size=np.array([stat[0] for stat in file_stats], dtype=np.int64),
+            mtime_ns=np.array([stat[1] for stat in file_stats], dtype=np.int64),
+            offsets=offsets,
+            index=np.concatenate(self.indices) if self.indices else np.zeros(0, dtype=np.uint16),
+            counts=np.concatenate(self.counts) if self.counts else np.zeros(0, dtype=np.uint32),
+        )
+        os.replace(tmp_path, cache_path)
+
+    # Prefix sum 2D histogram per gambar pada bin dengan batas edges_a x edges_b.
+    # Hasil (N, len(edges_a), len(edges_b)): P[:, i, j] = jumlah piksel dengan
+    # a* < edges_a[i] dan b* < edges_b[j].
+    def prefix_sums(self, edges_a, edges_b):
+        edges_a = np.asarray(edges_a)
+        edges_b = np.asarray(edges_b)
+        bins_a, bins_b = len(edges_a) - 1, len(edges_b) - 1
+        # Peta nilai 0-255 ke nomor bin
+        bin_of_a = np.searchsorted(edges_a, np.arange(256), side="right") - 1
+        bin_of_b = np.searchsorted(edges_b, np.arange(256), side="right") - 1
+
+        lengths = np.fromiter((len(index) for index in self.indices), dtype=np.int64, count=len(self.indices))
+        index = np.concatenate(self.indices).astype(np.int64) if self.indices else np.zeros(0, dtype=np.int64)
+        counts = np.concatenate(self.counts).astype(np.float64) if self.counts else np.zeros(0)
+        image = np.repeat(np.arange(len(self.indices)), lengths)
+        flat = (image * bins_a + bin_of_a[index >> 8]) * bins_b + bin_of_b[index & 255]
+        binned = np.bincount(flat, weights=counts, minlength=len(self.indices) * bins_a * bins_b)
+        binned = binned.reshape(len(self.indices), bins_a, bins_b)
+
+        prefix = np.zeros((len(self.indices), bins_a + 1, bins_b + 1), dtype=np.float64)
+        prefix[:, 1:, 1:] = binned.cumsum(axis=1).cumsum(axis=2)
+        return prefix
+
+
+# Evaluator kandidat di atas prefix sum; semua operasi vektor per gambar
+class ThresholdEvaluator:
+    def __init__(self, data, a_values, b_values):
+        self.labels = data.labels
+        self.edges_a = sorted({0, 256} | set(a_values))
+        self.edges_b = sorted({0, 256} | set(b_values))
+        self._pos_a = {edge: i for i, edge in enumerate(self.edges_a)}
+        self._pos_b = {edge: i for i, edge in enumerate(self.edges_b)}
+        self.prefix = data.prefix_sums(self.edges_a, self.edges_b)
+        self.evaluations = 0
+
+    # Jumlah piksel dengan a* di [a0, a1) dan b* di [b0, b1) (batas harus edge)
+    def _region(self, a0, a1, b0, b1):
+        p = self.prefix
+        i0, i1, j0, j1 = self._pos_a[a0], self._pos_a[a1], self._pos_b[b0], self._pos_b[b1]
+        return p[:, i1, j1] - p[:, i0, j1] - p[:, i1, j0] + p[:, i0, j0]
+
+    # Persentase kematangan per gambar: merah / (merah OR kuning)
+    def maturity(self, a_low, a_high, b_low, b_high):
+        red = self._region(a_low, a_high + 1, 0, 256)
+        yellow = self._region(0, 256, b_low, b_high + 1)
+        both = self._region(a_low, a_high + 1, b_low, b_high + 1)
+        union = red + yellow - both
+        return np.divide(red * 100.0, union, out=np.zeros_like(red), where=union > 0)
+
+    def accuracy(self, maturity, matang, mentah):
+        self.evaluations += 1
+        predicted = classify_maturity_array(maturity, matang, mentah)
+        return float(np.mean(predicted == self.labels)) if len(self.labels) else 0.0
+
+    def evaluate(self, setting):
+        maturity = self.maturity(setting["a_low"], setting["a_high"], setting["b_low"], setting["b_high"])
+        return self.accuracy(maturity, setting["matang"], setting["mentah"])
+
+
+def _candidate_edges(candidates):
+    a_values = set(candidates["a_low"]) | {v + 1 for v in candidates["a_high"]}
+    b_values = set(candidates["b_low"]) | {v + 1 for v in candidates["b_high"]}
+    return a_values, b_values
+
+
+def _valid(setting):
+    return setting["a_low"] <= setting["a_high"] and setting["b_low"] <= setting["b_high"] and setting["mentah"] < setting["matang"]
+
+
+# Grid search: persentase kematangan dihitung sekali per kombinasi warna,
+# lalu semua pasangan cutoff dievaluasi di atasnya
+def grid_search(evaluator, candidates):
+    results = []
+    for a_low, a_high, b_low, b_high in itertools.product(candidates["a_low"], candidates["a_high"], candidates["b_low"], candidates["b_high"]):
+        if a_low > a_high or b_low > b_high:
+            continue
+        maturity = evaluator.maturity(a_low, a_high, b_low, b_high)
+        for matang, mentah in itertools.product(candidates["matang"], candidates["mentah"]):
+            if mentah >= matang:
+                continue
+            setting = {"a_low": a_low, "a_high": a_high, "b_low": b_low, "b_high": b_high, "matang": matang, "mentah": mentah}
+            results.append((evaluator.accuracy(maturity, matang, mentah), setting))
+    return results
+
+
+# Coordinate search: mulai dari konfigurasi awal, ganti satu parameter ke nilai
+# terbaiknya (yang lain tetap), ulangi sampai tidak ada perbaikan
+def coordinate_search(evaluator, candidates, start, max_rounds=10):
+    best = dict(start)
+    best_accuracy = evaluator.evaluate(best)
+    results = [(best_accuracy, dict(best))]
+    for _ in range(max_rounds):
+        improved = False
+        for name in PARAMETERS:
+            for value in candidates[name]:
+                setting = dict(best, **{name: value})
+                if setting == best or not _valid(setting):
+                    continue
+                accuracy = evaluator.evaluate(setting)
+                results.append((accuracy, setting))
+                if accuracy > best_accuracy:
+                    best, best_accuracy, improved = setting, accuracy, True
+        if not improved:
+            break
+    return results
+
+
+# Akurasi dengan pipeline penuh (mask -> morphology close -> kontur), sama
+# seperti generate_label mode satu objek. Memerlukan decode ulang semua gambar.
+def _pipeline_maturity(path, setting, size=CALIBRATION_SIZE):
+    img = load_source(path, size)
+    if img is None:
+        return 0.0
+    mask_red, _, combined_mask = color_masks(img, (setting["a_low"], setting["a_high"]), (setting["b_low"], setting["b_high"]))
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (11, 11))
+    cleaned_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel)
+    contours, _ = cv2.findContours(cleaned_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    total_area = sum(cv2.contourArea(cnt) for cnt in contours)
+    red_area = cv2.countNonZero(mask_red)
+    return (red_area / total_area) * 100 if total_area > 0 else 0.0
+
+
+def verify_setting(data, setting, workers=None):
+    maturity = np.array(run_batch(partial(_pipeline_maturity, setting=setting), data.paths, workers=workers))
+    predicted = classify_maturity_array(maturity, setting["matang"], setting["mentah"])
+    return float(np.mean(predicted == data.labels)) if len(data.labels) else 0.0
+
+
+# Status proses_dataset_cielab untuk satu gambar (pipeline aslinya, parameter tetap)
+def _proses_dataset_class(path):
+    img = load_source(path, proses_dataset_cielab.PIPELINE_PARAMS["size"])
+    if img is None:
+        return -1
+    status = proses_dataset_cielab.classify_image(img, source_path(path))["status_kematangan"]
+    return int(YOLO_CLASS[status])
+
+
+def verify_proses_dataset(data, workers=None):
+    predicted = np.array(run_batch(_proses_dataset_class, data.paths, workers=workers))
+    return float(np.mean(predicted == data.labels)) if len(data.labels) else 0.0
+
+
+def format_setting(setting):
+    return (f"a* {setting['a_low']}-{setting['a_high']}, b* {setting['b_low']}-{setting['b_high']}, "
+            f"matang >= {setting['matang']}%, mentah <= {setting['mentah']}%")
+
+
+def write_results(path, results):
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(PARAMETERS + ("accuracy",))
+        for accuracy, setting in sorted(results, key=lambda item: -item[0]):
+            writer.writerow([setting[name] for name in PARAMETERS] + [f"{accuracy:.4f}"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kalibrasi rentang a*/b* dan cutoff kematangan terhadap folder berlabel")
+    parser.add_argument("labeled_folder", help="Folder berisi subfolder Matang / Setengah Matang / Mentah, atau pack --recursive-nya")
+    parser.add_argument("--cache", default="calibration_stats.npz", help="File cache statistik per gambar")
+    parser.add_argument("--search", choices=("grid", "coordinate"), default="grid")
+    parser.add_argument("--output", default="calibration_results.csv", help="CSV akurasi per konfigurasi")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--a-low", type=int, nargs="+", default=A_LOW)
+    parser.add_argument("--a-high", type=int, nargs="+", default=A_HIGH)
+    parser.add_argument("--b-low", type=int, nargs="+", default=B_LOW)
+    parser.add_argument("--b-high", type=int, nargs="+", default=B_HIGH)
+    parser.add_argument("--matang", type=int, nargs="+", default=MATANG_CUTOFFS)
+    parser.add_argument("--mentah", type=int, nargs="+", default=MENTAH_CUTOFFS)
+    parser.add_argument("--verify", action="store_true", help="Hitung ulang akurasi konfigurasi terbaik dengan pipeline penuh")
+    args = parser.parse_args()
+
+    data = collect_statistics(args.labeled_folder, args.cache, workers=args.workers)
+    counts = np.bincount(data.labels.astype(np.int64), minlength=len(MATURITY_CLASSES))
+    print(f"{len(data.paths)} gambar berlabel: " + ", ".join(f"{name} {counts[i]}" for i, name in enumerate(MATURITY_CLASSES)))
+
+    candidates = {"a_low": args.a_low, "a_high": args.a_high, "b_low": args.b_low, "b_high": args.b_high,
+                  "matang": args.matang, "mentah": args.mentah}
+    # Nilai konfigurasi saat ini selalu ikut sebagai edge agar bisa dibandingkan
+    a_values, b_values = _candidate_edges(candidates)
+    for setting in CURRENT_SETTINGS.values():
+        a_values |= {setting["a_low"], setting["a_high"] + 1}
+        b_values |= {setting["b_low"], setting["b_high"] + 1}
+    evaluator = ThresholdEvaluator(data, a_values, b_values)
+
+    if args.search == "grid":
+        results = grid_search(evaluator, candidates)
+    else:
+        results = coordinate_search(evaluator, candidates, CURRENT_SETTINGS["generate_label/gui"])
+    write_results(args.output, results)
+    print(f"{evaluator.evaluations} konfigurasi dievaluasi, hasil di {args.output}")
+
+    for name, setting in CURRENT_SETTINGS.items():
+        print(f"Saat ini ({name}): {evaluator.evaluate(setting):.2%}  [{format_setting(setting)}]")
+    best_accuracy, best = max(results, key=lambda item: item[0])
+    print(f"Terbaik: {best_accuracy:.2%}  [{format_setting(best)}]")
+
+    if args.verify:
+        print(f"Akurasi pipeline penuh (terbaik): {verify_setting(data, best, args.workers):.2%}")
+        print(f"Akurasi pipeline penuh (proses_dataset_cielab, saat ini): {verify_proses_dataset(data, args.workers):.2%}")
@@ -0,0 +1,115 @@
+import argparse
+import sys
+
+# Satu command line untuk semua pekerjaan batch tanpa GUI:
+#
+#   python cli.py classify GAMBAR_ATAU_FOLDER...   klasifikasi, tanpa menyalin file
+#   python cli.py label FOLDER                     label YOLO (generate_label.py)
+#   python cli.py sort FOLDER                      klasifikasi + folder kelas (proses_dataset_cielab.py)
+#   python cli.py histogram FOLDER                 histogram CIELAB (lab_histogram.py)
+#   python cli.py gui [APLIKASI]                   GUI tkinter
+#
+# Modul setiap subcommand baru diimpor saat subcommand itu dijalankan, jadi
+# jalur batch hanya memuat OpenCV dan NumPy; tkinter, PIL.ImageTk, dan
+# matplotlib hanya dimuat oleh subcommand gui. Tidak ada folder default:
+# folder input selalu wajib diberikan.
+
+COMMANDS = {
+    "classify": "Klasifikasi kematangan gambar, folder, atau pack (hasil dicetak, file tidak disalin)",
+    "label": "Generate label YOLO untuk satu folder (generate_label.py)",
+    "sort": "Klasifikasi satu folder lalu tempatkan gambar ke folder kelas (proses_dataset_cielab.py)",
+    "histogram": "Histogram CIELAB satu folder (lab_histogram.py)",
+    "gui": "Jalankan aplikasi GUI",
+}
+
+GUI_APPS = ("gui3generate", "app_gui3", "app_gui")
+
+
+def _classify(argv, prog):
+    import json
+    import os
+    from functools import partial
+
+    from batch_engine import iter_batch
+    from image_pack import is_pack, list_sources
+    from morphology import MORPHOLOGY_BACKENDS
+    from proses_dataset_cielab import PIPELINE_PARAMS, print_result, process_image
+
+    parser = argparse.ArgumentParser(prog=prog, description=COMMANDS["classify"])
+    parser.add_argument("paths", nargs="+", help="File gambar, folder, atau pack 250x300 (image_pack.py)")
+    parser.add_argument("--json", action="store_true", help="Cetak satu objek JSON per gambar")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Jumlah proses worker (default 1: tanpa process pool, start tercepat)")
+    parser.add_argument("--cache", default=None, help="Folder cache hasil (gambar yang sama tidak diproses ulang)")
+    parser.add_argument("--morphology", choices=MORPHOLOGY_BACKENDS, default=PIPELINE_PARAMS["morphology"])
+    args = parser.parse_args(argv)
+
+    sources = []
+    for path in args.paths:
+        sources.extend(list_sources(path) if os.path.isdir(path) or is_pack(path) else [path])
+
+    worker = partial(process_image, cache_folder=args.cache, morphology=args.morphology)
+    failed = False
+    for result in iter_batch(worker, sources, workers=args.workers):
+        failed |= "error" in result
+        if args.json:
+            print(json.dumps({key: result[key] for key in ("path", "error", "status_kematangan", "maturity_persentase",
+                                                           "total_area", "red_area", "cached") if key in result}))
+        else:
+            print_result(result)
+    return 1 if failed else 0
+
+
+def _label(argv, prog):
+    from generate_label import main
+
+    main(argv, prog=prog, default_folder=None)
+
+
+def _sort(argv, prog):
+    from proses_dataset_cielab import main
+
+    main(argv, prog=prog, default_folder=None)
+
+
+def _histogram(argv, prog):
+    from lab_histogram import main
+
+    main(argv, prog=prog)
+
+
+# Aplikasi GUI berjalan saat modulnya dieksekusi (mainloop di level modul)
+def _gui(argv, prog):
+    import runpy
+
+    parser = argparse.ArgumentParser(prog=prog, description=COMMANDS["gui"])
+    parser.add_argument("app", nargs="?", choices=GUI_APPS, default=GUI_APPS[0])
+    args = parser.parse_args(argv)
+    runpy.run_module(args.app, run_name="__main__")
+
+
+HANDLERS = {
+    "classify": _classify,
+    "label": _label,
+    "sort": _sort,
+    "histogram": _histogram,
+    "gui": _gui,
+}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    commands = "\n".join(f"  {name:<10} {description}" for name, description in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        description="Pipeline kematangan strawberry (CIELAB)",
+        epilog=f"subcommand:\n{commands}\n\nBantuan per subcommand: cli.py <subcommand> --help",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=COMMANDS, metavar="subcommand", help="lihat daftar di bawah")
+    # Hanya nama subcommand yang diparse di sini; sisanya diparse oleh subcommand
+    args = parser.parse_args(argv[:1])
+    return HANDLERS[args.command](argv[1:], f"{parser.prog} {args.command}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import argparse
+import csv
+import itertools
+from functools import partial
+
+import cv2
+import numpy as np
+
+from batch_engine import run_batch
+from image_pack import list_sources, load_source
+
+# Sweep threshold Canny: blur, gradien Sobel, dan non-maximum suppression
+# dihitung sekali per gambar; setiap pasangan (low, high) hanya hysteresis.
+# Hysteresis = komponen 8-terhubung dari piksel kandidat (magnitude > low)
+# yang memuat minimal satu piksel kuat (magnitude > high), sama seperti
+# cv2.Canny (aperture 3, gradien L1). Untuk satu nilai low, connected
+# components dihitung sekali dan semua nilai high cukup satu lookup.
+
+SWEEP_SIZE = (250, 300)  # ukuran pipeline proses_dataset_cielab
+LOW_THRESHOLDS = (25, 50, 75, 100, 150)
+HIGH_THRESHOLDS = (100, 150, 200, 250, 300)
+
+# tan(22.5 derajat) dalam fixed point 15 bit, sama dengan implementasi OpenCV
+_TG22 = int(0.4142135623730950488016887242097 * (1 << 15) + 0.5)
+
+STAT_FIELDS = ("edge_pixels", "edge_density", "contours", "contour_area")
+
+
+class EdgeSweep:
+    def __init__(self, gray, blur_ksize=0):
+        if blur_ksize:
+            gray = cv2.GaussianBlur(gray, (blur_ksize, blur_ksize), 0)
+        dx = cv2.Sobel(gray, cv2.CV_16S, 1, 0, ksize=3, borderType=cv2.BORDER_REPLICATE).astype(np.int32)
+        dy = cv2.Sobel(gray, cv2.CV_16S, 0, 1, ksize=3, borderType=cv2.BORDER_REPLICATE).astype(np.int32)
+        self.shape = gray.shape
+        self.magnitude = self._non_max_suppression(dx, dy)
+        self._components = {}
+
+    # Non-maximum suppression dengan aturan arah dan tie-break seperti cv2.Canny.
+    # Hasil: magnitude di piksel maksimum lokal, 0 di piksel lain.
+    @staticmethod
+    def _non_max_suppression(dx, dy):
+        mag = np.abs(dx) + np.abs(dy)
+        padded = np.pad(mag, 1)
+        center = padded[1:-1, 1:-1]
+        left, right = padded[1:-1, :-2], padded[1:-1, 2:]
+        up, down = padded[:-2, 1:-1], padded[2:, 1:-1]
+        up_left, up_right = padded[:-2, :-2], padded[:-2, 2:]
+        down_left, down_right = padded[2:, :-2], padded[2:, 2:]
+
+        x = np.abs(dx).astype(np.int64)
+        y = np.abs(dy).astype(np.int64) << 15
+        tg22x = x * _TG22
+        tg67x = tg22x + (x << 16)
+        horizontal = y < tg22x
+        vertical = y > tg67x
+        diagonal = ~horizontal & ~vertical
+        same_sign = (dx ^ dy) >= 0
+
+        keep = horizontal & (center > left) & (center >= right)
+        keep |= vertical & (center > up) & (center >= down)
+        # Gradien searah (dx, dy bertanda sama): bandingkan kiri-atas dan kanan-bawah
+        keep |= diagonal & same_sign & (center > up_left) & (center > down_right)
+        keep |= diagonal & ~same_sign & (center > up_right) & (center > down_left)
+        return np.where(keep, mag, 0)
+
+    # Label komponen kandidat dan magnitude maksimum per komponen, di-cache per low
+    def _candidate_components(self, low):
+        components = self._components.get(low)
+        if components is None:
+            candidates = (self.magnitude > low).astype(np.uint8)
+            n_labels, labels = cv2.connectedComponents(candidates, connectivity=8)
+            # Maksimum per komponen: urutkan key (label << 12 | magnitude), lalu
+            # ambil elemen terakhir setiap label (magnitude L1 maksimum 2040 < 4096)
+            selected = labels > 0
+            key = np.sort((labels[selected].astype(np.int64) << 12) | self.magnitude[selected])
+            component_max = np.zeros(n_labels, dtype=np.int64)
+            if key.size:
+                key_labels = key >> 12
+                last = np.flatnonzero(np.append(key_labels[1:] != key_labels[:-1], True))
+                component_max[key_labels[last]] = key[last] & 0xFFF
+            components = self._components[low] = (labels, component_max)
+        return components
+
+    def edges(self, low, high):
+        labels, component_max = self._candidate_components(low)
+        keep = (component_max > high).astype(np.uint8) * 255
+        keep[0] = 0
+        return keep[labels]
+
+    def statistics(self, low, high):
+        edges = self.edges(low, high)
+        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        edge_pixels = cv2.countNonZero(edges)
+        return (
+            edge_pixels,
+            edge_pixels / edges.size,
+            len(contours),
+            sum(cv2.contourArea(cnt) for cnt in contours),
+        )
+
+
+# Semua pasangan (low, high) dengan low < high
+def threshold_pairs(lows=LOW_THRESHOLDS, highs=HIGH_THRESHOLDS):
+    return [(low, high) for low, high in itertools.product(lows, highs) if low < high]
+
+
+# Worker: statistik semua pasangan untuk satu gambar, array (n_pasangan, n_stat)
+def sweep_image(path, pairs, size=SWEEP_SIZE, blur_ksize=0):
+    img = load_source(path, size)
+    if img is None:
+        return None
+    sweep = EdgeSweep(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), blur_ksize)
+    return np.array([sweep.statistics(low, high) for low, high in pairs], dtype=np.float64)
+
+
+# Sweep seluruh folder atau pack (lihat image_pack.py). Mengembalikan mean dan median statistik per pasangan
+# (masing-masing array (n_pasangan, n_stat)) serta jumlah gambar yang terbaca.
+def sweep_folder(folder, pairs, size=SWEEP_SIZE, blur_ksize=0, workers=None):
+    worker = partial(sweep_image, pairs=pairs, size=size, blur_ksize=blur_ksize)
+    per_image = [stats for stats in run_batch(worker, list_sources(folder), workers=workers) if stats is not None]
+    if not per_image:
+        return None, None, 0
+    stacked = np.stack(per_image)
+    return stacked.mean(axis=0), np.median(stacked, axis=0), len(per_image)
+
+
+# Jumlah piksel yang berbeda dari cv2.Canny untuk satu gambar dan pasangan threshold
+def check_canny_parity(gray, low, high, blur_ksize=0):
+    sweep = EdgeSweep(gray, blur_ksize)
+    if blur_ksize:
+        gray = cv2.GaussianBlur(gray, (blur_ksize, blur_ksize), 0)
+    reference = cv2.Canny(gray, low, high)
+    return cv2.countNonZero(cv2.compare(sweep.edges(low, high), reference, cv2.CMP_NE))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep threshold Canny untuk satu folder dataset")
+    parser.add_argument("folder", help="Folder gambar atau pack 250x300 (image_pack.py)")
+    parser.add_argument("--low", type=int, nargs="+", default=LOW_THRESHOLDS)
+    parser.add_argument("--high", type=int, nargs="+", default=HIGH_THRESHOLDS)
+    parser.add_argument("--blur", type=int, default=0, help="Ukuran kernel Gaussian blur (0 = tanpa blur, seperti pipeline)")
+    parser.add_argument("--output", default=None, help="CSV statistik per pasangan threshold")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    pairs = threshold_pairs(args.low, args.high)
+    mean, median, count = sweep_folder(args.folder, pairs, blur_ksize=args.blur, workers=args.workers)
+    if not count:
+        raise SystemExit("Tidak ada gambar yang dapat dibaca")
+
+    print(f"{count} gambar, {len(pairs)} pasangan threshold (rata-rata per gambar)")
+    print(f"{'low':>5} {'high':>5} {'piksel tepi':>12} {'kepadatan':>10} {'kontur':>8} {'luas kontur':>12}")
+    for (low, high), row in zip(pairs, mean):
+        print(f"{low:>5} {high:>5} {row[0]:12.1f} {row[1]:10.4f} {row[2]:8.1f} {row[3]:12.1f}")
+
+    if args.output:
+        with open(args.output, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(("low", "high") + tuple(f"mean_{f}" for f in STAT_FIELDS) + tuple(f"median_{f}" for f in STAT_FIELDS))
+            for (low, high), mean_row, median_row in zip(pairs, mean, median):
+                writer.writerow([low, high] + [f"{v:.6g}" for v in mean_row] + [f"{v:.6g}" for v in median_row])
+        print(f"Hasil disimpan di {args.output}")
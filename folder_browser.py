@@ -0,0 +1,338 @@
+import os
+import tkinter as tk
+from collections import OrderedDict
+
+import cv2
+from PIL import Image, ImageTk
+
+from gui_worker import BackgroundLoader
+from image_pack import list_sources, source_name, source_path
+from label_manifest import write_atomic
+from pipeline_cielab import YOLO_CLASS, format_yolo_rows, parse_yolo_rows
+from thumbnail_cache import THUMBNAIL_SIZE, ThumbnailCache
+
+# Browser folder untuk review label: grid thumbnail yang bisa di-scroll dengan
+# kelas kematangan dan bbox sebagai overlay. Grid divirtualisasi: hanya cell
+# pada baris yang terlihat yang digambar di canvas, sisanya hanya ada sebagai
+# indeks. Thumbnail dibuat di thread latar belakang (ThumbnailCache, disimpan
+# di disk) dengan prioritas baris terlihat lalu PREFETCH_ROWS baris tetangga.
+#
+# Tombol: panah/PageUp/PageDown/Home/End pindah pilihan, 0/1/2 ganti kelas
+# label (kelas YOLO) dan langsung simpan, E ekspor label apa adanya, Enter
+# atau klik ganda buka di panel analisis.
+
+CELL_PADDING = 6
+CAPTION_HEIGHT = 16
+CELL_WIDTH = THUMBNAIL_SIZE + 2 * CELL_PADDING
+CELL_HEIGHT = THUMBNAIL_SIZE + CAPTION_HEIGHT + 2 * CELL_PADDING
+PREFETCH_ROWS = 6
+# Batas objek di memori: PhotoImage Tk dan hasil thumbnail (array + label)
+PHOTO_ITEMS = 512
+ENTRY_ITEMS = 4096
+
+CLASS_NAMES = {int(kelas): status for status, kelas in YOLO_CLASS.items()}
+CLASS_COLORS = {"Matang": "#e03131", "Setengah Matang": "#f59f00", "Mentah": "#2f9e44"}
+RELABEL_KEYS = {str(kelas): kelas for kelas in sorted(CLASS_NAMES)}
+
+
+class FolderBrowser:
+    # label_path(path_gambar) -> path file label .txt; on_open(path_gambar)
+    # dipanggil saat gambar dibuka ke panel analisis
+    def __init__(self, root, folder, params, multi_object=False, label_path=None, on_open=None):
+        self.sources = list_sources(folder)
+        self.label_path = label_path
+        self.on_open = on_open
+        self.thumbnails = ThumbnailCache(params, multi_object=multi_object)
+        self.entries = OrderedDict()  # indeks -> hasil ThumbnailCache.load (LRU)
+        self.photos = OrderedDict()  # indeks -> PhotoImage (LRU)
+        self.labels = {}  # indeks -> teks label yang sudah disimpan (menimpa label otomatis)
+        self.selected = 0 if self.sources else None
+        self.columns = 1
+        self._cells = set()  # indeks cell yang sedang ada di canvas
+        self._index_of = {source_path(item): index for index, item in enumerate(self.sources)}
+        self._render_pending = False
+
+        self.window = tk.Toplevel(root)
+        self.window.title(f"Browser Folder - {folder} ({len(self.sources)} citra)")
+        self.window.geometry("780x640")
+        self.status = tk.Label(self.window, anchor="w", padx=6)
+        self.status.pack(side="bottom", fill="x")
+        self.canvas = tk.Canvas(self.window, background="#1e1e1e", highlightthickness=0,
+                                yscrollincrement=CELL_HEIGHT)
+        scrollbar = tk.Scrollbar(self.window, orient=tk.VERTICAL, command=self._yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self.canvas.bind("<Configure>", self._on_configure)
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Double-Button-1>", lambda event: self.open_selected())
+        self.canvas.bind("<MouseWheel>", lambda event: self._scroll(-1 if event.delta > 0 else 1))
+        self.canvas.bind("<Button-4>", lambda event: self._scroll(-1))
+        self.canvas.bind("<Button-5>", lambda event: self._scroll(1))
+        self.window.bind("<Left>", lambda event: self._move(-1))
+        self.window.bind("<Right>", lambda event: self._move(1))
+        self.window.bind("<Up>", lambda event: self._move(-self.columns))
+        self.window.bind("<Down>", lambda event: self._move(self.columns))
+        self.window.bind("<Prior>", lambda event: self._move(-self.columns * self._visible_rows()))
+        self.window.bind("<Next>", lambda event: self._move(self.columns * self._visible_rows()))
+        self.window.bind("<Home>", lambda event: self._move(-len(self.sources)))
+        self.window.bind("<End>", lambda event: self._move(len(self.sources)))
+        self.window.bind("<Return>", lambda event: self.open_selected())
+        self.window.bind("<Key>", self._on_key)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.window.focus_set()
+
+        self.loader = BackgroundLoader(root, self._load, self._on_loaded, on_error=self._on_load_error)
+        self._update_status()
+
+    def close(self):
+        self.loader.stop()
+        if self.window is not None:
+            try:
+                self.window.destroy()
+            except tk.TclError:  # aplikasi sudah ditutup
+                pass
+            self.window = None
+
+    @property
+    def is_open(self):
+        return self.window is not None
+
+    # Dipanggil dari luar (misalnya setelah Export di panel analisis) agar
+    # overlay cell ikut diperbarui
+    def set_label(self, path, text):
+        index = self._index_of.get(path)
+        if index is not None:
+            self.labels[index] = text
+            self._redraw(index)
+
+    def open_selected(self):
+        if self.selected is not None and self.on_open is not None:
+            self.on_open(source_path(self.sources[self.selected]))
+
+    # --- thread latar belakang ---
+
+    def _load(self, index):
+        item = self.sources[index]
+        entry = self.thumbnails.load(item)
+        entry["label_file"] = None
+        if self.label_path is not None:
+            try:
+                with open(self.label_path(source_path(item))) as file:
+                    entry["label_file"] = file.read()
+            except FileNotFoundError:
+                pass
+        if entry["thumbnail"] is not None:
+            entry["thumbnail"] = cv2.cvtColor(entry["thumbnail"], cv2.COLOR_BGR2RGB)
+        return entry
+
+    # --- main thread ---
+
+    def _on_loaded(self, index, entry):
+        if not self.is_open:
+            return
+        self.entries[index] = entry
+        while len(self.entries) > ENTRY_ITEMS:
+            self.entries.popitem(last=False)
+        # Label yang disimpan setelah file dibaca worker tetap menang
+        if entry["label_file"] is not None:
+            self.labels.setdefault(index, entry["label_file"])
+        self._redraw(index)
+        if index == self.selected:
+            self._update_status()
+
+    def _on_load_error(self, index, error):
+        self._on_loaded(index, {"thumbnail": None, "status_kematangan": None, "maturity_persentase": 0.0,
+                                "yolo_label": "", "label_file": None, "error": str(error)})
+
+    def _rows(self):
+        return -(-len(self.sources) // self.columns)
+
+    def _visible_rows(self):
+        return max(1, self.canvas.winfo_height() // CELL_HEIGHT)
+
+    def _on_configure(self, event):
+        columns = max(1, event.width // CELL_WIDTH)
+        if columns != self.columns:
+            # Posisi semua cell berubah: gambar ulang dari nol
+            self.columns = columns
+            self.canvas.delete("all")
+            self._cells.clear()
+        self.canvas.configure(scrollregion=(0, 0, self.columns * CELL_WIDTH, self._rows() * CELL_HEIGHT))
+        self._schedule_render()
+
+    def _yview(self, *args):
+        self.canvas.yview(*args)
+        self._schedule_render()
+
+    def _scroll(self, rows):
+        self.canvas.yview_scroll(rows, "units")
+        self._schedule_render()
+
+    # Render digabung per siklus idle (satu render untuk beberapa event scroll)
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.canvas.after_idle(self._render)
+
+    def _render(self):
+        self._render_pending = False
+        if not self.is_open:
+            return
+        columns = self.columns
+        top = self.canvas.canvasy(0)
+        first_row = max(0, int(top // CELL_HEIGHT))
+        last_row = int((top + self.canvas.winfo_height()) // CELL_HEIGHT)
+        visible = range(first_row * columns, min(len(self.sources), (last_row + 1) * columns))
+
+        for index in [index for index in self._cells if index not in visible]:
+            self.canvas.delete(f"cell{index}")
+            self._cells.discard(index)
+        for index in visible:
+            if index not in self._cells:
+                self._draw_cell(index)
+
+        # Urutan muat: baris terlihat, tetangga di bawah, lalu tetangga di atas
+        below = range(visible.stop, min(len(self.sources), (last_row + 1 + PREFETCH_ROWS) * columns))
+        above = range(first_row * columns - 1, max(0, (first_row - PREFETCH_ROWS) * columns) - 1, -1)
+        wanted = [index for ranges in (visible, below, above) for index in ranges if index not in self.entries]
+        self.loader.request(wanted)
+
+    def _redraw(self, index):
+        if index is not None and index in self._cells:
+            self.canvas.delete(f"cell{index}")
+            self._draw_cell(index)
+
+    def _photo(self, index, thumbnail):
+        photo = self.photos.get(index)
+        if photo is None:
+            photo = self.photos[index] = ImageTk.PhotoImage(Image.fromarray(thumbnail))
+            while len(self.photos) > PHOTO_ITEMS:
+                self.photos.popitem(last=False)
+        else:
+            self.photos.move_to_end(index)
+        return photo
+
+    def _label_text(self, index):
+        if index in self.labels:
+            return self.labels[index]
+        entry = self.entries.get(index)
+        return entry["yolo_label"] if entry is not None else None
+
+    # Nama kelas cell: dari label yang disimpan (kelas baris pertama) atau status otomatis
+    def _class_name(self, index):
+        entry = self.entries.get(index)
+        if index in self.labels:
+            rows = parse_yolo_rows(self.labels[index])
+            return CLASS_NAMES.get(int(rows["kelas"][0]), "?") if len(rows) else "Tanpa buah"
+        return entry["status_kematangan"] if entry is not None else None
+
+    def _draw_cell(self, index):
+        self._cells.add(index)
+        tag = f"cell{index}"
+        x = (index % self.columns) * CELL_WIDTH + CELL_PADDING
+        y = (index // self.columns) * CELL_HEIGHT + CELL_PADDING
+        entry = self.entries.get(index)
+        class_name = self._class_name(index)
+        color = CLASS_COLORS.get(class_name, "#adb5bd")
+
+        if index == self.selected:
+            self.canvas.create_rectangle(x - 4, y - 4, x + THUMBNAIL_SIZE + 4, y + THUMBNAIL_SIZE + CAPTION_HEIGHT + 2,
+                                         outline="#ffffff", width=2, tags=tag)
+        if entry is None or entry["thumbnail"] is None:
+            text = "..." if entry is None else "Tidak terbaca"
+            self.canvas.create_rectangle(x, y, x + THUMBNAIL_SIZE, y + THUMBNAIL_SIZE, fill="#343a40", outline="", tags=tag)
+            self.canvas.create_text(x + THUMBNAIL_SIZE // 2, y + THUMBNAIL_SIZE // 2, text=text, fill="#adb5bd", tags=tag)
+            return
+
+        thumbnail = entry["thumbnail"]
+        height, width = thumbnail.shape[:2]
+        self.canvas.create_image(x, y, anchor="nw", image=self._photo(index, thumbnail), tags=tag)
+        rows = parse_yolo_rows(self._label_text(index))
+        for kelas, xc, yc, w, h in zip(rows["kelas"], rows["x_center"], rows["y_center"], rows["width"], rows["height"]):
+            self.canvas.create_rectangle(x + (xc - w / 2) * width, y + (yc - h / 2) * height,
+                                         x + (xc + w / 2) * width, y + (yc + h / 2) * height,
+                                         outline=CLASS_COLORS.get(CLASS_NAMES.get(int(kelas)), "#adb5bd"), width=2, tags=tag)
+        saved = "* " if index in self.labels else ""
+        self.canvas.create_text(x, y + THUMBNAIL_SIZE + 2, anchor="nw", text=f"{saved}{class_name}",
+                                fill=color, font=("Arial", 8), tags=tag)
+
+    def _on_click(self, event):
+        column = int(self.canvas.canvasx(event.x) // CELL_WIDTH)
+        index = int(self.canvas.canvasy(event.y) // CELL_HEIGHT) * self.columns + column
+        if column < self.columns and 0 <= index < len(self.sources):
+            self._select(index)
+        self.window.focus_set()
+
+    def _move(self, delta):
+        if self.selected is not None:
+            self._select(min(max(self.selected + delta, 0), len(self.sources) - 1))
+
+    def _select(self, index):
+        previous, self.selected = self.selected, index
+        self._redraw(previous)
+        self._redraw(index)
+        self._scroll_to(index)
+        self._update_status()
+
+    def _scroll_to(self, index):
+        total = self._rows() * CELL_HEIGHT
+        top = self.canvas.canvasy(0)
+        height = self.canvas.winfo_height()
+        y0 = (index // self.columns) * CELL_HEIGHT
+        if y0 < top:
+            self.canvas.yview_moveto(y0 / total)
+        elif y0 + CELL_HEIGHT > top + height:
+            self.canvas.yview_moveto((y0 + CELL_HEIGHT - height) / total)
+        self._schedule_render()
+
+    def _on_key(self, event):
+        if event.char in RELABEL_KEYS:
+            self.relabel(RELABEL_KEYS[event.char])
+        elif event.char.lower() == "e":
+            self.export_selected()
+
+    # Ganti kelas semua objek pada label gambar terpilih lalu simpan
+    def relabel(self, kelas):
+        text = self._label_text(self.selected) if self.selected is not None else None
+        if text is None:
+            self._update_status("Thumbnail belum dimuat")
+            return
+        rows = parse_yolo_rows(text)
+        if not len(rows):
+            self._update_status("Tidak ada buah terdeteksi, kelas tidak dapat diganti")
+            return
+        rows["kelas"] = kelas
+        self._save_label(self.selected, "\n".join(format_yolo_rows(rows)))
+
+    # Simpan label gambar terpilih apa adanya (label otomatis diterima)
+    def export_selected(self):
+        text = self._label_text(self.selected) if self.selected is not None else None
+        if text is None:
+            self._update_status("Thumbnail belum dimuat")
+            return
+        self._save_label(self.selected, text)
+
+    def _save_label(self, index, text):
+        if self.label_path is None:
+            return
+        path = self.label_path(source_path(self.sources[index]))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        write_atomic(path, text)
+        self.labels[index] = text
+        self._redraw(index)
+        self._update_status(f"Label disimpan ke {path}")
+
+    def _update_status(self, message=None):
+        if self.selected is None:
+            self.status.config(text="Folder tidak berisi citra")
+            return
+        name = source_name(self.sources[self.selected])
+        entry = self.entries.get(self.selected)
+        info = ""
+        if entry is not None and entry["thumbnail"] is not None:
+            info = f"  {self._class_name(self.selected)} ({entry['maturity_persentase']:.2f}%)"
+        keys = "  |  ".join(f"{key} {CLASS_NAMES[kelas]}" for key, kelas in RELABEL_KEYS.items())
+        text = f"{self.selected + 1}/{len(self.sources)}  {name}{info}  |  {keys}  |  E ekspor  |  Enter buka"
+        self.status.config(text=f"{text}  -  {message}" if message else text)
@@ -1,103 +1,227 @@
-import cv2
-import numpy as np
+import argparse
 import os
 
-# Fungsi untuk melakukan gamma correction
-def adjust_lightness(img_lab, gamma=1.0):
-    l_channel, a_channel, b_channel = cv2.split(img_lab)
-    inv_gamma = 1.0 / gamma
-    table = np.array([((i / 255.0) ** inv_gamma) * 255 for i in np.arange(0, 256)]).astype("uint8")
-    l_channel_adjusted = cv2.LUT(l_channel, table)
-    img_lab_adjusted = cv2.merge((l_channel_adjusted, a_channel, b_channel))
-    return img_lab_adjusted
-
-# Fungsi untuk menggambar bounding box
-def draw_bounding_box(img, contours):
-    if not contours:
-        return img, None
-    x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
-    img_with_box = img.copy()
-    cv2.rectangle(img_with_box, (x, y), (x + w, y + h), (255, 0, 0), 2)
-    return img_with_box, (x, y, w, h)
-
-# Fungsi untuk menghitung format YOLO
-def calculate_yolo_format(img_shape, bbox):
-    if not bbox:
-        return None
-    img_h, img_w = img_shape[:2]
-    x, y, w, h = bbox
-    
-    # Hitung nilai YOLO format
-    x_center = (x + w / 2) / img_w
-    y_center = (y + h / 2) / img_h
-    width = w / img_w
-    height = h / img_h
-    
-    return f"1 {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}"
-
-# Fungsi utama untuk memproses gambar
-def process_images(image_folder, output_folder):
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-    
-    for filename in os.listdir(image_folder):
-        if filename.endswith((".jpg", ".png", ".jpeg")):
-            img_path = os.path.join(image_folder, filename)
-            print(f"Memproses {img_path}...")
-
-            img = cv2.imread(img_path)
-            img = cv2.resize(img, (300, 300))
-
-            # Konversi ke LAB color space
-            img_lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-            img_lab_adjusted = adjust_lightness(img_lab, gamma=1.0)
-            img_gamma = cv2.cvtColor(img_lab_adjusted, cv2.COLOR_LAB2BGR)
-
-            # Masking merah dan kuning
-            mask_red = cv2.inRange(img_lab[:, :, 1], 140, 210)  # 'a' channel (red)
-            mask_yellow = cv2.inRange(img_lab[:, :, 2], 165, 200)  # 'b' channel (yellow)
-            combined_mask = cv2.bitwise_or(mask_red, mask_yellow)
-            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (11, 11))
-            cleaned_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel)
-
-            # Deteksi kontur dan area
-            contours, _ = cv2.findContours(cleaned_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            total_area = sum(cv2.contourArea(cnt) for cnt in contours)
-            red_area = cv2.countNonZero(mask_red)
-
-            # Hitung persentase kematangan
-            maturity_persentase = (red_area / total_area) * 100 if total_area > 0 else 0.0
-
-            # Klasifikasi kematangan
-            if maturity_persentase >= 80:
-                status_kematangan = "Matang"
-            elif 20 < maturity_persentase < 80:
-                status_kematangan = "Setengah Matang"
+import instrumentation
+from image_loader import load_image
+from image_pack import is_pack, list_sources, load_source, packed_file_info, source_name, source_path
+from label_manifest import LabelManifest, file_hash, write_atomic
+from label_store import LabelStoreWriter, read_label_store
+from morphology import MORPHOLOGY_BACKENDS
+from pipeline_cielab import MATURITY_CLASSES, format_yolo_rows, yolo_rows
+from pipeline_graph import run_label_pipeline
+from tiled_pipeline import TILE_SIZE, tiled_detect_fruits
+
+# Parameter pipeline yang mempengaruhi isi label (masuk ke fingerprint manifest)
+PIPELINE_PARAMS = {
+    "size": (300, 300),
+    "decode": "reduced",
+    "red_range": (140, 210),
+    "yellow_range": (165, 200),
+    "kernel": 11,
+    "morphology": "exact",
+    "matang_cutoff": 80,
+    "mentah_cutoff": 20,
+}
+
+# Folder dataset default saat skrip dijalankan langsung tanpa argumen
+DEFAULT_IMAGE_FOLDER = r"D:\Kuliah\Semester_5\Project\dataset strowberry\train\img"
+# Folder output label default (juga dipakai watch_daemon.py dan browser folder GUI)
+DEFAULT_LABEL_FOLDER = "labels"
+
+# Output pipeline yang dibutuhkan batch label. Stage tampilan (gamma, Canny,
+# overlay bbox) tidak diminta sehingga tidak pernah dihitung.
+LABEL_OUTPUTS = ("yolo_rows", "status_kematangan", "maturity_persentase")
+MULTI_LABEL_OUTPUTS = ("yolo_rows", "fruits")
+
+# Path file label YOLO sebuah gambar: <folder>/<nama tanpa ekstensi>.txt
+def label_file_path(label_folder, image_name):
+    return os.path.join(label_folder, f"{os.path.splitext(os.path.basename(image_name))[0]}.txt")
+
+# Ringkasan dan metrik per buah (mode multi-objek dan mode tile)
+def _fruit_summary(fruits):
+    for fruit in fruits:
+        instrumentation.count("maturity_class_total", kelas=MATURITY_CLASSES[fruit["kelas"]])
+        instrumentation.observe("maturity_percent", fruit["maturity"])
+    ringkasan = ", ".join(f"{MATURITY_CLASSES[f['kelas']]} {f['maturity']:.2f}%" for f in fruits)
+    return f"{len(fruits)} buah: {ringkasan}"
+
+# Fungsi untuk membuat label YOLO satu gambar resolusi penuh per tile (tanpa
+# resize, selalu satu label per buah). Koordinat label relatif terhadap citra asli.
+# Hanya analisis (LAB, mask, closing, komponen) yang per tile: decode tetap
+# satu citra BGR utuh (tinggi x lebar x 3 byte), jadi puncak memori tetap
+# mengikuti resolusi gambar. OpenCV/PIL tidak bisa decode JPEG per strip.
+def label_image_tiled(img_path, tile_size=TILE_SIZE, params=PIPELINE_PARAMS):
+    with instrumentation.span("decode"):
+        img = load_image(img_path, None)
+    if img is None:
+        return None, None
+    with instrumentation.span("tiles"):
+        fruits = tiled_detect_fruits(
+            img,
+            tile_size=tile_size,
+            kernel_size=params["kernel"],
+            morphology=params["morphology"],
+            red_range=params["red_range"],
+            yellow_range=params["yellow_range"],
+            matang_cutoff=params["matang_cutoff"],
+            mentah_cutoff=params["mentah_cutoff"],
+        )
+    return yolo_rows(img.shape, fruits), _fruit_summary(fruits)
+
+# Fungsi untuk membuat label YOLO satu gambar, mengembalikan baris label
+# (array YOLO_ROW_DTYPE, kosong jika tidak ada buah) dan ringkasan
+def label_image(img_path, multi_object=False, params=PIPELINE_PARAMS):
+    # Decode JPEG langsung ke skala tereduksi terdekat lalu resize ke 300x300
+    # (gambar dari pack sudah terdecode, cukup view ke memory map)
+    with instrumentation.span("decode"):
+        img = load_source(img_path, params["size"])
+    if img is None:
+        return None, None
+
+    # Masking merah (a* 140-210) dan kuning (b* 165-200), closing, lalu kontur
+    # atau connected components; lihat pipeline_graph.LABEL_GRAPH
+    params = dict(params, multi_object=multi_object)
+
+    # Mode multi-objek: satu label YOLO per buah dari connected components
+    if multi_object:
+        result = run_label_pipeline(img, MULTI_LABEL_OUTPUTS, params)
+        return result["yolo_rows"], _fruit_summary(result["fruits"])
+
+    result = run_label_pipeline(img, LABEL_OUTPUTS, params)
+    status_kematangan = result["status_kematangan"]
+    maturity_persentase = result["maturity_persentase"]
+    instrumentation.count("maturity_class_total", kelas=status_kematangan)
+    instrumentation.observe("maturity_percent", maturity_persentase)
+
+    # Bounding box kontur terbesar dengan kelas sesuai status kematangan.
+    # Tanpa kontur hasilnya label kosong (gambar tanpa objek), bukan crash.
+    if not len(result["yolo_rows"]):
+        return result["yolo_rows"], "Tidak ada buah terdeteksi"
+    return result["yolo_rows"], f"Kematangan: {status_kematangan}, {maturity_persentase:.2f}%"
+
+# Fungsi utama untuk memproses gambar.
+# Dengan incremental=True hanya gambar baru/berubah (atau yang labelnya dibuat
+# dengan parameter berbeda) yang diproses; sisanya dilewati berdasarkan manifest.
+# Dengan store=True semua label ditulis ke label store (lihat label_store.py)
+# di output_folder, bukan satu file .txt per gambar; label gambar yang dilewati
+# diambil dari store sebelumnya.
+# image_folder boleh berupa pack 300x300 (lihat image_pack.py).
+# Dengan tile_size gambar diproses pada resolusi penuh per tile (lihat
+# tiled_pipeline.py), selalu satu label per buah; decode tetap citra utuh
+# (lihat label_image_tiled).
+# params: parameter pipeline (default PIPELINE_PARAMS, misalnya dengan backend
+# morfologi lain); tidak pernah diubah di tempat.
+def process_images(image_folder, output_folder, multi_object=False, incremental=True, store=False, tile_size=None,
+                   params=PIPELINE_PARAMS):
+    os.makedirs(output_folder, exist_ok=True)
+
+    run_params = dict(params, multi_object=multi_object)
+    if tile_size:
+        run_params.update(size=None, decode="full", tile_size=tile_size, multi_object=True)
+    manifest = LabelManifest(output_folder, run_params)
+    previous = read_label_store(output_folder) if store else {}
+    writer = LabelStoreWriter(output_folder, run_params) if store else None
+    # Mode store: entri manifest baru dicatat setelah store baru di-commit
+    # (writer.close); jika run gagal di tengah, gambar yang berubah tetap
+    # dianggap berubah dan tidak membawa baris lama dari store sebelumnya
+    pending_records = []
+    skipped = 0
+    processed = 0
+
+    # Pack (image_pack.py) dibaca langsung dari memory map; perubahan dideteksi
+    # dari metadata file asli yang tercatat di index pack
+    packed = is_pack(image_folder)
+    if packed and tile_size:
+        raise ValueError("Mode tile membutuhkan gambar asli resolusi penuh, bukan pack")
+    if packed:
+        sources = list_sources(image_folder)
+    else:
+        sources = [
+            os.path.join(image_folder, filename)
+            for filename in sorted(os.listdir(image_folder))
+            if filename.endswith((".jpg", ".png", ".jpeg"))
+        ]
+
+    try:
+        for img_path in sources:
+            filename = os.path.basename(source_name(img_path))
+            label_path = label_file_path(output_folder, filename)
+
+            if packed:
+                changed, stat, content_hash = manifest.needs_processing_known(filename, *packed_file_info(img_path))
+            else:
+                changed, stat, content_hash = manifest.needs_processing(filename, img_path)
+            exists = filename in previous if store else os.path.exists(label_path)
+            if incremental and not changed and exists:
+                if store:
+                    writer.add(filename, previous[filename])
+                skipped += 1
+                instrumentation.count("images_total", status="skipped")
+                continue
+
+            print(f"Memproses {source_path(img_path)}...")
+            if tile_size:
+                rows, ringkasan = label_image_tiled(img_path, tile_size, params)
             else:
-                status_kematangan = "Mentah"
+                rows, ringkasan = label_image(img_path, multi_object=multi_object, params=params)
+            if rows is None:
+                print(f"Error: Tidak dapat membaca gambar {source_path(img_path)}")
+                instrumentation.count("images_total", status="unreadable")
+                continue
+
+            # Simpan label YOLO ke file teks (atomik) atau buffer store, lalu catat di manifest
+            with instrumentation.span("label_write"):
+                if store:
+                    writer.add(filename, rows)
+                    pending_records.append((filename, img_path, stat, content_hash or file_hash(img_path)))
+                else:
+                    write_atomic(label_path, "\n".join(format_yolo_rows(rows)))
+                    manifest.record(filename, img_path, stat, content_hash)
+            processed += 1
+            instrumentation.count("images_total", status="processed")
+
+            if store:
+                print(f"Label YOLO {filename} ditambahkan ke store ({ringkasan})")
+            else:
+                print(f"Label YOLO disimpan di {label_path} ({ringkasan})")
+
+        # Store baru hanya menggantikan store lama jika seluruh folder selesai
+        if store:
+            writer.close()
+            for record in pending_records:
+                manifest.record(*record)
+    finally:
+        manifest.compact()
+
+    print(f"Selesai: {processed} gambar diproses, {skipped} gambar dilewati (tidak berubah).")
 
-            # Gambar bounding box dan hitung YOLO format label
-            img_with_box, bbox = draw_bounding_box(img, contours)
-            yolo_label = calculate_yolo_format(img.shape, bbox)
-            
-            # Label status kematangan
-            initial_yolo_value = {"Matang": "1", "Mentah": "0", "Setengah Matang": "2"}.get(status_kematangan, "Unknown")
-            yolo_label_with_status = f"{initial_yolo_value} {yolo_label[2:]}"
+# Entry point command line; dipakai juga oleh cli.py (subcommand label)
+def main(argv=None, prog=None, default_folder=DEFAULT_IMAGE_FOLDER):
+    parser = argparse.ArgumentParser(prog=prog, description="Generate label YOLO kematangan strawberry")
+    # path img (wajib jika tidak ada folder default)
+    parser.add_argument("image_folder", nargs="?" if default_folder else None, default=default_folder,
+                        help="Folder gambar atau pack 300x300 (image_pack.py)")
+    parser.add_argument("--output", default=DEFAULT_LABEL_FOLDER,
+                        help=f"Folder output label (default: {DEFAULT_LABEL_FOLDER})")
+    parser.add_argument("--multi", action="store_true", help="Satu label per buah (connected components)")
+    parser.add_argument("--full", action="store_true", help="Proses ulang semua gambar, abaikan manifest")
+    parser.add_argument("--store", action="store_true",
+                        help="Tulis semua label ke label store (shard .npz) di folder output, bukan .txt per gambar")
+    parser.add_argument("--tiled", action="store_true",
+                        help="Analisis resolusi penuh per tile tanpa resize (selalu satu label per buah). "
+                             "Decode tetap citra utuh: memori puncak mengikuti resolusi gambar")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE, help=f"Ukuran tile mode --tiled (default: {TILE_SIZE})")
+    parser.add_argument("--morphology", choices=MORPHOLOGY_BACKENDS, default=PIPELINE_PARAMS["morphology"],
+                        help="Backend closing (lihat morphology_report.py untuk IoU/kecepatan tiap backend)")
+    parser.add_argument("--metrics", default=None, help="Tulis metrik ke file (.jsonl atau .prom untuk format Prometheus)")
+    args = parser.parse_args(argv)
 
-            # Simpan label YOLO ke file teks
-            label_path = os.path.join(output_folder, f"{os.path.splitext(filename)[0]}.txt")
-            with open(label_path, "w") as file:
-                file.write(yolo_label_with_status)
+    params = dict(PIPELINE_PARAMS, morphology=args.morphology)
+    if args.metrics:
+        instrumentation.configure(args.metrics)
 
-            print(f"Label YOLO disimpan di {label_path} (Kematangan: {status_kematangan}, {maturity_persentase:.2f}%)")
+    process_images(args.image_folder, args.output, multi_object=args.multi, incremental=not args.full, store=args.store,
+                   tile_size=args.tile_size if args.tiled else None, params=params)
 
 if __name__ == "__main__":
-    # path img
-    image_folder = r"D:\Kuliah\Semester_5\Project\dataset strowberry\train\img"
-    output_folder = "labels"      
-    process_images(image_folder, output_folder)
-        
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-    
-    process_images(image_folder, output_folder)
+    main()
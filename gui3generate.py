@@ -1,145 +1,191 @@
 import cv2
-import numpy as np
 import tkinter as tk
-from tkinter import filedialog, messagebox, LabelFrame
+from tkinter import filedialog, messagebox, LabelFrame, ttk
 from PIL import Image, ImageTk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
 import os
 
+from folder_browser import FolderBrowser
+from generate_label import DEFAULT_LABEL_FOLDER, label_file_path
+from gui_worker import BackgroundAnalyzer
+from image_loader import decode_image, read_image_bytes
+from label_manifest import write_atomic
+
+from pipeline_cielab import YOLO_CLASS, calculate_yolo_format, format_yolo_labels
+from pipeline_graph import run_label_pipeline
+from result_cache import CACHE_FOLDER, ResultCache
+from result_figure import ResultFigure
+
+# Pipeline parameters that affect the analysis result (part of the cache key)
+PIPELINE_PARAMS = {
+    "pipeline": "gui3generate",
+    "size": (300, 300),
+    "decode": "reduced",
+    "gamma": 1.0,
+    "red_range": (140, 210),
+    "yellow_range": (165, 200),
+    "kernel": 11,
+    "morphology": "exact",
+    "canny": (50, 150),
+    "matang_cutoff": 80,
+    "mentah_cutoff": 20,
+}
+
+# Pipeline outputs shown in the GUI (see pipeline_graph.LABEL_GRAPH)
+GUI_OUTPUTS = ("img_gamma", "mask_red", "edges", "cleaned_mask", "contours", "maturity_persentase", "status_kematangan", "img_with_box")
+
+# Cache of analysis results (memory LRU + on-disk store)
+result_cache = ResultCache(PIPELINE_PARAMS, disk_folder=CACHE_FOLDER)
+
+# Exported YOLO labels go to this folder; it defaults to the generate_label
+# output so batch labels and GUI edits live in one place, and can be changed
+# when a folder is opened in the browser
+label_folder = DEFAULT_LABEL_FOLDER
+
 # Global variables
 img_path = None
+img_data = None  # raw file bytes (cache key)
+img_loaded = None  # decoded once, shared by preview and analysis
 img_gamma = None
 status_kematangan = ""
 maturity_persentase = 0.0
 img_with_box = None
 yolo_label = ""
+label_multi_object = False
+# Image the pending analysis was started for, and the image the current
+# label state belongs to (Export is only allowed when this is img_path)
+submitted_path = None
+analyzed_path = None
+
+# Result figure built once and reused for every analysis (updated in place)
+figure_renderer = ResultFigure(("Gambar Asli", "Gamma Correction", "Masking Merah", "Deteksi Tepi", "Masking Bersih", "Kontur"))
+figure_tk = None
 
-def adjust_lightness(img_lab, gamma=1.0):
-    l_channel, a_channel, b_channel = cv2.split(img_lab)
-    inv_gamma = 1.0 / gamma
-    table = np.array([((i / 255.0) ** inv_gamma) * 255 for i in np.arange(0, 256)]).astype("uint8")
-    l_channel_adjusted = cv2.LUT(l_channel, table)
-    img_lab_adjusted = cv2.merge((l_channel_adjusted, a_channel, b_channel))
-    return img_lab_adjusted
-
-def draw_bounding_box(img, contours):
-    if not contours:
-        return img, None
-    x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
-    img_with_box = img.copy()
-    cv2.rectangle(img_with_box, (x, y), (x + w, y + h), (255, 0, 0), 2)
-    return img_with_box, (x, y, w, h)
-
-def calculate_yolo_format(img_shape, bbox):
-    if not bbox:
-        return None
-    img_h, img_w = img_shape[:2]
-    x, y, w, h = bbox
-    
-    # Calculate YOLO format values
-    x_center = (x + w / 2) / img_w
-    y_center = (y + h / 2) / img_h
-    width = w / img_w
-    height = h / img_h
-    
-    return f"1 {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}"
+# Folder browser window (None until a folder is opened)
+browser = None
+
+# Analyse one image (runs on the background thread, must not touch Tk widgets)
+def analyze_image(img, data, multi_object):
+    # Reuse a cached result when this image was already analysed with the same settings
+    cache_key = result_cache.key_for_bytes(data, multi_object=multi_object)
+    cached = result_cache.get(cache_key, with_masks=True)
+    if cached is not None:
+        masks = cached["masks"]
+        contours, _ = cv2.findContours(masks["cleaned_mask"], cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        result = dict(cached, **masks, multi_object=multi_object)
+        result["figure"] = render_panels(masks["img"], masks["img_gamma"], masks["mask_red"], masks["edges"], masks["cleaned_mask"], contours, cached["status_kematangan"], cached["maturity_persentase"])
+        return result
+    
+    # Request the debug intermediates shown in the panels; stages are computed
+    # lazily, and the gamma stage is skipped entirely at gamma 1.0
+    outputs = GUI_OUTPUTS + (("fruits",) if multi_object else ("bbox",))
+    stages = run_label_pipeline(img, outputs, PIPELINE_PARAMS, multi_object=multi_object)
+    img_gamma, mask_red, edges, cleaned_mask, contours = (stages[name] for name in ("img_gamma", "mask_red", "edges", "cleaned_mask", "contours"))
+    maturity_persentase = stages["maturity_persentase"]
+    status_kematangan = stages["status_kematangan"]
+    img_with_box = stages["img_with_box"]
+    
+    # Calculate YOLO format label
+    if multi_object:
+        yolo_label = "\n".join(format_yolo_labels(img.shape, stages["fruits"]))
+    else:
+        yolo_label = calculate_yolo_format(img.shape, stages["bbox"])
+    
+    # Store the result together with the intermediate images shown in the GUI
+    masks = {"img": img, "img_gamma": img_gamma, "mask_red": mask_red, "edges": edges, "cleaned_mask": cleaned_mask, "img_with_box": img_with_box}
+    result = result_cache.put(
+        cache_key,
+        {"maturity_persentase": maturity_persentase, "status_kematangan": status_kematangan, "yolo_label": yolo_label},
+        masks=masks,
+    )
+    result = dict(result, **masks, multi_object=multi_object)
+    result["figure"] = render_panels(img, img_gamma, mask_red, edges, cleaned_mask, contours, status_kematangan, maturity_persentase)
+    return result
+
+# Render the 2x3 analysis panels to an RGB image
+def render_panels(img, img_gamma, mask_red, edges, cleaned_mask, contours, status_kematangan, maturity_persentase):
+    img_with_contours = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    cv2.drawContours(img_with_contours, contours, -1, (0, 255, 0), 2)
+    images = (cv2.cvtColor(img, cv2.COLOR_BGR2RGB), cv2.cvtColor(img_gamma, cv2.COLOR_BGR2RGB), mask_red, edges, cleaned_mask, img_with_contours)
+    return figure_renderer.render(images, f"Kematangan: {status_kematangan} ({maturity_persentase:.2f}%)")
 
 def process_image():
-    global img_path, img_gamma, status_kematangan, maturity_persentase, img_with_box, yolo_label
-    
+    global submitted_path
     if not img_path:
         messagebox.showerror("Error", "Harap masukkan citra terlebih dahulu.")
         return
     
-    img = cv2.imread(img_path)
-    img = cv2.resize(img, (300, 300))
-    
-    # Convert to LAB color space
-    img_lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-    
-    # Adjust lightness using gamma correction
-    img_lab_adjusted = adjust_lightness(img_lab, gamma=1.0)
-    img_gamma = cv2.cvtColor(img_lab_adjusted, cv2.COLOR_LAB2BGR)
-    
-    # Apply red and yellow masking
-    mask_red = cv2.inRange(img_lab[:, :, 1], 140, 210)  # 'a' channel (red)
-    mask_yellow = cv2.inRange(img_lab[:, :, 2], 165, 200)  # 'b' channel (yellow)
-    combined_mask = cv2.bitwise_or(mask_red, mask_yellow)
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (11, 11))
-    cleaned_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel)
-    
-    # Detect edges
-    gray = cv2.cvtColor(img_gamma, cv2.COLOR_BGR2GRAY)
-    edges = cv2.Canny(gray, 50, 150)
-    
-    # Find contours and calculate areas
-    contours, _ = cv2.findContours(cleaned_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    total_area = sum(cv2.contourArea(cnt) for cnt in contours)
-    red_area = cv2.countNonZero(mask_red)
-    
-    # Calculate maturity percentage
-    maturity_persentase = (red_area / total_area) * 100 if total_area > 0 else 0.0
-    
-    # Classify maturity
-    if maturity_persentase >= 80:
-        status_kematangan = "Matang"
-    elif 20 < maturity_persentase < 80:
-        status_kematangan = "Setengah Matang"
-    else:
-        status_kematangan = "Mentah"
-    
-    # Draw bounding box and calculate YOLO format label
-    img_with_box, bbox = draw_bounding_box(img, contours)
-    yolo_label = calculate_yolo_format(img.shape, bbox)
+    # Analysis runs in the background; a new request supersedes the previous one,
+    # so the result delivered to on_analysis_done always belongs to submitted_path.
+    # Tk variables are read here, on the main thread.
+    submitted_path = img_path
+    analyzer.submit(analyze_image, img_loaded, img_data, multi_object_var.get())
+
+def on_analysis_done(result):
+    global img_gamma, status_kematangan, maturity_persentase, img_with_box, yolo_label, label_multi_object, analyzed_path
+    img_gamma = result["img_gamma"]
+    status_kematangan = result["status_kematangan"]
+    maturity_persentase = result["maturity_persentase"]
+    img_with_box = result["img_with_box"]
+    yolo_label = result["yolo_label"]
+    label_multi_object = result["multi_object"]
+    analyzed_path = submitted_path
+    
+    update_cache_info()
     
     # Display results
-    display_results(img, img_gamma, mask_red, edges, cleaned_mask, contours, img_with_box)
+    display_results(result["figure"], img_with_box)
 
-def display_results(img, img_gamma, mask_red, edges, cleaned_mask, contours, img_with_box):
-    # Clear existing widgets in frame_results
-    for widget in frame_results.winfo_children():
-        widget.destroy()
-    
-    # Create Matplotlib figure and subplots
-    fig, ax = plt.subplots(2, 3, figsize=(12, 8))
-    ax[0, 0].imshow(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-    ax[0, 0].set_title("Gambar Asli")
-    ax[0, 0].axis("off")
-    
-    ax[0, 1].imshow(cv2.cvtColor(img_gamma, cv2.COLOR_BGR2RGB))
-    ax[0, 1].set_title("Gamma Correction")
-    ax[0, 1].axis("off")
-    
-    ax[0, 2].imshow(mask_red, cmap="gray")
-    ax[0, 2].set_title("Masking Merah")
-    ax[0, 2].axis("off")
-    
-    ax[1, 0].imshow(edges, cmap="gray")
-    ax[1, 0].set_title("Deteksi Tepi")
-    ax[1, 0].axis("off")
-    
-    ax[1, 1].imshow(cleaned_mask, cmap="gray")
-    ax[1, 1].set_title("Masking Bersih")
-    ax[1, 1].axis("off")
-    
-    img_with_contours = cv2.cvtColor(img.copy(), cv2.COLOR_BGR2RGB)
-    cv2.drawContours(img_with_contours, contours, -1, (0, 255, 0), 2)
-    ax[1, 2].imshow(img_with_contours)
-    ax[1, 2].set_title("Kontur")
-    ax[1, 2].axis("off")
-    
-    plt.suptitle(f"Kematangan: {status_kematangan} ({maturity_persentase:.2f}%)", fontsize=16)
-    plt.tight_layout()
-    
-    # Display the figure on tkinter canvas
-    canvas = FigureCanvasTkAgg(fig, master=frame_results)
-    canvas.get_tk_widget().pack(pady=10, padx=10, expand=True)
-    canvas.draw()
+def on_analysis_error(error):
+    messagebox.showerror("Error", str(error))
+
+def set_busy(busy):
+    # Export is disabled while an analysis is running (its label is not ready yet)
+    btn_export.config(state=tk.DISABLED if busy else tk.NORMAL)
+    if busy:
+        lbl_status.config(text="Memproses...")
+        progress.start(10)
+    else:
+        lbl_status.config(text="")
+        progress.stop()
+
+# Forget the label of the previous image (a new image was opened)
+def clear_label_state():
+    global img_gamma, status_kematangan, maturity_persentase, img_with_box, yolo_label, label_multi_object, analyzed_path
+    img_gamma = None
+    status_kematangan = ""
+    maturity_persentase = 0.0
+    img_with_box = None
+    yolo_label = ""
+    label_multi_object = False
+    analyzed_path = None
+
+def update_cache_info():
+    stats = result_cache.stats()
+    lbl_cache.config(text=f"Cache: {stats['hits_memory'] + stats['hits_disk']} hit / {stats['misses']} miss")
+
+def display_results(figure, img_with_box):
+    global figure_tk
+    # Paste into the existing PhotoImage; only create a new one when the size changes
+    height, width = figure.shape[:2]
+    if figure_tk is None or (figure_tk.width(), figure_tk.height()) != (width, height):
+        figure_tk = ImageTk.PhotoImage(Image.fromarray(figure))
+        lbl_results.config(image=figure_tk)
+    else:
+        figure_tk.paste(Image.fromarray(figure))
     
     # Show bounding box image
     display_bounding_box(img_with_box)
 
+# YOLO label text with the class set from the maturity status (multi-object
+# labels already carry a class per fruit). Empty when no contour was found.
+def yolo_label_text():
+    if not yolo_label:
+        return ""
+    if label_multi_object:
+        return yolo_label
+    initial_yolo_value = YOLO_CLASS.get(status_kematangan, "Unknown")
+    return f"{initial_yolo_value} {yolo_label[2:]}"
+
 def display_bounding_box(img_with_box):
     # Clear previous bounding box and YOLO label info
     for widget in frame_bounding_box.winfo_children():
@@ -157,24 +203,66 @@ def display_bounding_box(img_with_box):
     for widget in frame_bounding_box_info.winfo_children():
         widget.destroy()
     
-    # Adjust YOLO label based on maturity
-    initial_yolo_value = {"Matang": "1", "Mentah": "0", "Setengah Matang": "2"}.get(status_kematangan, "Unknown")
-    yolo_label_with_status = f"{initial_yolo_value} {yolo_label[2:]}"
+    yolo_label_with_status = yolo_label_text() or "(no fruit detected)"
     
     lbl_yolo = tk.Label(frame_bounding_box_info, text=f"YOLO Format Label:\n{yolo_label_with_status}", font=("Arial", 12), padx=10)
     lbl_yolo.pack()
 
 def open_image():
-    global img_path, img_tk
-    img_path = filedialog.askopenfilename(filetypes=[("Image Files", "*.jpg *.png *.jpeg")])
-    if img_path:
-        img = Image.open(img_path).resize((300, 300))
-        img_tk = ImageTk.PhotoImage(img)
-        lbl_img.config(image=img_tk)
-        lbl_img.image = img_tk
+    path = filedialog.askopenfilename(filetypes=[("Image Files", "*.jpg *.png *.jpeg")])
+    if path:
+        load_image_path(path)
     else:
         messagebox.showerror("Error", "Citra tidak ditemukan.")
 
+# Load an image into the analysis panel (from the file dialog or the folder browser)
+def load_image_path(path):
+    global img_path, img_tk, img_data, img_loaded
+    img_path = path
+    # A new image supersedes any analysis still running, and the previous
+    # image's label must not be exported under the new name
+    analyzer.cancel()
+    clear_label_state()
+    # Decode once (JPEG reduced-scale decode); the preview and the analysis share this buffer
+    img_data = read_image_bytes(img_path)
+    img_loaded = decode_image(img_data, (300, 300))
+    if img_loaded is None:
+        img_path = None
+        messagebox.showerror("Error", "Citra tidak dapat dibaca.")
+        return False
+    img_tk = ImageTk.PhotoImage(Image.fromarray(cv2.cvtColor(img_loaded, cv2.COLOR_BGR2RGB)))
+    lbl_img.config(image=img_tk)
+    lbl_img.image = img_tk
+    return True
+
+# Opened from the folder browser (Enter / double-click): load and analyse right away
+def open_from_browser(path):
+    if load_image_path(path):
+        process_image()
+
+# Label file for an image, named like generate_label/watch_daemon output
+def label_path(path):
+    return label_file_path(label_folder, path)
+
+# Browse a whole folder as a thumbnail grid; the grid uses the current
+# multi-object setting for its automatic labels
+def open_folder():
+    global browser, label_folder
+    folder = filedialog.askdirectory(title="Folder citra")
+    if not folder:
+        return
+    # Label folder to review/edit; cancelling keeps the current one
+    chosen = filedialog.askdirectory(
+        title=f"Folder label (batal: {label_folder})",
+        initialdir=label_folder if os.path.isdir(label_folder) else folder,
+    )
+    if chosen:
+        label_folder = chosen
+    if browser is not None and browser.is_open:
+        browser.close()
+    browser = FolderBrowser(root, folder, PIPELINE_PARAMS, multi_object=multi_object_var.get(),
+                            label_path=label_path, on_open=open_from_browser)
+
 # GUI Setup
 root = tk.Tk()
 root.title("Analisis Kematangan Strawberry")
@@ -203,10 +291,16 @@ lbl_img.pack()
 btn_open = tk.Button(frame_image, text="Buka Citra", command=open_image)
 btn_open.pack(pady=10)
 
+btn_open_folder = tk.Button(frame_image, text="Buka Folder", command=open_folder)
+btn_open_folder.pack(pady=5)
+
 # Image analysis frame
 frame_results = LabelFrame(scrollable_frame, text="Hasil Analisis", padx=10, pady=10)
 frame_results.pack(padx=20, pady=10, fill="both", expand=True)
 
+lbl_results = tk.Label(frame_results)
+lbl_results.pack(pady=10, padx=10, expand=True)
+
 # Bounding box frame
 frame_bounding_box = LabelFrame(scrollable_frame, text="Bounding Box", padx=10, pady=10)
 frame_bounding_box.pack(padx=20, pady=10, fill="both", expand=True)
@@ -219,31 +313,49 @@ frame_bounding_box_info.pack(padx=20, pady=10, fill="both", expand=True)
 btn_process = tk.Button(frame_image, text="Analisis", command=process_image)
 btn_process.pack(pady=10)
 
+# Multi-object mode: one YOLO line per detected fruit
+multi_object_var = tk.BooleanVar(value=False)
+chk_multi = tk.Checkbutton(frame_image, text="Multi Buah", variable=multi_object_var)
+chk_multi.pack(pady=5)
+
+# Cache hit/miss counters
+lbl_cache = tk.Label(frame_image, text="Cache: 0 hit / 0 miss")
+lbl_cache.pack(pady=5)
+
+# Busy indicator for the background analysis
+progress = ttk.Progressbar(frame_image, mode="indeterminate", length=200)
+progress.pack(pady=5)
+lbl_status = tk.Label(frame_image, text="")
+lbl_status.pack()
+
+# Background analysis worker; results are delivered back on the Tk main loop
+analyzer = BackgroundAnalyzer(root, on_analysis_done, on_error=on_analysis_error, on_busy=set_busy)
+
 # Scrollbar setup
 scrollbar.pack(side="right", fill="y")
 canvas.pack(side="left", fill="both", expand=True)
 
 def export_yolo_label():
-    global img_path, yolo_label
-    
     if not img_path:
         messagebox.showerror("Error", "Harap masukkan citra terlebih dahulu.")
         return
+    if analyzer.busy or analyzed_path != img_path:
+        messagebox.showerror("Error", "Analisis citra ini belum selesai. Tekan Analisis terlebih dahulu.")
+        return
     
-    # Menyusun nama file dari path gambar (menggunakan nama file gambar)
-    filename = img_path.split("/")[-1].split(".")[0]
+    # Memastikan folder label ada
+    if not os.path.exists(label_folder):
+        os.makedirs(label_folder)
     
-    # Menentukan folder 'label' dan memastikan folder tersebut ada
-    folder_name = "label"
-    if not os.path.exists(folder_name):
-        os.makedirs(folder_name)
+    # Menyusun nama file output di folder label (menggunakan nama file gambar)
+    output_filename = label_path(img_path)
     
-    # Menyusun nama file output dengan folder 'label'
-    output_filename = os.path.join(folder_name, f"{filename}.txt")
+    # Membuat file .txt dan menulis YOLO label (kelas sesuai status kematangan, atomik)
+    write_atomic(output_filename, yolo_label_text())
     
-    # Membuat file .txt dan menulis YOLO label
-    with open(output_filename, "w") as file: 
-        file.write(yolo_label)
+    # Keep the folder browser overlay in sync with the exported label
+    if browser is not None and browser.is_open:
+        browser.set_label(img_path, yolo_label_text())
     
     messagebox.showinfo("Export Success", f"File YOLO label berhasil diekspor ke {output_filename}")
 
@@ -253,3 +365,7 @@ btn_export.pack(pady=10)
 
 
 root.mainloop()
+
+# Let the thumbnail thread finish its current image before the interpreter exits
+if browser is not None:
+    browser.close()
@@ -0,0 +1,170 @@
+import queue
+import threading
+
+# Interval polling antrian hasil dari main loop Tk (ms)
+POLL_INTERVAL_MS = 30
+
+
+# Menjalankan analisis di thread latar belakang agar main loop Tk tetap responsif.
+# Hasil dikirim lewat queue dan diambil oleh root.after di main thread, sehingga
+# semua akses widget tetap terjadi di main thread. Setiap submit() menaikkan
+# nomor generasi: pekerjaan lama yang belum mulai dilewati, dan hasil pekerjaan
+# lama yang sudah berjalan dibuang (superseded), misalnya saat citra baru dibuka.
+class BackgroundAnalyzer:
+    def __init__(self, root, on_result, on_error=None, on_busy=None):
+        self.root = root
+        self.on_result = on_result
+        self.on_error = on_error
+        self.on_busy = on_busy
+        self._results = queue.Queue()
+        self._jobs = queue.Queue()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._polling = False
+        self._busy = False
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self):
+        return self._busy
+
+    def submit(self, func, *args, **kwargs):
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        self._jobs.put((generation, func, args, kwargs))
+        self._set_busy(True)
+        self._schedule_poll()
+        return generation
+
+    # Membatalkan pekerjaan yang sedang berjalan/antri (hasilnya akan dibuang)
+    def cancel(self):
+        with self._lock:
+            self._generation += 1
+        self._set_busy(False)
+
+    def _is_current(self, generation):
+        with self._lock:
+            return generation == self._generation
+
+    def _worker(self):
+        while True:
+            generation, func, args, kwargs = self._jobs.get()
+            if not self._is_current(generation):
+                continue
+            try:
+                result = func(*args, **kwargs)
+            except Exception as error:  # dikirim ke main thread untuk ditampilkan
+                self._results.put((generation, None, error))
+            else:
+                self._results.put((generation, result, None))
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        while True:
+            try:
+                generation, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if not self._is_current(generation):
+                continue
+            self._set_busy(False)
+            if error is not None:
+                if self.on_error is not None:
+                    self.on_error(error)
+            else:
+                self.on_result(result)
+        if self._busy:
+            self._schedule_poll()
+
+    def _set_busy(self, busy):
+        if busy != self._busy:
+            self._busy = busy
+            if self.on_busy is not None:
+                self.on_busy(busy)
+
+
+# Memuat banyak item kecil (misalnya thumbnail) di thread latar belakang dengan
+# urutan prioritas. request() mengganti seluruh daftar yang diinginkan, jadi
+# item yang sudah lewat saat scroll cepat tidak ikut dimuat. load(key) berjalan
+# di thread latar belakang dan tidak boleh menyentuh widget Tk; on_result(key,
+# result) dipanggil di main thread lewat root.after seperti BackgroundAnalyzer.
+class BackgroundLoader:
+    def __init__(self, root, load, on_result, on_error=None):
+        self.root = root
+        self.load = load
+        self.on_result = on_result
+        self.on_error = on_error
+        self._results = queue.Queue()
+        self._wanted = []
+        self._loading = None
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._polling = False
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    # keys diurutkan dari yang paling dibutuhkan (item terlihat lebih dulu)
+    def request(self, keys):
+        with self._cond:
+            self._wanted = [key for key in keys if key != self._loading]
+            self._wanted.reverse()  # pop() dari belakang
+            self._cond.notify()
+        self._schedule_poll()
+
+    # Menghentikan thread setelah item yang sedang dimuat selesai. Dipanggil
+    # sebelum keluar agar proses tidak berhenti di tengah pemanggilan OpenCV.
+    def stop(self, timeout=1.0):
+        with self._cond:
+            self._stopped = True
+            self._wanted = []
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    @property
+    def pending(self):
+        with self._cond:
+            return len(self._wanted) + (self._loading is not None)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._wanted and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                key = self._loading = self._wanted.pop()
+            try:
+                result = self.load(key)
+            except Exception as error:  # dikirim ke main thread
+                self._results.put((key, None, error))
+            else:
+                self._results.put((key, result, None))
+            with self._cond:
+                self._loading = None
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        while True:
+            try:
+                key, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if error is not None:
+                if self.on_error is not None:
+                    self.on_error(key, error)
+            else:
+                self.on_result(key, result)
+        if self.pending or not self._results.empty():
+            self._schedule_poll()
@@ -0,0 +1,103 @@
+import io
+
+import cv2
+import numpy as np
+
+# Mode baca OpenCV dengan decode JPEG tereduksi (skala DCT 1/2, 1/4, 1/8).
+# Untuk format lain OpenCV mendecode penuh lalu memperkecil, hasilnya tetap benar.
+REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+# Membaca isi file sekali sebagai buffer uint8. Buffer yang sama dipakai untuk
+# hash cache (ResultCache.key_for_bytes), probe ukuran, dan decode.
+def read_image_bytes(path):
+    return np.fromfile(path, dtype=np.uint8)
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Marker SOF JPEG (baseline, progressive, lossless, ...) yang memuat ukuran frame
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+# Ukuran JPEG dari segmen SOF pertama; None jika header tidak dikenali
+def _jpeg_size(data):
+    i = 2
+    n = len(data)
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            return None
+        marker = int(data[i + 1])
+        if marker == 0xFF:  # byte pengisi
+            i += 1
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            height = (int(data[i + 5]) << 8) | int(data[i + 6])
+            width = (int(data[i + 7]) << 8) | int(data[i + 8])
+            return (width, height) if width and height else None
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # marker tanpa panjang
+            i += 2
+            continue
+        i += 2 + ((int(data[i + 2]) << 8) | int(data[i + 3]))
+    return None
+
+
+# Ukuran gambar (lebar, tinggi) dari header saja, tanpa decode piksel. JPEG dan
+# PNG dibaca langsung dari header; format lain lewat PIL, yang baru diimpor
+# saat dibutuhkan (jalur batch cukup OpenCV).
+def image_size(data):
+    if len(data) >= 24 and data[:8].tobytes() == PNG_SIGNATURE:
+        return int.from_bytes(data[16:20].tobytes(), "big"), int.from_bytes(data[20:24].tobytes(), "big")
+    if len(data) >= 4 and data[0] == 0xFF and data[1] == 0xD8:
+        size = _jpeg_size(data)
+        if size is not None:
+            return size
+
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return img.size
+    except (OSError, ValueError):
+        return None
+
+
+# Memilih flag imread dengan skala decode terkecil yang masih menutupi ukuran
+# target. Dicek untuk kedua orientasi karena rotasi EXIF diterapkan setelah decode.
+def reduced_read_flag(src_size, target_size):
+    if src_size is None:
+        return cv2.IMREAD_COLOR
+    short_side = min(src_size)
+    long_side = max(src_size)
+    for factor, flag in REDUCED_FLAGS:
+        if short_side // factor >= max(target_size) and long_side // factor >= max(target_size):
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+# Decode buffer gambar langsung ke skala tereduksi lalu resize ke ukuran target
+# (lebar, tinggi). reduced=False memakai decode penuh seperti cv2.imread biasa;
+# size=None mendecode pada resolusi asli.
+# Mengembalikan citra BGR atau None jika buffer tidak dapat didecode.
+def decode_image(data, size, reduced=True):
+    if size is None:
+        return cv2.imdecode(data, cv2.IMREAD_COLOR)
+    flag = reduced_read_flag(image_size(data), size) if reduced else cv2.IMREAD_COLOR
+    img = cv2.imdecode(data, flag)
+    if img is None:
+        return None
+    if (img.shape[1], img.shape[0]) != tuple(size):
+        img = cv2.resize(img, tuple(size))
+    return img
+
+
+# Membaca dan mendecode file gambar sekali ke ukuran target
+def load_image(path, size, reduced=True):
+    try:
+        data = read_image_bytes(path)
+    except OSError:
+        return None
+    return decode_image(data, size, reduced)
@@ -0,0 +1,229 @@
+import argparse
+import hashlib
+import json
+import os
+from functools import partial
+from types import SimpleNamespace
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+from batch_engine import IMAGE_EXTENSIONS, ProgressReporter, iter_batch, list_images
+from image_loader import decode_image, image_size, load_image, read_image_bytes
+from label_manifest import write_atomic
+
+# Pack dataset: satu folder berisi semua gambar yang sudah didecode dan
+# di-resize ke ukuran pipeline, disimpan sebagai satu array uint8 kontigu
+# (N x H x W x 3, BGR atau LAB) yang dibuka dengan memory map. Setiap gambar
+# adalah view (tanpa salinan) ke page cache, jadi pass berulang atas dataset
+# tidak lagi mendecode JPEG. index.json (ditulis paling akhir, atomik) berisi
+# nama, path asli, ukuran asli, serta ukuran/mtime/hash file asli per gambar.
+
+PACK_DATA = "images.u8"
+PACK_INDEX = "index.json"
+PACK_VERSION = 1
+PACK_COLORS = ("bgr", "lab")
+
+
+# Referensi satu gambar di dalam pack (kecil dan picklable untuk worker)
+class PackedImage(NamedTuple):
+    pack: str
+    index: int
+    name: str
+    source: str
+
+
+def is_pack(path):
+    return os.path.isfile(os.path.join(path, PACK_INDEX))
+
+
+# Pack yang dibuka read-only; images adalah memory map (N, H, W, 3)
+class ImagePack:
+    def __init__(self, folder):
+        self.folder = folder
+        with open(os.path.join(folder, PACK_INDEX)) as file:
+            index = json.load(file)
+        if index["version"] != PACK_VERSION:
+            raise ValueError(f"Versi pack tidak dikenal: {index['version']}")
+        self.size = tuple(index["size"])
+        self.color = index["color"]
+        self.entries = index["entries"]
+        self.names = [entry["name"] for entry in self.entries]
+        self._positions = {name: i for i, name in enumerate(self.names)}
+        width, height = self.size
+        shape = (len(self.entries), height, width, 3)
+        if self.entries:
+            self.images = np.memmap(os.path.join(folder, PACK_DATA), dtype=np.uint8, mode="r", shape=shape)
+        else:
+            self.images = np.zeros(shape, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.entries)
+
+    # View tanpa salinan ke gambar ke-i (atau slice beberapa gambar)
+    def __getitem__(self, i):
+        return self.images[i]
+
+    def position(self, name):
+        return self._positions.get(name)
+
+    def refs(self):
+        return [PackedImage(self.folder, i, entry["name"], entry["source"]) for i, entry in enumerate(self.entries)]
+
+    # Gambar ke-i dengan ukuran dan ruang warna yang diminta. Ukuran harus sama
+    # dengan ukuran pack (resize ulang gambar yang sudah di-resize tidak setara
+    # dengan decode asli); BGR -> LAB dikonversi, LAB -> BGR tidak (lossy).
+    def image(self, i, size=None, color="bgr"):
+        if size is not None and tuple(size) != self.size:
+            raise ValueError(f"Pack {self.folder} berukuran {self.size[0]}x{self.size[1]}, pipeline membutuhkan {size[0]}x{size[1]}")
+        img = self.images[i]
+        if color == self.color:
+            return img
+        if color == "lab":
+            return cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+        raise ValueError(f"Pack {self.folder} disimpan dalam LAB, pipeline ini membutuhkan pack BGR")
+
+
+# Pack yang sudah dibuka di proses ini (worker membuka memory map sekali)
+_open_packs = {}
+
+
+def open_pack(folder):
+    pack = _open_packs.get(folder)
+    if pack is None:
+        pack = _open_packs[folder] = ImagePack(folder)
+    return pack
+
+
+# Daftar sumber gambar: path file untuk folder biasa, PackedImage untuk pack
+def list_sources(source):
+    if is_pack(source):
+        return open_pack(source).refs()
+    return list_images(source)
+
+
+# Memuat satu sumber (path atau PackedImage) dengan ukuran target (lebar, tinggi).
+# color="lab" mengembalikan citra LAB. None jika file tidak dapat dibaca.
+def load_source(item, size, color="bgr"):
+    if isinstance(item, PackedImage):
+        return open_pack(item.pack).image(item.index, size, color)
+    img = load_image(item, size)
+    if img is not None and color == "lab":
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+    return img
+
+
+# Nama tampilan dan path file asli sebuah sumber
+def source_name(item):
+    return item.name if isinstance(item, PackedImage) else os.path.basename(item)
+
+
+def source_path(item):
+    return item.source if isinstance(item, PackedImage) else item
+
+
+# (ukuran, mtime_ns) file asli: dari index untuk pack, os.stat untuk file
+def source_stat(item):
+    if isinstance(item, PackedImage):
+        entry = open_pack(item.pack).entries[item.index]
+        return entry["file_size"], entry["mtime_ns"]
+    stat = os.stat(item)
+    return stat.st_size, stat.st_mtime_ns
+
+
+# Metadata file asli sebuah gambar pack untuk LabelManifest.needs_processing_known:
+# objek dengan st_size/st_mtime_ns dan hash isi
+def packed_file_info(item):
+    entry = open_pack(item.pack).entries[item.index]
+    return SimpleNamespace(st_size=entry["file_size"], st_mtime_ns=entry["mtime_ns"]), entry["hash"]
+
+
+# Daftar gambar termasuk subfolder, nama relatif dengan pemisah "/"
+def _list_images_recursive(folder):
+    paths = []
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        paths.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(IMAGE_EXTENSIONS))
+    return paths
+
+
+# Worker: decode satu file ke ukuran pack, beserta metadata file asli
+def _pack_image(path, size, color):
+    try:
+        data = read_image_bytes(path)
+        stat = os.stat(path)
+    except OSError:
+        return None
+    img = decode_image(data, size)
+    if img is None:
+        return None
+    if color == "lab":
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+    return {
+        "img": img,
+        "original_size": image_size(data),
+        "file_size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": hashlib.blake2b(data, digest_size=16).hexdigest(),
+    }
+
+
+# Mendecode satu folder sekali ke pack. Gambar yang tidak dapat dibaca dilewati.
+# recursive=True ikut memasukkan subfolder (misalnya folder kelas Matang/Mentah).
+def pack_folder(folder, output, size=(300, 300), color="bgr", workers=None, recursive=False):
+    if color not in PACK_COLORS:
+        raise ValueError(f"Warna pack harus salah satu dari {PACK_COLORS}")
+    os.makedirs(output, exist_ok=True)
+    paths = _list_images_recursive(folder) if recursive else list_images(folder)
+    data_path = os.path.join(output, PACK_DATA)
+    tmp_path = f"{data_path}.tmp"
+
+    entries = []
+    unreadable = []
+    reporter = ProgressReporter(len(paths))
+    worker = partial(_pack_image, size=tuple(size), color=color)
+    with open(tmp_path, "wb") as file:
+        for path, result in zip(paths, iter_batch(worker, paths, workers=workers, reporter=reporter)):
+            if result is None:
+                unreadable.append(path)
+                continue
+            file.write(result["img"].tobytes())
+            entries.append({
+                "name": os.path.relpath(path, folder).replace(os.sep, "/"),
+                "source": os.path.abspath(path),
+                "original_size": result["original_size"],
+                "file_size": result["file_size"],
+                "mtime_ns": result["mtime_ns"],
+                "hash": result["hash"],
+            })
+    reporter.finish()
+    for path in unreadable:
+        print(f"Error: Tidak dapat membaca gambar {path}")
+
+    # Index lama dihapus, data diganti, lalu index baru ditulis paling akhir:
+    # pack tidak pernah terlihat valid dengan index yang tidak cocok dengan data
+    if os.path.exists(os.path.join(output, PACK_INDEX)):
+        os.remove(os.path.join(output, PACK_INDEX))
+    os.replace(tmp_path, data_path)
+    index = {"version": PACK_VERSION, "size": list(size), "color": color, "entries": entries}
+    write_atomic(os.path.join(output, PACK_INDEX), json.dumps(index))
+    _open_packs.pop(output, None)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode satu folder gambar sekali ke pack memory-mapped")
+    parser.add_argument("folder", help="Folder gambar")
+    parser.add_argument("output", help="Folder pack")
+    parser.add_argument("--size", type=int, nargs=2, default=(300, 300), metavar=("LEBAR", "TINGGI"),
+                        help="Ukuran gambar di pack, harus sama dengan pipeline yang memakai (default 300 300)")
+    parser.add_argument("--lab", action="store_true", help="Simpan dalam ruang warna LAB (histogram/kalibrasi)")
+    parser.add_argument("--recursive", action="store_true", help="Ikut masukkan subfolder (folder kelas berlabel)")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    count = pack_folder(args.folder, args.output, size=args.size, color="lab" if args.lab else "bgr",
+                        workers=args.workers, recursive=args.recursive)
+    width, height = args.size
+    print(f"{count} gambar dikemas ke {args.output} ({count * width * height * 3 / 1e6:.1f} MB)")
@@ -0,0 +1,90 @@
+import errno
+import os
+import shutil
+
+from label_manifest import write_atomic
+
+try:
+    import fcntl
+except ImportError:  # Windows: tidak ada reflink, selalu salin biasa
+    fcntl = None
+
+# Mode pengurutan gambar ke folder kelas. Tidak ada mode yang mendecode atau
+# mengencode piksel; file asli dipakai apa adanya.
+#   hardlink : os.link (fallback salin jika beda filesystem / tidak didukung)
+#   symlink  : symlink ke path absolut file asli
+#   copy     : reflink (copy-on-write, Linux btrfs/xfs) jika bisa, selain itu salin byte
+#   manifest : tidak menyentuh file, hanya menulis daftar kelas,path ke SORT_MANIFEST
+SORT_MODES = ("hardlink", "symlink", "copy", "manifest")
+SORT_MANIFEST = "sort_manifest.csv"
+
+# ioctl FICLONE Linux (_IOW(0x94, 9, int))
+FICLONE = 0x40049409
+
+# Error yang berarti link tidak bisa dibuat di sini (bukan kesalahan data)
+_LINK_UNSUPPORTED = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP}
+
+
+# Salin file dengan reflink jika filesystem mendukung, selain itu salin byte
+# (shutil.copyfile memakai sendfile/copy_file_range di Linux)
+def copy_file(src, dst):
+    if fcntl is not None:
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return "reflink"
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+def _place(src, dst, mode):
+    if mode == "hardlink":
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError as error:
+            if error.errno not in _LINK_UNSUPPORTED:
+                raise
+            return copy_file(src, dst)
+    if mode == "symlink":
+        os.symlink(os.path.abspath(src), dst)
+        return "symlink"
+    return copy_file(src, dst)
+
+
+# Menempatkan satu file ke dst, mengganti file lama dengan nama yang sama
+def place_file(src, dst, mode):
+    try:
+        return _place(src, dst, mode)
+    except FileExistsError:
+        if mode == "hardlink" and os.path.samefile(src, dst):
+            return "hardlink"
+        os.unlink(dst)
+        return _place(src, dst, mode)
+
+
+# Mengurutkan gambar ke folder kelas. assignments: iterable (path, kelas).
+# Folder kelas dibuat sekali di awal; file diproses per kelas supaya penulisan
+# entri direktori berurutan. Mengembalikan jumlah file per cara penempatan
+# (hardlink/symlink/reflink/copy/manifest).
+def sort_images(assignments, output_folder, mode="hardlink", classes=None):
+    if mode not in SORT_MODES:
+        raise ValueError(f"Mode sort tidak dikenal: {mode} (pilihan: {', '.join(SORT_MODES)})")
+    assignments = sorted(assignments, key=lambda item: (item[1], item[0]))
+    os.makedirs(output_folder, exist_ok=True)
+
+    if mode == "manifest":
+        lines = [f"{kelas},{path}" for path, kelas in assignments]
+        write_atomic(os.path.join(output_folder, SORT_MANIFEST), "kelas,path\n" + "".join(line + "\n" for line in lines))
+        return {"manifest": len(lines)}
+
+    for kelas in set(classes or ()) | {kelas for _, kelas in assignments}:
+        os.makedirs(os.path.join(output_folder, kelas), exist_ok=True)
+
+    counts = {}
+    for path, kelas in assignments:
+        how = place_file(path, os.path.join(output_folder, kelas, os.path.basename(path)), mode)
+        counts[how] = counts.get(how, 0) + 1
+    return counts
@@ -0,0 +1,219 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Instrumentasi opt-in untuk pipeline kematangan. Selama belum diaktifkan,
+# span() mengembalikan context manager kosong yang sama dan count()/observe()
+# langsung return, sehingga overhead saat nonaktif hanya satu pemanggilan fungsi.
+#
+# Aktifkan dengan configure("metrics.jsonl") / configure("metrics.prom") atau
+# variabel lingkungan PCV_METRICS=<path>. Format Prometheus dipakai jika
+# ekstensi file .prom, selain itu JSON lines (satu snapshot per baris).
+
+ENV_VAR = "PCV_METRICS"
+PREFIX = "pcv_"
+
+# Batas bucket histogram durasi stage (detik) dan persentase kematangan
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+MATURITY_BUCKETS = (10, 20, 30, 40, 50, 60, 70, 80, 90, 100)
+
+enabled = False
+_export_path = None
+_atexit_registered = False
+_counters = {}
+_histograms = {}
+# count()/observe() dipanggil dari beberapa thread (GUI worker, watch_daemon,
+# layanan HTTP); update read-modify-write dan pembacaan snapshot memakai lock
+_lock = threading.Lock()
+_NULL_SPAN = nullcontext()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def count(name, value=1, **labels):
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, buckets=MATURITY_BUCKETS, **labels):
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": tuple(buckets), "counts": [0] * (len(buckets) + 1), "sum": 0.0, "count": 0}
+        index = 0
+        for bound in histogram["buckets"]:
+            if value <= bound:
+                break
+            index += 1
+        histogram["counts"][index] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe("stage_seconds", time.perf_counter() - self.start, buckets=STAGE_BUCKETS, stage=self.stage)
+        return False
+
+
+# Mengukur durasi satu stage: `with span("decode"): ...`
+def span(stage):
+    if not enabled:
+        return _NULL_SPAN
+    return _Span(stage)
+
+
+# Mengaktifkan pengumpulan metrik. Jika path diberikan, metrik ditulis saat
+# program selesai (atau saat export() dipanggil). Variabel lingkungan ikut
+# diset supaya proses worker (spawn) juga mengumpulkan metrik.
+def configure(path=None):
+    global enabled, _export_path, _atexit_registered
+    enabled = True
+    if path:
+        _export_path = path
+        os.environ[ENV_VAR] = path
+        if not _atexit_registered:
+            atexit.register(export)
+            _atexit_registered = True
+
+
+# Mengambil metrik yang terkumpul lalu mengosongkannya. Dipakai di proses
+# worker untuk mengirim metrik ke proses utama bersama hasil per gambar.
+def drain():
+    with _lock:
+        snapshot = {
+            "counters": [[name, dict(labels), value] for (name, labels), value in _counters.items()],
+            "histograms": [[name, dict(labels), histogram] for (name, labels), histogram in _histograms.items()],
+        }
+        _counters.clear()
+        _histograms.clear()
+    return snapshot
+
+
+# Menggabungkan snapshot dari drain() (misalnya dari proses worker)
+def merge(snapshot):
+    if not enabled or not snapshot:
+        return
+    with _lock:
+        _merge(snapshot)
+
+
+def _merge(snapshot):
+    for name, labels, value in snapshot["counters"]:
+        key = _key(name, labels)
+        _counters[key] = _counters.get(key, 0) + value
+    for name, labels, histogram in snapshot["histograms"]:
+        key = _key(name, labels)
+        current = _histograms.get(key)
+        if current is None:
+            _histograms[key] = {
+                "buckets": tuple(histogram["buckets"]),
+                "counts": list(histogram["counts"]),
+                "sum": histogram["sum"],
+                "count": histogram["count"],
+            }
+            continue
+        current["counts"] = [a + b for a, b in zip(current["counts"], histogram["counts"])]
+        current["sum"] += histogram["sum"]
+        current["count"] += histogram["count"]
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in items) + "}"
+
+
+# Salinan konsisten metrik saat ini (diambil di bawah lock)
+def _snapshot():
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted(
+            (key, dict(histogram, counts=list(histogram["counts"]))) for key, histogram in _histograms.items()
+        )
+    return counters, histograms
+
+
+def to_prometheus():
+    counters, histograms = _snapshot()
+    lines = []
+    typed = set()
+    for (name, labels), value in counters:
+        metric = f"{PREFIX}{name}"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{_format_labels(labels)} {value}")
+    for (name, labels), histogram in histograms:
+        metric = f"{PREFIX}{name}"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} histogram")
+            typed.add(metric)
+        cumulative = 0
+        for bound, bucket_count in zip(histogram["buckets"] + ("+Inf",), histogram["counts"]):
+            cumulative += bucket_count
+            lines.append(f"{metric}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{metric}_sum{_format_labels(labels)} {histogram['sum']}")
+        lines.append(f"{metric}_count{_format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def to_json():
+    counters, histograms = _snapshot()
+    return {
+        "timestamp": time.time(),
+        "pid": os.getpid(),
+        "counters": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in counters],
+        "histograms": [
+            {"name": name, "labels": dict(labels), "buckets": list(h["buckets"]), "counts": h["counts"], "sum": h["sum"], "count": h["count"]}
+            for (name, labels), h in histograms
+        ],
+    }
+
+
+# Menulis metrik ke file. Prometheus: file ditulis ulang secara atomik
+# (untuk node_exporter textfile collector). JSON lines: satu snapshot ditambahkan.
+def export(path=None):
+    path = path or _export_path
+    if not enabled or not path:
+        return
+    if path.endswith(".prom"):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file:
+            file.write(to_prometheus())
+        os.replace(tmp_path, path)
+    else:
+        with open(path, "a") as file:
+            file.write(json.dumps(to_json()) + "\n")
+
+
+# Aktif otomatis lewat variabel lingkungan. Proses worker hanya mengumpulkan
+# metrik; ekspor ke file dilakukan oleh proses utama.
+if os.environ.get(ENV_VAR):
+    import multiprocessing
+
+    if multiprocessing.parent_process() is None:
+        configure(os.environ[ENV_VAR])
+    else:
+        enabled = True
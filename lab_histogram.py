@@ -0,0 +1,173 @@
+import argparse
+import io
+import math
+import os
+from functools import partial
+
+import cv2
+import numpy as np
+
+from batch_engine import run_batch
+from image_pack import is_pack, list_sources, load_source
+
+# Jumlah bin per kanal (nilai CIELAB 8-bit OpenCV: 0-255)
+BINS = 256
+
+# Ukuran decode default, sama dengan pipeline label/GUI. None = resolusi penuh.
+HIST_SIZE = (300, 300)
+
+
+# Histogram CIELAB yang bisa diakumulasi: marginal L dan joint (a*, b*).
+# Marginal a* dan b* diturunkan dari joint, jadi setiap citra cukup dua kali
+# calcHist (L dan a*b*). Memori tetap (~0.5 MB) berapa pun jumlah citranya;
+# histogram parsial dari worker berbeda digabung dengan merge().
+class LabHistogram:
+    def __init__(self):
+        self.l = np.zeros(BINS, dtype=np.int64)
+        self.ab = np.zeros((BINS, BINS), dtype=np.int64)
+        self.images = 0
+
+    @property
+    def pixels(self):
+        return int(self.l.sum())
+
+    @property
+    def a(self):
+        return self.ab.sum(axis=1)
+
+    @property
+    def b(self):
+        return self.ab.sum(axis=0)
+
+    # Menambah satu citra LAB (uint8). mask opsional: hanya piksel mask != 0.
+    def add_lab(self, img_lab, mask=None):
+        self.l += cv2.calcHist([img_lab], [0], mask, [BINS], [0, BINS]).ravel().astype(np.int64)
+        self.ab += cv2.calcHist([img_lab], [1, 2], mask, [BINS, BINS], [0, BINS, 0, BINS]).astype(np.int64)
+        self.images += 1
+        return self
+
+    def add_image(self, img_bgr, mask=None):
+        return self.add_lab(cv2.cvtColor(img_bgr, cv2.COLOR_BGR2LAB), mask)
+
+    def merge(self, other):
+        self.l += other.l
+        self.ab += other.ab
+        self.images += other.images
+        return self
+
+    # Fraksi piksel dengan a* dan b* di dalam rentang (inklusif, seperti inRange)
+    def fraction_in_range(self, a_range=(0, BINS - 1), b_range=(0, BINS - 1)):
+        total = self.pixels
+        if total == 0:
+            return 0.0
+        inside = self.ab[a_range[0]:a_range[1] + 1, b_range[0]:b_range[1] + 1].sum()
+        return float(inside) / total
+
+    # Nilai kanal ("l", "a", "b") pada persentil q (0-100)
+    def percentile(self, channel, q):
+        hist = {"l": self.l, "a": self.a, "b": self.b}[channel]
+        cumulative = np.cumsum(hist)
+        if cumulative[-1] == 0:
+            return None
+        return int(np.searchsorted(cumulative, cumulative[-1] * q / 100.0))
+
+    # Disimpan sebagai .npz tanpa kompresi (atomik: tulis ke tmp lalu os.replace)
+    def save(self, path):
+        buffer = io.BytesIO()
+        np.savez(buffer, l=self.l, ab=self.ab, images=np.int64(self.images))
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(buffer.getvalue())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        hist = cls()
+        with np.load(path, allow_pickle=False) as data:
+            hist.l = data["l"].astype(np.int64)
+            hist.ab = data["ab"].astype(np.int64)
+            hist.images = int(data["images"])
+        return hist
+
+
+# Worker: satu histogram parsial untuk sekelompok citra, sehingga yang dikirim
+# balik ke proses utama hanya satu histogram per kelompok, bukan per citra
+def _histogram_chunk(paths, size=HIST_SIZE):
+    hist = LabHistogram()
+    unreadable = 0
+    for path in paths:
+        img_lab = load_source(path, size, color="lab")
+        if img_lab is None:
+            unreadable += 1
+            continue
+        hist.add_lab(img_lab)
+    return {"hist": hist, "count": len(paths), "unreadable": unreadable}
+
+
+# Mengakumulasi histogram seluruh folder (atau pack, lihat image_pack.py)
+# secara paralel. Untuk pack dipakai ukuran pack apa adanya.
+def accumulate_folder(folder, workers=None, size=HIST_SIZE, group_size=None):
+    paths = list_sources(folder)
+    if is_pack(folder):
+        size = None
+    workers = workers or os.cpu_count() or 1
+    # Beberapa kelompok per worker agar beban tetap seimbang
+    group_size = group_size or max(1, math.ceil(len(paths) / (workers * 4)))
+    groups = [paths[i:i + group_size] for i in range(0, len(paths), group_size)]
+
+    total = LabHistogram()
+    unreadable = 0
+    for result in run_batch(partial(_histogram_chunk, size=size), groups, workers=workers, chunksize=1):
+        total.merge(result["hist"])
+        unreadable += result["unreadable"]
+    if unreadable:
+        print(f"{unreadable} gambar tidak dapat dibaca")
+    return total
+
+
+# Plot marginal L/a*/b* dan joint a*b* (matplotlib hanya diimpor saat dipakai)
+def plot_lab_histogram(hist, title="Histogram Saluran CIELAB"):
+    import matplotlib.pyplot as plt
+
+    fig, (ax_marginal, ax_joint) = plt.subplots(1, 2, figsize=(14, 6))
+    for values, label in ((hist.l, "L"), (hist.a, "A"), (hist.b, "B")):
+        ax_marginal.plot(values, label=f"{label} Channel")
+    ax_marginal.set_title(title)
+    ax_marginal.set_xlabel("Pixel Value")
+    ax_marginal.set_ylabel("Frequency")
+    ax_marginal.legend()
+    ax_marginal.grid()
+
+    ax_joint.imshow(np.log1p(hist.ab), origin="lower", cmap="magma")
+    ax_joint.set_title("Joint a* (baris) vs b* (kolom), log")
+    ax_joint.set_xlabel("b*")
+    ax_joint.set_ylabel("a*")
+    fig.tight_layout()
+    return fig
+
+
+# Entry point command line; dipakai juga oleh cli.py (subcommand histogram)
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Histogram CIELAB (L, a*, b*, joint a*b*) untuk satu folder dataset")
+    parser.add_argument("folder", nargs="?", default=None, help="Folder gambar atau pack (image_pack.py)")
+    parser.add_argument("--output", default="lab_histogram.npz", help="File .npz hasil")
+    parser.add_argument("--merge", nargs="*", default=[], help="File .npz parsial yang ikut digabung")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--full-res", action="store_true", help="Hitung pada resolusi asli (default 300x300)")
+    args = parser.parse_args(argv)
+
+    hist = LabHistogram()
+    if args.folder:
+        hist.merge(accumulate_folder(args.folder, workers=args.workers, size=None if args.full_res else HIST_SIZE))
+    for path in args.merge:
+        hist.merge(LabHistogram.load(path))
+    hist.save(args.output)
+
+    print(f"{hist.images} gambar, {hist.pixels} piksel -> {args.output}")
+    for channel in ("l", "a", "b"):
+        p5, p50, p95 = (hist.percentile(channel, q) for q in (5, 50, 95))
+        print(f"{channel.upper()}: p5={p5} p50={p50} p95={p95}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+
+# Nama file manifest di dalam folder output
+MANIFEST_NAME = ".manifest.jsonl"
+HASH_CHUNK_SIZE = 1 << 20
+
+
+# Fingerprint parameter pipeline: label lama dianggap basi jika parameter berubah
+def params_fingerprint(params):
+    encoded = json.dumps(params, sort_keys=True, default=list).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+# Hash isi file (dibaca per chunk agar memori tetap kecil)
+def file_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Menulis file secara atomik: tulis ke file sementara lalu os.replace
+def write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        file.write(text)
+    os.replace(tmp_path, path)
+
+
+# Manifest append-only (JSON lines). Setiap gambar yang selesai diproses
+# langsung ditambahkan dan di-flush, sehingga run yang crash bisa dilanjutkan
+# tanpa mengulang gambar yang sudah selesai. Entri terakhir untuk satu path
+# yang berlaku; baris terakhir yang terpotong (crash saat menulis) atau baris
+# yang bukan entri valid diabaikan.
+class LabelManifest:
+    def __init__(self, output_folder, params):
+        self.path = os.path.join(output_folder, MANIFEST_NAME)
+        self.fingerprint = params_fingerprint(params)
+        self.entries = {}
+        self.stale_lines = 0
+        self._file = None
+        self._missing_newline = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as file:
+            for line in file:
+                # Baris terakhir tanpa newline (terpotong): append berikutnya
+                # harus mulai di baris baru agar tidak menempel ke sisa ini
+                self._missing_newline = not line.endswith("\n")
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    self.stale_lines += 1
+                    continue
+                name = entry.get("name") if isinstance(entry, dict) else None
+                if not isinstance(name, str):
+                    self.stale_lines += 1
+                    continue
+                if name in self.entries:
+                    self.stale_lines += 1
+                self.entries[name] = entry
+
+    # Cek apakah gambar berubah. Ukuran + mtime yang sama dianggap tidak
+    # berubah tanpa membaca isi file; jika berbeda, hash isi yang menentukan
+    # (misalnya file yang hanya di-touch atau disalin ulang).
+    # Mengembalikan (perlu_diproses, stat, hash_atau_None).
+    def needs_processing(self, name, path):
+        stat = os.stat(path)
+        entry = self.entries.get(name)
+        if entry is None or entry.get("params") != self.fingerprint:
+            return True, stat, None
+        if entry.get("hash") and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return False, stat, entry["hash"]
+        content_hash = file_hash(path)
+        if content_hash == entry.get("hash"):
+            # Isi sama, hanya metadata yang berubah: perbarui entri saja
+            self.record(name, path, stat, content_hash)
+            return False, stat, content_hash
+        return True, stat, content_hash
+
+    # Seperti needs_processing, untuk gambar yang ukuran/mtime dan hash file
+    # aslinya sudah diketahui tanpa membaca file (misalnya dari index pack)
+    def needs_processing_known(self, name, stat, content_hash):
+        entry = self.entries.get(name)
+        if entry is None or entry.get("params") != self.fingerprint or entry.get("hash") != content_hash:
+            return True, stat, content_hash
+        if entry.get("size") != stat.st_size or entry.get("mtime_ns") != stat.st_mtime_ns:
+            self.record(name, None, stat, content_hash)
+        return False, stat, content_hash
+
+    def record(self, name, path, stat, content_hash=None, **extra):
+        if content_hash is None:
+            content_hash = file_hash(path)
+        entry = {
+            "name": name,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": content_hash,
+            "params": self.fingerprint,
+        }
+        entry.update(extra)
+        if self._file is None:
+            self._file = open(self.path, "a")
+            if self._missing_newline:
+                self._file.write("\n")
+                self._missing_newline = False
+        if name in self.entries:
+            self.stale_lines += 1
+        self.entries[name] = entry
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    # Menulis ulang manifest tanpa entri lama yang sudah tergantikan
+    def compact(self):
+        self.close()
+        if not self.stale_lines:
+            return
+        write_atomic(self.path, "".join(json.dumps(entry) + "\n" for entry in self.entries.values()))
+        self.stale_lines = 0
+        self._missing_newline = False
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,217 @@
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from image_loader import image_size
+from label_manifest import write_atomic
+from pipeline_cielab import YOLO_ROW_DTYPE, format_yolo_rows
+
+# Label store: semua label YOLO dalam beberapa shard .npz kolumnar, bukan satu
+# file .txt kecil per gambar. Setiap shard berisi kolom:
+#   names  : nama file gambar (satu per gambar)
+#   image  : indeks gambar (ke names) untuk setiap baris label
+#   kelas  : kelas YOLO (int8)
+#   bbox   : x_center, y_center, width, height ternormalisasi (float32, N x 4)
+# index.json berisi daftar shard yang berlaku dan ditulis terakhir secara
+# atomik, jadi pembaca selalu melihat store lama atau store baru secara utuh.
+STORE_INDEX = "index.json"
+STORE_VERSION = 1
+SHARD_IMAGES = 50000
+
+# Versi format labels.cache Ultralytics yang ditulis oleh exporter
+ULTRALYTICS_CACHE_VERSION = "1.0.3"
+
+
+def _shard_name(generation, number):
+    return f"labels-{generation:06d}-{number:04d}.npz"
+
+
+# Menulis label ke store. Label di-buffer di memori dan ditulis per shard;
+# shard baru memakai nomor generasi baru sehingga store lama tetap utuh
+# sampai close() mengganti index.json.
+class LabelStoreWriter:
+    def __init__(self, folder, params=None, shard_images=SHARD_IMAGES):
+        self.folder = folder
+        self.params = params or {}
+        self.shard_images = shard_images
+        os.makedirs(folder, exist_ok=True)
+        previous = _read_index(folder)
+        self._old_shards = previous["shards"] if previous else []
+        self.generation = previous["generation"] + 1 if previous else 1
+        self._shards = []
+        self._names = []
+        self._rows = []
+        self.images = 0
+        self.labels = 0
+
+    # rows: array YOLO_ROW_DTYPE (boleh kosong = gambar tanpa objek)
+    def add(self, name, rows):
+        self._names.append(name)
+        self._rows.append(rows)
+        if len(self._names) >= self.shard_images:
+            self.flush()
+
+    def flush(self):
+        if not self._names:
+            return
+        counts = np.fromiter((len(rows) for rows in self._rows), dtype=np.int64, count=len(self._rows))
+        rows = np.concatenate(self._rows) if self._rows else np.zeros(0, dtype=YOLO_ROW_DTYPE)
+        arrays = {
+            "names": np.array(self._names, dtype=np.str_),
+            "image": np.repeat(np.arange(len(self._names), dtype=np.int32), counts),
+            "kelas": rows["kelas"].astype(np.int8),
+            "bbox": np.stack([rows["x_center"], rows["y_center"], rows["width"], rows["height"]], axis=1).astype(np.float32),
+        }
+        name = _shard_name(self.generation, len(self._shards))
+        path = os.path.join(self.folder, name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(tmp_path, path)
+
+        self._shards.append(name)
+        self.images += len(self._names)
+        self.labels += len(rows)
+        self._names = []
+        self._rows = []
+
+    # Menulis shard terakhir, mengganti index.json, lalu menghapus shard lama
+    def close(self):
+        self.flush()
+        index = {
+            "version": STORE_VERSION,
+            "generation": self.generation,
+            "shards": self._shards,
+            "images": self.images,
+            "labels": self.labels,
+            "params": self.params,
+        }
+        write_atomic(os.path.join(self.folder, STORE_INDEX), json.dumps(index, indent=2))
+        for name in self._old_shards:
+            if name not in self._shards:
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                except FileNotFoundError:
+                    pass
+
+
+def _read_index(folder):
+    try:
+        with open(os.path.join(folder, STORE_INDEX)) as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+# Membaca seluruh store. Mengembalikan dict nama gambar -> array YOLO_ROW_DTYPE
+# (urutan nama sesuai urutan penulisan). Store yang belum ada menghasilkan dict kosong.
+def read_label_store(folder):
+    index = _read_index(folder)
+    labels = {}
+    if index is None:
+        return labels
+    for shard in index["shards"]:
+        with np.load(os.path.join(folder, shard), allow_pickle=False) as data:
+            names = data["names"]
+            image = data["image"]
+            bbox = data["bbox"].astype(np.float64)
+            rows = np.zeros(len(image), dtype=YOLO_ROW_DTYPE)
+            rows["kelas"] = data["kelas"]
+            rows["x_center"], rows["y_center"], rows["width"], rows["height"] = bbox.T
+        # Baris label satu gambar berurutan, jadi cukup dipotong per batas indeks
+        bounds = np.searchsorted(image, np.arange(len(names) + 1))
+        for i, name in enumerate(names):
+            labels[str(name)] = rows[bounds[i]:bounds[i + 1]]
+    return labels
+
+
+# Hash yang sama dengan ultralytics.data.utils.get_hash (ukuran total + path)
+def _ultralytics_hash(paths):
+    size = 0
+    for path in paths:
+        try:
+            size += os.stat(path).st_size
+        except OSError:
+            continue
+    digest = hashlib.sha256(str(size).encode())
+    digest.update("".join(paths).encode())
+    return digest.hexdigest()
+
+
+# Menulis labels.cache dengan struktur yang dipakai loader Ultralytics, sehingga
+# training pertama tidak perlu memindai ulang semua file label. Jika hash tidak
+# cocok (misalnya path gambar berbeda), loader membangun ulang cache seperti biasa.
+def write_ultralytics_cache(cache_path, entries):
+    im_files = [im_file for im_file, _, _, _ in entries]
+    label_files = [label_file for _, label_file, _, _ in entries]
+    labels = []
+    found = empty = 0
+    for im_file, _, shape, rows in entries:
+        found += 1
+        empty += len(rows) == 0
+        labels.append({
+            "im_file": im_file,
+            "shape": shape,
+            "cls": rows["kelas"].astype(np.float32).reshape(-1, 1),
+            "bboxes": np.stack([rows["x_center"], rows["y_center"], rows["width"], rows["height"]], axis=1).astype(np.float32).reshape(-1, 4),
+            "segments": [],
+            "keypoints": None,
+            "normalized": True,
+            "bbox_format": "xywh",
+        })
+    cache = {
+        "labels": labels,
+        "hash": _ultralytics_hash(label_files + im_files),
+        "results": (found, 0, empty, 0, len(im_files)),
+        "msgs": [],
+        "version": ULTRALYTICS_CACHE_VERSION,
+    }
+    # np.save selalu menambah .npy, jadi tulis ke file sementara lalu ganti nama
+    tmp_path = f"{cache_path}.tmp.npy"
+    np.save(tmp_path, cache, allow_pickle=True)
+    os.replace(tmp_path, cache_path)
+
+
+# Ekspor store ke layout per file (<nama>.txt di labels_folder) dalam satu
+# pass. Jika image_folder diberikan, labels.cache Ultralytics juga ditulis di
+# samping folder label (<labels_folder>.cache), ukuran gambar dibaca dari header.
+def export_label_store(store_folder, labels_folder, image_folder=None):
+    labels = read_label_store(store_folder)
+    os.makedirs(labels_folder, exist_ok=True)
+
+    entries = []
+    for name, rows in labels.items():
+        label_path = os.path.join(labels_folder, f"{os.path.splitext(name)[0]}.txt")
+        write_atomic(label_path, "\n".join(format_yolo_rows(rows)))
+        if image_folder:
+            im_file = os.path.abspath(os.path.join(image_folder, name))
+            try:
+                size = image_size(np.fromfile(im_file, dtype=np.uint8))
+            except OSError:
+                size = None
+            if size is None:
+                print(f"Peringatan: gambar {im_file} tidak ditemukan/terbaca, tidak masuk labels.cache")
+                continue
+            entries.append((im_file, os.path.abspath(label_path), (size[1], size[0]), rows))
+
+    cache_path = None
+    if image_folder:
+        cache_path = os.path.normpath(labels_folder) + ".cache"
+        write_ultralytics_cache(cache_path, entries)
+    return len(labels), cache_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ekspor label store ke file YOLO per gambar")
+    parser.add_argument("store_folder", help="Folder label store (hasil generate_label.py --store)")
+    parser.add_argument("labels_folder", help="Folder output file .txt per gambar")
+    parser.add_argument("--images", default=None, help="Folder gambar; jika diisi, labels.cache juga ditulis")
+    args = parser.parse_args()
+
+    count, cache_path = export_label_store(args.store_folder, args.labels_folder, args.images)
+    print(f"{count} file label ditulis ke {args.labels_folder}")
+    if cache_path:
+        print(f"Label cache ditulis ke {cache_path}")
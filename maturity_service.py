@@ -0,0 +1,387 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+import instrumentation
+from generate_label import PIPELINE_PARAMS
+from image_loader import decode_image
+from morphology import MORPHOLOGY_BACKENDS
+from pipeline_cielab import MATURITY_CLASSES, analyze_batch, bbox_yolo_rows, color_mask_table, format_yolo_rows, yolo_rows
+
+# Layanan HTTP lokal untuk pipeline kematangan generate_label. Proses tetap
+# hidup sehingga biaya import Python/OpenCV hanya dibayar sekali.
+#
+#   POST /analyze[?multi=1]   body = isi file gambar -> JSON hasil
+#   GET  /health              status antrian
+#   GET  /stats               latensi (persentil) dan jumlah request
+#   GET  /metrics             metrik format Prometheus (instrumentation.py)
+#
+# Request yang datang bersamaan dikumpulkan menjadi micro-batch (paling banyak
+# max_batch, menunggu paling lama max_wait detik) lalu dijalankan di thread
+# pool lewat analyze_batch (OpenCV melepas GIL). Antrian dibatasi; jika penuh
+# request langsung ditolak dengan 503 + Retry-After, bukan ditumpuk.
+
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+MAX_QUEUE = 64
+MAX_BATCH = 16
+MAX_WAIT = 0.005
+MAX_BODY = 32 << 20
+MAX_HEADER = 64 << 10
+LATENCY_WINDOW = 1000
+
+# Batas bucket histogram latensi request (detik)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.headers = tuple(headers)
+
+
+# Hasil JSON satu gambar (dipanggil di thread worker)
+def _single_result(img_shape, row):
+    bbox = tuple(int(v) for v in row[["x", "y", "w", "h"]]) if row["w"] else None
+    rows = bbox_yolo_rows(img_shape, bbox, int(row["kelas"]))
+    return {
+        "maturity": float(row["maturity"]),
+        "class": MATURITY_CLASSES[row["kelas"]],
+        "class_id": int(row["kelas"]),
+        "bbox": list(bbox) if bbox else None,
+        "yolo": format_yolo_rows(rows),
+    }
+
+
+def _multi_result(img_shape, fruits):
+    return {
+        "fruits": [
+            {"maturity": float(fruit["maturity"]), "class": MATURITY_CLASSES[fruit["kelas"]], "class_id": int(fruit["kelas"])}
+            for fruit in fruits
+        ],
+        "yolo": format_yolo_rows(yolo_rows(img_shape, fruits)),
+    }
+
+
+def _batch_options(params):
+    return {
+        "red_range": params["red_range"],
+        "yellow_range": params["yellow_range"],
+        "kernel_size": params["kernel"],
+        "morphology": params["morphology"],
+        "matang_cutoff": params["matang_cutoff"],
+        "mentah_cutoff": params["mentah_cutoff"],
+    }
+
+
+# Membangun tabel warna sebelum request pertama (jika tidak, request pertama
+# ikut menanggung ratusan milidetik pembuatan tabel, atau beberapa ratus
+# request pertama memakai jalur cvtColor yang lebih lambat)
+def warm_up(params=PIPELINE_PARAMS):
+    color_mask_table(tuple(params["red_range"]), tuple(params["yellow_range"]))
+    width, height = params["size"]
+    analyze_batch(np.zeros((1, height, width, 3), dtype=np.uint8), **_batch_options(params))
+
+
+# Worker: decode semua gambar satu batch lalu satu pemanggilan analyze_batch.
+# Mengembalikan list hasil (dict) atau None untuk gambar yang tidak terbaca.
+def analyze_payloads(payloads, multi_object=False, params=PIPELINE_PARAMS):
+    images = [decode_image(np.frombuffer(data, dtype=np.uint8), params["size"]) for data in payloads]
+    valid = [i for i, img in enumerate(images) if img is not None]
+    results = [None] * len(payloads)
+    if not valid:
+        return results
+
+    analysis = analyze_batch([images[i] for i in valid], multi_object=multi_object, **_batch_options(params))
+    for position, i in enumerate(valid):
+        if multi_object:
+            results[i] = _multi_result(images[i].shape, analysis[analysis["image"] == position])
+        else:
+            results[i] = _single_result(images[i].shape, analysis[position])
+    return results
+
+
+class _Job:
+    __slots__ = ("data", "multi_object", "future", "received", "started")
+
+    def __init__(self, data, multi_object, future, received):
+        self.data = data
+        self.multi_object = multi_object
+        self.future = future
+        self.received = received
+        self.started = None
+
+
+class MaturityService:
+    def __init__(self, workers=None, max_queue=MAX_QUEUE, max_batch=MAX_BATCH, max_wait=MAX_WAIT, verbose=True,
+                 params=PIPELINE_PARAMS):
+        self.params = params
+        self.workers = workers or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.verbose = verbose
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._batcher = None
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = {"ok": 0, "rejected": 0, "error": 0}
+        self.batches = 0
+        self.batched_images = 0
+        instrumentation.configure()
+
+    async def start(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        await asyncio.get_running_loop().run_in_executor(self.executor, warm_up, self.params)
+        self._batcher = asyncio.create_task(self._batch_loop())
+        return await asyncio.start_server(self._handle_connection, host, port, limit=MAX_HEADER)
+
+    def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # Memasukkan satu gambar ke antrian dan menunggu hasilnya
+    async def analyze(self, data, multi_object=False):
+        job = _Job(data, multi_object, asyncio.get_running_loop().create_future(), time.perf_counter())
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.requests["rejected"] += 1
+            instrumentation.count("service_requests_total", status="rejected")
+            raise HttpError(503, "Antrian penuh, coba lagi", [("Retry-After", "1")])
+        return job, await job.future
+
+    # Mengambil request dari antrian sebagai micro-batch dan menjalankannya di
+    # thread pool; paling banyak `workers` batch berjalan bersamaan
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            jobs = [await self.queue.get()]
+            if self.queue.empty() and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)
+            while len(jobs) < self.max_batch and not self.queue.empty():
+                jobs.append(self.queue.get_nowait())
+
+            # Satu batch hanya berisi satu mode (satu objek / multi-objek)
+            groups = {}
+            for job in jobs:
+                groups.setdefault(job.multi_object, []).append(job)
+            pending = []
+            for multi_object, group in groups.items():
+                started = time.perf_counter()
+                for job in group:
+                    job.started = started
+                future = loop.run_in_executor(self.executor, analyze_payloads, [job.data for job in group], multi_object,
+                                              self.params)
+                future.add_done_callback(lambda done, group=group: self._finish(group, done))
+                pending.append(future)
+                self.batches += 1
+                self.batched_images += len(group)
+            asyncio.ensure_future(self._release_when_done(pending))
+
+    async def _release_when_done(self, pending):
+        try:
+            await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            self._slots.release()
+
+    def _finish(self, group, done):
+        error = asyncio.CancelledError() if done.cancelled() else done.exception()
+        for index, job in enumerate(group):
+            if job.future.done():
+                continue
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result((done.result()[index], len(group)))
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as error:
+                    await self._respond(writer, error.status, {"error": str(error)}, error.headers, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, payload, extra = await self._route(method, target, body)
+                await self._respond(writer, status, payload, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as error:
+            if error.partial.strip():
+                raise HttpError(400, "Request tidak lengkap")
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(400, "Header terlalu besar")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "Request line tidak valid")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        body = b""
+        if method == "POST":
+            if "content-length" not in headers:
+                raise HttpError(411, "Content-Length wajib diisi")
+            try:
+                length = int(headers["content-length"])
+            except ValueError:
+                raise HttpError(400, "Content-Length tidak valid")
+            if length < 0:
+                raise HttpError(400, "Content-Length tidak valid")
+            if length > MAX_BODY:
+                raise HttpError(413, f"Gambar lebih dari {MAX_BODY} byte")
+            body = await reader.readexactly(length)
+        return method, target, headers, body
+
+    async def _route(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == "/analyze":
+            if method != "POST":
+                return 405, {"error": "Gunakan POST"}, ()
+            query = parse_qs(url.query)
+            multi_object = query.get("multi", ["0"])[0] in ("1", "true")
+            return await self._analyze_request(body, multi_object)
+        if method != "GET":
+            return 405, {"error": "Gunakan GET"}, ()
+        if url.path == "/health":
+            return 200, {"status": "ok", "queue": self.queue.qsize(), "queue_max": self.queue.maxsize}, ()
+        if url.path == "/stats":
+            return 200, self.stats(), ()
+        if url.path == "/metrics":
+            return 200, instrumentation.to_prometheus(), ()
+        return 404, {"error": f"Path tidak dikenal: {url.path}"}, ()
+
+    async def _analyze_request(self, body, multi_object):
+        try:
+            job, (result, batch_size) = await self.analyze(body, multi_object)
+        except HttpError as error:
+            return error.status, {"error": str(error)}, error.headers
+        except Exception as error:  # worker gagal: seluruh batch mendapat error yang sama
+            self.requests["error"] += 1
+            instrumentation.count("service_requests_total", status="error")
+            if self.verbose:
+                print(f"POST /analyze 500 {type(error).__name__}: {error}")
+            return 500, {"error": f"Analisis gagal: {error}"}, ()
+        finished = time.perf_counter()
+        total = finished - job.received
+        latency = {
+            "queue_ms": round((job.started - job.received) * 1000, 3),
+            "inference_ms": round((finished - job.started) * 1000, 3),
+            "total_ms": round(total * 1000, 3),
+        }
+        if result is None:
+            self.requests["error"] += 1
+            instrumentation.count("service_requests_total", status="error")
+            return 400, {"error": "Tidak dapat membaca gambar", "latency": latency}, ()
+
+        self.requests["ok"] += 1
+        self.latencies.append(total)
+        instrumentation.count("service_requests_total", status="ok")
+        instrumentation.observe("service_latency_seconds", total, buckets=LATENCY_BUCKETS)
+        instrumentation.observe("service_batch_size", batch_size, buckets=(1, 2, 4, 8, 16, 32, 64))
+        if self.verbose:
+            print(f"POST /analyze 200 {latency['total_ms']:.1f} ms (antrian {latency['queue_ms']:.1f} ms, batch {batch_size})")
+        return 200, dict(result, latency=latency, batch_size=batch_size), [("X-Response-Time", f"{latency['total_ms']}ms")]
+
+    # Ringkasan latensi request terakhir (jendela LATENCY_WINDOW) dan penghitung
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000
+        summary = {
+            "requests": dict(self.requests),
+            "batches": self.batches,
+            "mean_batch_size": self.batched_images / self.batches if self.batches else 0.0,
+            "queue": self.queue.qsize(),
+        }
+        if len(latencies):
+            summary["latency_ms"] = {f"p{q}": float(np.percentile(latencies, q)) for q in (50, 90, 99)}
+            summary["latency_ms"]["max"] = float(latencies.max())
+        return summary
+
+    async def _respond(self, writer, status, payload, headers=(), keep_alive=True):
+        if isinstance(payload, str):
+            body = payload.encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        else:
+            body = json.dumps(payload).encode("utf-8")
+            content_type = "application/json"
+        lines = [
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines += [f"{name}: {value}" for name, value in headers]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(host=SERVICE_HOST, port=SERVICE_PORT, **options):
+    service = MaturityService(**options)
+    server = await service.start(host, port)
+    print(f"Layanan kematangan berjalan di http://{host}:{port} ({service.workers} worker)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Layanan HTTP lokal untuk pipeline kematangan (micro-batching)")
+    parser.add_argument("--host", default=SERVICE_HOST, help="Alamat bind (default hanya localhost)")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="Jumlah thread worker (default: jumlah core)")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE, help="Panjang antrian maksimum sebelum request ditolak")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Jumlah gambar maksimum per micro-batch")
+    parser.add_argument("--max-wait", type=float, default=MAX_WAIT * 1000, help="Waktu tunggu pengumpulan batch (ms)")
+    parser.add_argument("--morphology", choices=MORPHOLOGY_BACKENDS, default=PIPELINE_PARAMS["morphology"],
+                        help="Backend closing (lihat morphology_report.py untuk IoU/kecepatan tiap backend)")
+    parser.add_argument("--quiet", action="store_true", help="Jangan cetak log per request")
+    args = parser.parse_args()
+
+    params = dict(PIPELINE_PARAMS, morphology=args.morphology)
+
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, max_queue=args.max_queue,
+                          max_batch=args.max_batch, max_wait=args.max_wait / 1000, verbose=not args.quiet,
+                          params=params))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,158 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# Backend closing (MORPH_CLOSE, elemen struktur elips k x k) untuk mask biner
+# 0/255. Semua backend menerima dan mengembalikan mask uint8 0/255 berukuran
+# sama; pilih per deployment berdasarkan laporan morphology_report.py.
+#
+#   exact       cv2.morphologyEx dengan kernel elips (referensi)
+#   separable   kernel persegi dengan luas setara elips; OpenCV menjalankannya
+#               sebagai dua pass 1-D (baris lalu kolom), aproksimasi
+#   downsample  closing pada mask yang diperkecil DOWNSAMPLE_FACTOR kali lalu
+#               diperbesar kembali dan digabung dengan mask asli, aproksimasi
+#   bitpacked   mask dikemas 64 piksel per uint64; dilasi/erosi elips dihitung
+#               dengan shift dan OR per baris kernel, hasil identik dengan exact
+
+MORPHOLOGY_BACKENDS = ("exact", "separable", "downsample", "bitpacked")
+DOWNSAMPLE_FACTOR = 2
+
+_ONE = np.uint64(1)
+_TOP_BIT = np.uint64(63)
+
+
+@lru_cache(maxsize=None)
+def ellipse_kernel(kernel_size):
+    return cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
+
+
+# Sisi kernel persegi (ganjil) dengan luas paling dekat dengan elips k x k
+@lru_cache(maxsize=None)
+def _square_kernel(kernel_size):
+    side = 2 * int(round((kernel_size * np.sqrt(np.pi) / 2 - 1) / 2)) + 1
+    return cv2.getStructuringElement(cv2.MORPH_RECT, (max(side, 1), max(side, 1)))
+
+
+def _close_exact(mask, kernel_size):
+    return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, ellipse_kernel(kernel_size))
+
+
+def _close_separable(mask, kernel_size):
+    return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, _square_kernel(kernel_size))
+
+
+def _coarse_kernel_size(kernel_size):
+    return max(1, kernel_size // DOWNSAMPLE_FACTOR) | 1
+
+
+# Mask dipad nol ke kelipatan faktor (grid kasar selalu sejajar dengan titik
+# asal mask), diperkecil dengan INTER_AREA, di-closing dengan kernel k/faktor,
+# lalu diperbesar bilinear. Closing tidak pernah menghapus piksel mask, jadi
+# hasilnya di-OR dengan mask asli agar detail tepi yang sudah ada tetap utuh.
+def _close_downsample(mask, kernel_size):
+    factor = DOWNSAMPLE_FACTOR
+    height, width = mask.shape
+    padded = cv2.copyMakeBorder(mask, 0, -height % factor, 0, -width % factor, cv2.BORDER_CONSTANT, value=0)
+    small_size = (padded.shape[1] // factor, padded.shape[0] // factor)
+    small = cv2.resize(padded, small_size, interpolation=cv2.INTER_AREA)
+    cv2.threshold(small, 127, 255, cv2.THRESH_BINARY, dst=small)
+    small = cv2.morphologyEx(small, cv2.MORPH_CLOSE, ellipse_kernel(_coarse_kernel_size(kernel_size)))
+    closed = cv2.resize(small, (padded.shape[1], padded.shape[0]), interpolation=cv2.INTER_LINEAR)
+    cv2.threshold(closed, 127, 255, cv2.THRESH_BINARY, dst=closed)
+    return cv2.bitwise_or(closed[:height, :width], mask)
+
+
+# Setengah lebar baris kernel elips untuk offset baris -r..r
+@lru_cache(maxsize=None)
+def _kernel_runs(kernel_size):
+    kernel = ellipse_kernel(kernel_size)
+    return tuple(int(row.sum()) // 2 for row in kernel)
+
+
+# Mask dikemas per baris (bit x%64 dari word x//64, little-endian), disimpan
+# word-major (n_word, tinggi) agar shift antarbaris berupa slice kontigu
+def _pack(mask):
+    height, width = mask.shape
+    n_words = -(-width // 64)
+    packed = np.zeros((height, n_words * 8), dtype=np.uint8)
+    packed[:, :-(-width // 8)] = np.packbits(mask, axis=1, bitorder="little")
+    return np.ascontiguousarray(packed.view(np.uint64).T)
+
+
+def _unpack(words, width):
+    packed = np.ascontiguousarray(words.T).view(np.uint8)
+    mask = np.unpackbits(packed, axis=1, count=width, bitorder="little")
+    mask *= 255
+    return mask
+
+
+@lru_cache(maxsize=8)
+def _valid_bits(height, width):
+    return _pack(np.ones((height, width), dtype=np.uint8))
+
+
+# Dilasi horizontal 1 piksel ke kiri dan kanan (carry antar-word)
+def _grow(words):
+    grown = words | (words << _ONE)
+    grown |= words >> _ONE
+    grown[1:] |= words[:-1] >> _TOP_BIT
+    grown[:-1] |= words[1:] << _TOP_BIT
+    return grown
+
+
+# Dilasi elips: baris kernel dengan setengah lebar w menyumbang dilasi
+# horizontal sebesar w, digeser vertikal sesuai offset barisnya. Di luar mask
+# dianggap 0 (sama dengan border default cv2.dilate).
+def _dilate_bits(words, runs, valid):
+    radius = len(runs) // 2
+    grown = [words]
+    for _ in range(max(runs)):
+        grown.append(_grow(grown[-1]))
+    height = words.shape[1]
+    dilated = grown[runs[radius]].copy()
+    for dy in range(1, min(radius, height - 1) + 1):
+        dilated[:, :height - dy] |= grown[runs[radius + dy]][:, dy:]
+        dilated[:, dy:] |= grown[runs[radius - dy]][:, :height - dy]
+    dilated &= valid
+    return dilated
+
+
+# Erosi = komplemen dilasi komplemen (kernel elips simetris); di luar mask
+# dianggap 255 seperti border default cv2.erode
+def _close_bitpacked(mask, kernel_size):
+    height, width = mask.shape
+    runs = _kernel_runs(kernel_size)
+    valid = _valid_bits(height, width)
+    words = _dilate_bits(_pack(mask), runs, valid)
+    words ^= valid
+    words = _dilate_bits(words, runs, valid)
+    words ^= valid
+    return _unpack(words, width)
+
+
+_CLOSE = {
+    "exact": _close_exact,
+    "separable": _close_separable,
+    "downsample": _close_downsample,
+    "bitpacked": _close_bitpacked,
+}
+
+
+# Closing mask biner dengan backend yang dipilih
+def close_mask(mask, kernel_size=11, backend="exact"):
+    close = _CLOSE.get(backend)
+    if close is None:
+        raise ValueError(f"Backend morfologi tidak dikenal: {backend} (pilihan: {', '.join(MORPHOLOGY_BACKENDS)})")
+    return close(mask, kernel_size)
+
+
+# Halo (piksel) yang cukup agar closing per tile sama dengan closing citra
+# utuh di bagian inti tile, dan kelipatan yang harus dipenuhi posisi tile
+# (grid kasar backend downsample harus sejajar antar-tile)
+def close_halo(kernel_size, backend="exact"):
+    if backend == "downsample":
+        return DOWNSAMPLE_FACTOR * (2 * (_coarse_kernel_size(kernel_size) // 2) + 2), DOWNSAMPLE_FACTOR
+    if backend == "separable":
+        return 2 * (_square_kernel(kernel_size).shape[0] // 2), 1
+    return 2 * (kernel_size // 2), 1
@@ -0,0 +1,132 @@
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from image_pack import list_sources, load_source
+from morphology import MORPHOLOGY_BACKENDS, close_mask
+from pipeline_cielab import classify_maturity, color_masks
+
+# Laporan akurasi/latensi backend closing (morphology.py) pada satu folder:
+# IoU mask bersih terhadap backend exact, kecepatan relatif, persentase
+# gambar dengan status kematangan yang sama, dan IoU bbox kontur terbesar.
+# Timing dijalankan berurutan di satu proses, tiap gambar diulang beberapa
+# kali dan diambil nilai minimum agar noise penjadwalan tidak ikut terukur.
+
+REPORT_SIZE = (300, 300)  # ukuran pipeline generate_label
+REPEATS = 5
+
+
+def mask_iou(mask, reference):
+    union = cv2.countNonZero(cv2.bitwise_or(mask, reference))
+    if union == 0:
+        return 1.0
+    return cv2.countNonZero(cv2.bitwise_and(mask, reference)) / union
+
+
+def bbox_iou(bbox, reference):
+    if bbox is None or reference is None:
+        return 1.0 if bbox == reference else 0.0
+    x0, y0 = max(bbox[0], reference[0]), max(bbox[1], reference[1])
+    x1 = min(bbox[0] + bbox[2], reference[0] + reference[2])
+    y1 = min(bbox[1] + bbox[3], reference[1] + reference[3])
+    inter = max(0, x1 - x0) * max(0, y1 - y0)
+    return inter / (bbox[2] * bbox[3] + reference[2] * reference[3] - inter)
+
+
+# Label mode satu objek dari mask bersih (sama dengan pipeline_graph.LABEL_GRAPH)
+def _label(cleaned_mask, mask_red):
+    contours, _ = cv2.findContours(cleaned_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    total_area = sum(cv2.contourArea(cnt) for cnt in contours)
+    maturity = cv2.countNonZero(mask_red) / total_area * 100 if total_area > 0 else 0.0
+    bbox = cv2.boundingRect(max(contours, key=cv2.contourArea)) if contours else None
+    return classify_maturity(maturity), bbox
+
+
+def _best_time(func, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def morphology_report(folder, kernel_size=11, backends=MORPHOLOGY_BACKENDS, size=REPORT_SIZE, repeats=REPEATS):
+    sources = list_sources(folder)
+    stats = {backend: {"iou": [], "bbox_iou": [], "seconds": [], "same_class": 0} for backend in backends}
+    count = 0
+    for item in sources:
+        img = load_source(item, size)
+        if img is None:
+            continue
+        mask_red, _, combined_mask = color_masks(img)
+        if count == 0:
+            # Pemanasan: kernel dan tabel bit dibuat sekali di luar timing
+            for backend in backends:
+                close_mask(combined_mask, kernel_size, backend)
+        count += 1
+
+        reference = close_mask(combined_mask, kernel_size, "exact")
+        reference_class, reference_bbox = _label(reference, mask_red)
+        for backend in backends:
+            cleaned_mask = close_mask(combined_mask, kernel_size, backend)
+            status, bbox = _label(cleaned_mask, mask_red)
+            stats[backend]["iou"].append(mask_iou(cleaned_mask, reference))
+            stats[backend]["bbox_iou"].append(bbox_iou(bbox, reference_bbox))
+            stats[backend]["same_class"] += status == reference_class
+            stats[backend]["seconds"].append(
+                _best_time(lambda: close_mask(combined_mask, kernel_size, backend), repeats)
+            )
+
+    if not count:
+        return {"images": 0, "backends": {}}
+    reference_total = sum(stats["exact"]["seconds"]) if "exact" in stats else None
+    report = {"images": count, "kernel": kernel_size, "size": list(size), "backends": {}}
+    for backend, values in stats.items():
+        iou = np.asarray(values["iou"])
+        seconds = np.asarray(values["seconds"])
+        report["backends"][backend] = {
+            "iou_mean": float(iou.mean()),
+            "iou_min": float(iou.min()),
+            "iou_p5": float(np.percentile(iou, 5)),
+            "ms_median": float(np.median(seconds) * 1000),
+            "speedup": reference_total / seconds.sum() if reference_total else None,
+            "bbox_iou_mean": float(np.mean(values["bbox_iou"])),
+            "same_class": values["same_class"] / count,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{report['images']} gambar, kernel {report['kernel']}x{report['kernel']}, "
+          f"ukuran {report['size'][0]}x{report['size'][1]} (dibandingkan dengan exact)")
+    print(f"{'backend':<12} {'IoU rata2':>10} {'IoU p5':>8} {'IoU min':>8} {'IoU bbox':>9} {'kelas sama':>11} {'ms/gambar':>10} {'speedup':>8}")
+    for backend, row in report["backends"].items():
+        speedup = f"{row['speedup']:7.2f}x" if row["speedup"] else f"{'-':>8}"
+        print(f"{backend:<12} {row['iou_mean']:10.4f} {row['iou_p5']:8.4f} {row['iou_min']:8.4f} {row['bbox_iou_mean']:9.4f} "
+              f"{row['same_class'] * 100:10.1f}% {row['ms_median']:10.3f} {speedup}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bandingkan akurasi dan kecepatan backend closing pada satu folder")
+    parser.add_argument("folder", help="Folder gambar atau pack (image_pack.py)")
+    parser.add_argument("--kernel", type=int, default=11, help="Ukuran kernel closing (generate_label 11, proses_dataset_cielab 5)")
+    parser.add_argument("--size", type=int, nargs=2, default=REPORT_SIZE, metavar=("LEBAR", "TINGGI"))
+    parser.add_argument("--backends", nargs="+", choices=MORPHOLOGY_BACKENDS, default=MORPHOLOGY_BACKENDS)
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="Pengulangan timing per gambar (diambil minimum)")
+    parser.add_argument("--output", default=None, help="Simpan laporan sebagai JSON")
+    args = parser.parse_args()
+
+    backends = tuple(args.backends) if "exact" in args.backends else ("exact",) + tuple(args.backends)
+    report = morphology_report(args.folder, kernel_size=args.kernel, backends=backends, size=args.size, repeats=args.repeats)
+    if not report["images"]:
+        raise SystemExit("Tidak ada gambar yang dapat dibaca")
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Hasil disimpan di {args.output}")
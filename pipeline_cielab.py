@@ -0,0 +1,474 @@
+import os
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from morphology import close_mask
+from result_cache import CACHE_FOLDER
+
+# Resolusi kuantisasi gamma: nilai gamma dibulatkan ke kelipatan ini sebelum
+# mencari tabel LUT di cache, sehingga gamma otomatis yang hampir sama
+# memakai tabel yang sama
+GAMMA_STEP = 0.01
+GAMMA_CACHE_SIZE = 128
+
+# Jumlah sampel (kira-kira) yang dipakai untuk menghitung rata-rata intensitas
+AUTO_GAMMA_SAMPLES = 64 * 64
+
+# Rentang threshold default kanal a* (merah) dan b* (kuning) pada LAB 8-bit OpenCV
+RED_RANGE = (140, 210)
+YELLOW_RANGE = (165, 200)
+
+# Jumlah bit per kanal BGR untuk tabel klasifikasi warna. 8 bit = tabel
+# penuh 256^3 (16 MB, hasil identik dengan cvtColor + inRange); nilai lebih
+# kecil membuat tabel jauh lebih kecil (6 bit = 256 KB) tetapi hanya aproksimasi
+MASK_TABLE_BITS = 8
+MASK_TABLE_CACHE_SIZE = 4
+
+# Membangun tabel penuh (~0.4 detik) baru sebanding dengan hemat per piksel
+# setelah puluhan juta piksel. Sebelum jumlah piksel ini tercapai untuk satu
+# kombinasi threshold, color_masks memakai cvtColor + inRange (hasil sama),
+# sehingga proses pendek (satu gambar, CLI) tidak menanggung biaya tabel.
+# Layanan yang berjalan lama bisa langsung memanggil color_mask_table().
+MASK_TABLE_MIN_PIXELS = 1 << 26
+
+# Tabel yang sudah dibangun disimpan di disk dan dibuka dengan memory map oleh
+# proses berikutnya (termasuk worker), tanpa membangun ulang. Nama file memuat
+# threshold dan versi OpenCV, karena isi tabel bergantung pada konversi LAB-nya.
+MASK_TABLE_FOLDER = os.path.join(CACHE_FOLDER, "color_tables")
+
+# Bit hasil klasifikasi warna di dalam tabel
+MASK_RED_BIT = 1
+MASK_YELLOW_BIT = 2
+
+# LUT untuk mengubah bit klasifikasi menjadi mask 0/255 seperti cv2.inRange
+_BIT_VALUES = np.arange(256)
+_RED_LUT = np.where(_BIT_VALUES & MASK_RED_BIT, 255, 0).astype("uint8")
+_YELLOW_LUT = np.where(_BIT_VALUES & MASK_YELLOW_BIT, 255, 0).astype("uint8")
+_COMBINED_LUT = np.where(_BIT_VALUES & (MASK_RED_BIT | MASK_YELLOW_BIT), 255, 0).astype("uint8")
+
+# Nilai awal kelas YOLO untuk setiap status kematangan
+YOLO_CLASS = {"Matang": "1", "Mentah": "0", "Setengah Matang": "2"}
+# Nama status kematangan berdasarkan nomor kelas YOLO
+MATURITY_CLASSES = ("Mentah", "Matang", "Setengah Matang")
+
+# Luas minimum (piksel) sebuah komponen agar dianggap satu buah pada mode multi-objek
+MIN_FRUIT_AREA = 100
+
+# Hasil per buah pada mode multi-objek (satu baris per komponen)
+FRUIT_DTYPE = np.dtype([
+    ("x", np.int32),
+    ("y", np.int32),
+    ("w", np.int32),
+    ("h", np.int32),
+    ("area", np.int32),
+    ("red_area", np.int32),
+    ("maturity", np.float64),
+    ("kelas", np.int8),
+])
+
+
+def _quantize_gamma(gamma):
+    return int(round(gamma / GAMMA_STEP))
+
+
+# Tabel gamma 256 entri untuk satu kanal (disimpan di cache berdasarkan gamma terkuantisasi)
+@lru_cache(maxsize=GAMMA_CACHE_SIZE)
+def _gamma_table(gamma_q):
+    inv_gamma = 1.0 / (gamma_q * GAMMA_STEP)
+    table = ((np.arange(256) / 255.0) ** inv_gamma) * 255
+    table = table.astype("uint8")
+    table.flags.writeable = False
+    return table
+
+
+# Tabel 3 kanal untuk citra LAB: kanal L memakai gamma, kanal a dan b identitas
+@lru_cache(maxsize=GAMMA_CACHE_SIZE)
+def _lightness_table(gamma_q):
+    identity = np.arange(256, dtype="uint8")
+    table = np.dstack((_gamma_table(gamma_q), identity, identity))
+    table.flags.writeable = False
+    return table
+
+
+def gamma_table(gamma):
+    return _gamma_table(_quantize_gamma(gamma))
+
+
+# Fungsi untuk gamma correction pada kanal L (lightness) citra LAB.
+# Dilakukan in-place dengan satu LUT 3 kanal, tanpa cv2.split/cv2.merge.
+def adjust_lightness(img_lab, gamma=1.0):
+    gamma_q = _quantize_gamma(gamma)
+    if gamma_q * GAMMA_STEP == 1.0:
+        return img_lab
+    return cv2.LUT(img_lab, _lightness_table(gamma_q), dst=img_lab)
+
+
+# Rata-rata intensitas grayscale dihitung dari tampilan citra yang di-subsample
+# (strided view, tanpa konversi grayscale resolusi penuh)
+def mean_intensity(img, samples=AUTO_GAMMA_SAMPLES):
+    h, w = img.shape[:2]
+    step = max(1, int(np.sqrt(h * w / samples)))
+    b, g, r = img[::step, ::step].reshape(-1, 3).mean(axis=0)
+    return 0.114 * b + 0.587 * g + 0.299 * r
+
+
+# Gamma otomatis: gamma = intensitas target / rata-rata intensitas
+def estimate_gamma(img, target_intensity=128):
+    intensity = mean_intensity(img)
+    if intensity <= 0:
+        return 1.0
+    return target_intensity / intensity
+
+
+# Fungsi untuk gamma correction otomatis pada citra BGR
+def adjust_gamma(img, target_intensity=128):
+    gamma = estimate_gamma(img, target_intensity)
+    return cv2.LUT(img, gamma_table(gamma))
+
+
+# Tabel klasifikasi BGR -> bit {merah, kuning}. Dibangun sekali per kombinasi
+# threshold dengan cvtColor + inRange pada semua warna (per bidang R agar
+# memori sementara kecil); threshold baru otomatis membangun tabel baru.
+# Urutan indeks: (R << 2k) | (G << k) | B, sama dengan urutan byte piksel BGRA
+# yang dibaca sebagai uint32 little-endian.
+def _table_path(red_range, yellow_range, bits):
+    name = f"mask_r{red_range[0]}-{red_range[1]}_y{yellow_range[0]}-{yellow_range[1]}_{bits}bit_cv{cv2.__version__}.npy"
+    return os.path.join(MASK_TABLE_FOLDER, name)
+
+
+def _load_table(path, size):
+    try:
+        table = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    return table if table.shape == (size,) and table.dtype == np.uint8 else None
+
+
+# Penyimpanan tabel bersifat best effort (folder cache tidak wajib dapat ditulis)
+def _save_table(path, table):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as file:
+            np.save(file, table)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+@lru_cache(maxsize=MASK_TABLE_CACHE_SIZE)
+def color_mask_table(red_range=RED_RANGE, yellow_range=YELLOW_RANGE, bits=MASK_TABLE_BITS):
+    path = _table_path(red_range, yellow_range, bits)
+    table = _load_table(path, 1 << (3 * bits))
+    if table is not None:
+        _ready_tables.add((red_range, yellow_range, bits))
+        return table
+
+    levels = 1 << bits
+    shift = 8 - bits
+    # Setiap level terkuantisasi diwakili oleh nilai tengah rentangnya
+    values = ((np.arange(levels) << shift) + ((1 << shift) >> 1)).astype("uint8")
+    g, b = np.meshgrid(values, values, indexing="ij")
+    plane = np.empty((levels, levels, 3), dtype="uint8")
+    plane[:, :, 0] = b
+    plane[:, :, 1] = g
+
+    table = np.empty((levels, levels, levels), dtype="uint8")
+    for i, r in enumerate(values):
+        plane[:, :, 2] = r
+        plane_lab = cv2.cvtColor(plane, cv2.COLOR_BGR2LAB)
+        mask_red = cv2.inRange(plane_lab[:, :, 1], *red_range)
+        mask_yellow = cv2.inRange(plane_lab[:, :, 2], *yellow_range)
+        table[i] = (mask_red & MASK_RED_BIT) | (mask_yellow & MASK_YELLOW_BIT)
+    table = table.reshape(-1)
+    table.flags.writeable = False
+    _save_table(path, table)
+    _ready_tables.add((red_range, yellow_range, bits))
+    return table
+
+
+# Kombinasi threshold yang tabelnya sudah dibangun, dan jumlah piksel yang
+# sudah dimasking lewat cvtColor + inRange untuk kombinasi yang belum
+_ready_tables = set()
+_reference_pixels = {}
+
+
+# Indeks tabel untuk setiap piksel. Citra diubah ke BGRA (SIMD di OpenCV) lalu
+# dibaca sebagai uint32, sehingga untuk 8 bit indeks cukup satu operasi AND.
+def _color_index(img, bits):
+    bgra = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+    packed = bgra.view(np.uint32)[:, :, 0]
+    if bits == 8:
+        np.bitwise_and(packed, 0xFFFFFF, out=packed)
+        return packed
+    shift = 8 - bits
+    mask = (1 << bits) - 1
+    index = (packed >> shift) & mask
+    index |= (packed >> (8 + shift - bits)) & (mask << bits)
+    index |= (packed >> (16 + shift - 2 * bits)) & (mask << (2 * bits))
+    return index
+
+
+def _table_color_masks(img, table, bits):
+    mask_bits = np.take(table, _color_index(img, bits))
+    mask_red = cv2.LUT(mask_bits, _RED_LUT)
+    mask_yellow = cv2.LUT(mask_bits, _YELLOW_LUT)
+    combined_mask = cv2.LUT(mask_bits, _COMBINED_LUT)
+    return mask_red, mask_yellow, combined_mask
+
+
+# Satu lookup per piksel menghasilkan mask_red, mask_yellow, dan combined_mask
+# sekaligus (pengganti cvtColor LAB + dua inRange + bitwise_or). Tabel 8 bit
+# dipakai jika sudah ada di disk atau setelah MASK_TABLE_MIN_PIXELS piksel;
+# tabel aproksimasi (bits < 8) selalu langsung dipakai karena hasilnya
+# berbeda dari cvtColor + inRange.
+def color_masks(img, red_range=RED_RANGE, yellow_range=YELLOW_RANGE, bits=MASK_TABLE_BITS):
+    key = (tuple(red_range), tuple(yellow_range), bits)
+    if bits == 8 and key not in _ready_tables and not os.path.exists(_table_path(*key)):
+        pixels = _reference_pixels.get(key, 0) + img.shape[0] * img.shape[1]
+        if pixels < MASK_TABLE_MIN_PIXELS:
+            _reference_pixels[key] = pixels
+            return reference_color_masks(img, red_range, yellow_range)
+    return _table_color_masks(img, color_mask_table(*key), bits)
+
+
+# Masking dengan cara lama (cvtColor LAB + inRange), dipakai sebagai referensi
+def reference_color_masks(img, red_range=RED_RANGE, yellow_range=YELLOW_RANGE):
+    img_lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+    mask_red = cv2.inRange(img_lab[:, :, 1], *red_range)
+    mask_yellow = cv2.inRange(img_lab[:, :, 2], *yellow_range)
+    combined_mask = cv2.bitwise_or(mask_red, mask_yellow)
+    return mask_red, mask_yellow, combined_mask
+
+
+# Cek paritas tabel klasifikasi terhadap cvtColor + inRange.
+# Mengembalikan jumlah piksel yang berbeda untuk setiap mask.
+def check_mask_parity(img, red_range=RED_RANGE, yellow_range=YELLOW_RANGE, bits=MASK_TABLE_BITS):
+    fast = _table_color_masks(img, color_mask_table(tuple(red_range), tuple(yellow_range), bits), bits)
+    reference = reference_color_masks(img, red_range, yellow_range)
+    report = {"pixels": img.shape[0] * img.shape[1]}
+    for name, mask_fast, mask_ref in zip(("mask_red", "mask_yellow", "combined_mask"), fast, reference):
+        report[name] = cv2.countNonZero(cv2.compare(mask_fast, mask_ref, cv2.CMP_NE))
+    report["match"] = not (report["mask_red"] or report["mask_yellow"] or report["combined_mask"])
+    return report
+
+
+# Klasifikasi kematangan berdasarkan persentase area merah
+def classify_maturity(maturity_persentase, matang_cutoff=80, mentah_cutoff=20):
+    if maturity_persentase >= matang_cutoff:
+        return "Matang"
+    elif mentah_cutoff < maturity_persentase < matang_cutoff:
+        return "Setengah Matang"
+    return "Mentah"
+
+
+# Klasifikasi kematangan untuk array persentase (tanpa loop Python).
+# Mengembalikan nomor kelas YOLO, lihat MATURITY_CLASSES.
+def classify_maturity_array(maturity, matang_cutoff=80, mentah_cutoff=20):
+    kelas = np.zeros(maturity.shape, dtype=np.int8)
+    kelas[(maturity > mentah_cutoff) & (maturity < matang_cutoff)] = 2
+    kelas[maturity >= matang_cutoff] = 1
+    return kelas
+
+
+# Deteksi per buah dengan satu kali connected components pada cleaned_mask.
+# Luas, bbox, dan jumlah piksel merah setiap buah dihitung sekaligus
+# (stats OpenCV + bincount label di posisi mask_red), tanpa loop per kontur.
+def detect_fruits(cleaned_mask, mask_red, min_area=MIN_FRUIT_AREA, matang_cutoff=80, mentah_cutoff=20):
+    n_labels, labels, stats, _ = cv2.connectedComponentsWithStats(cleaned_mask, connectivity=8)
+    red_counts = np.bincount(labels[mask_red > 0], minlength=n_labels)
+
+    # Label 0 adalah background
+    stats = stats[1:]
+    red_counts = red_counts[1:]
+    keep = stats[:, cv2.CC_STAT_AREA] >= min_area
+    stats = stats[keep]
+    red_counts = red_counts[keep]
+
+    fruits = np.zeros(len(stats), dtype=FRUIT_DTYPE)
+    fruits["x"] = stats[:, cv2.CC_STAT_LEFT]
+    fruits["y"] = stats[:, cv2.CC_STAT_TOP]
+    fruits["w"] = stats[:, cv2.CC_STAT_WIDTH]
+    fruits["h"] = stats[:, cv2.CC_STAT_HEIGHT]
+    fruits["area"] = stats[:, cv2.CC_STAT_AREA]
+    fruits["red_area"] = red_counts
+    fruits["maturity"] = red_counts / np.maximum(fruits["area"], 1) * 100
+    fruits["kelas"] = classify_maturity_array(fruits["maturity"], matang_cutoff, mentah_cutoff)
+    return fruits
+
+
+# Fungsi untuk menggambar bounding box
+def draw_bounding_box(img, contours):
+    if not contours:
+        return img, None
+    x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+    img_with_box = img.copy()
+    cv2.rectangle(img_with_box, (x, y), (x + w, y + h), (255, 0, 0), 2)
+    return img_with_box, (x, y, w, h)
+
+
+# Fungsi untuk menghitung format YOLO
+def calculate_yolo_format(img_shape, bbox):
+    if not bbox:
+        return None
+    img_h, img_w = img_shape[:2]
+    x, y, w, h = bbox
+
+    # Hitung nilai YOLO format
+    x_center = (x + w / 2) / img_w
+    y_center = (y + h / 2) / img_h
+    width = w / img_w
+    height = h / img_h
+
+    return f"1 {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}"
+
+
+# Fungsi untuk menggambar bounding box setiap buah (mode multi-objek)
+def draw_fruit_boxes(img, fruits):
+    img_with_box = img.copy()
+    for x, y, w, h in zip(fruits["x"], fruits["y"], fruits["w"], fruits["h"]):
+        cv2.rectangle(img_with_box, (int(x), int(y)), (int(x + w), int(y + h)), (255, 0, 0), 2)
+    return img_with_box
+
+
+# Baris label YOLO sebagai array: kelas + bbox ternormalisasi (x_center, y_center, width, height)
+YOLO_ROW_DTYPE = np.dtype([
+    ("kelas", np.int8),
+    ("x_center", np.float64),
+    ("y_center", np.float64),
+    ("width", np.float64),
+    ("height", np.float64),
+])
+
+
+# Baris YOLO untuk semua buah hasil detect_fruits, satu baris per buah
+def yolo_rows(img_shape, fruits):
+    img_h, img_w = img_shape[:2]
+    rows = np.zeros(len(fruits), dtype=YOLO_ROW_DTYPE)
+    rows["kelas"] = fruits["kelas"]
+    rows["x_center"] = (fruits["x"] + fruits["w"] / 2) / img_w
+    rows["y_center"] = (fruits["y"] + fruits["h"] / 2) / img_h
+    rows["width"] = fruits["w"] / img_w
+    rows["height"] = fruits["h"] / img_h
+    return rows
+
+
+# Baris YOLO untuk satu bbox (mode satu objek). Tanpa bbox (tidak ada kontur)
+# hasilnya array kosong, yang di YOLO berarti gambar tanpa objek.
+def bbox_yolo_rows(img_shape, bbox, kelas):
+    if not bbox:
+        return np.zeros(0, dtype=YOLO_ROW_DTYPE)
+    img_h, img_w = img_shape[:2]
+    x, y, w, h = bbox
+    return np.array([(kelas, (x + w / 2) / img_w, (y + h / 2) / img_h, w / img_w, h / img_h)], dtype=YOLO_ROW_DTYPE)
+
+
+def format_yolo_rows(rows):
+    return [
+        f"{kelas} {xc:.6f} {yc:.6f} {w:.6f} {h:.6f}"
+        for kelas, xc, yc, w, h in zip(rows["kelas"], rows["x_center"], rows["y_center"], rows["width"], rows["height"])
+    ]
+
+
+# Kebalikan format_yolo_rows: teks label YOLO (satu baris per objek) ke array.
+# Baris kosong atau tidak lengkap diabaikan.
+def parse_yolo_rows(text):
+    values = [line.split() for line in (text or "").splitlines()]
+    return np.array([(int(v[0]), *map(float, v[1:5])) for v in values if len(v) >= 5], dtype=YOLO_ROW_DTYPE)
+
+
+# Format YOLO untuk semua buah: satu baris per buah dengan kelas masing-masing
+def format_yolo_labels(img_shape, fruits):
+    return format_yolo_rows(yolo_rows(img_shape, fruits))
+
+
+# Hasil analyze_batch mode satu objek: satu baris per gambar. Bbox kontur
+# terbesar (w = h = 0 jika tidak ada buah).
+ANALYSIS_DTYPE = np.dtype([
+    ("maturity", np.float64),
+    ("kelas", np.int8),
+    ("total_area", np.float64),
+    ("red_area", np.int64),
+    ("x", np.int32),
+    ("y", np.int32),
+    ("w", np.int32),
+    ("h", np.int32),
+])
+
+# Hasil analyze_batch mode multi-objek: FRUIT_DTYPE ditambah nomor gambar
+BATCH_FRUIT_DTYPE = np.dtype([("image", np.int32)] + FRUIT_DTYPE.descr)
+
+# Jumlah piksel per sub-batch masking. Satu tumpukan raksasa justru lebih
+# lambat (buffer BGRA/indeks tidak muat di cache); ~0.5 MP per langkah cukup
+# untuk mengamortisasi overhead per panggilan.
+BATCH_PIXELS = 1 << 19
+
+
+# Mask warna untuk banyak citra sekaligus. Citra berukuran sama ditumpuk
+# menjadi satu citra tinggi (N*H, W) sehingga konversi, lookup tabel, dan
+# LUT berjalan sekali untuk seluruh batch; hasilnya (N, H, W).
+def batch_color_masks(images, red_range=RED_RANGE, yellow_range=YELLOW_RANGE):
+    images = np.asarray(images)
+    n, height, width = images.shape[:3]
+    masks = color_masks(images.reshape(n * height, width, 3), red_range=red_range, yellow_range=yellow_range)
+    return tuple(mask.reshape(n, height, width) for mask in masks)
+
+
+# Analisis kematangan untuk citra BGR yang sudah ada di memori: array
+# (N, H, W, 3) atau list citra (ukuran boleh berbeda). Masking warna dan
+# penghitungan piksel merah berjalan per sub-batch; hanya closing dan
+# kontur/connected components yang per citra. Hasilnya sama dengan pipeline
+# label (generate_label) untuk setiap citra.
+# Mode satu objek mengembalikan array ANALYSIS_DTYPE (satu baris per citra);
+# mode multi-objek array BATCH_FRUIT_DTYPE (satu baris per buah).
+# morphology memilih backend closing (lihat morphology.py).
+def analyze_batch(images, red_range=RED_RANGE, yellow_range=YELLOW_RANGE, kernel_size=11,
+                  matang_cutoff=80, mentah_cutoff=20, multi_object=False, min_area=MIN_FRUIT_AREA, morphology="exact"):
+    if isinstance(images, np.ndarray) and images.ndim == 4:
+        groups = [(np.arange(len(images)), images)]
+    else:
+        # Kelompokkan citra berukuran sama agar tetap diproses per batch
+        by_shape = {}
+        for i, img in enumerate(images):
+            by_shape.setdefault(img.shape, []).append(i)
+        groups = [(np.array(index), np.stack([images[i] for i in index])) for index in by_shape.values()]
+
+    n_images = sum(len(index) for index, _ in groups)
+    results = np.zeros(n_images, dtype=ANALYSIS_DTYPE)
+    bboxes = results[["x", "y", "w", "h"]]
+    fruits = []
+
+    for group_index, group in groups:
+        step = max(1, BATCH_PIXELS // (group.shape[1] * group.shape[2]))
+        for start in range(0, len(group), step):
+            index = group_index[start:start + step]
+            masks_red, _, combined = batch_color_masks(group[start:start + step], red_range, yellow_range)
+            red_sums = cv2.reduce(masks_red.reshape(len(index), -1), 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S)
+            results["red_area"][index] = red_sums.ravel() // 255
+
+            for position, i in enumerate(index):
+                cleaned_mask = close_mask(combined[position], kernel_size, morphology)
+                if multi_object:
+                    per_image = detect_fruits(cleaned_mask, masks_red[position], min_area, matang_cutoff, mentah_cutoff)
+                    rows = np.zeros(len(per_image), dtype=BATCH_FRUIT_DTYPE)
+                    rows["image"] = i
+                    for name in FRUIT_DTYPE.names:
+                        rows[name] = per_image[name]
+                    fruits.append(rows)
+                    continue
+                contours, _ = cv2.findContours(cleaned_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+                results["total_area"][i] = sum(cv2.contourArea(cnt) for cnt in contours)
+                if contours:
+                    bboxes[i] = cv2.boundingRect(max(contours, key=cv2.contourArea))
+
+    if multi_object:
+        fruits = np.concatenate(fruits) if fruits else np.zeros(0, dtype=BATCH_FRUIT_DTYPE)
+        return fruits[np.argsort(fruits["image"], kind="stable")]
+
+    total = results["total_area"]
+    results["maturity"] = np.divide(results["red_area"], total, out=np.zeros(n_images), where=total > 0) * 100
+    results["kelas"] = classify_maturity_array(results["maturity"], matang_cutoff, mentah_cutoff)
+    return results
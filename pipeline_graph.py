@@ -0,0 +1,196 @@
+import cv2
+
+import instrumentation
+from morphology import close_mask
+from pipeline_cielab import (
+    MIN_FRUIT_AREA,
+    RED_RANGE,
+    YELLOW_RANGE,
+    YOLO_CLASS,
+    adjust_lightness,
+    bbox_yolo_rows,
+    classify_maturity,
+    color_masks,
+    detect_fruits,
+    draw_bounding_box,
+    draw_fruit_boxes,
+    yolo_rows,
+)
+
+# Pipeline sebagai graph stage bernama yang dievaluasi secara lazy: run()
+# hanya menghitung stage yang dibutuhkan output yang diminta (beserta
+# dependensinya), masing-masing sekali. Stage dengan predikat identity yang
+# bernilai benar untuk parameter yang dipakai tidak dijalankan; hasilnya
+# langsung input pertamanya (misalnya gamma 1.0).
+
+
+class Stage:
+    __slots__ = ("name", "func", "deps", "identity")
+
+    def __init__(self, name, func, deps, identity):
+        self.name = name
+        self.func = func
+        self.deps = deps
+        self.identity = identity
+
+
+class StageGraph:
+    def __init__(self):
+        self.stages = {}
+
+    # Mendaftarkan stage: func(params, *nilai_deps). deps boleh berupa fungsi
+    # params -> tuple untuk dependensi yang bergantung mode (misalnya multi-objek).
+    def stage(self, name, deps=(), identity=None):
+        def register(func):
+            self.stages[name] = Stage(name, func, deps, identity)
+            return func
+        return register
+
+    def deps_of(self, name, params):
+        deps = self.stages[name].deps
+        return tuple(deps(params) if callable(deps) else deps)
+
+    def is_identity(self, name, params):
+        identity = self.stages[name].identity
+        return identity is not None and identity(params)
+
+    # Menghitung output yang diminta. inputs: nilai awal (misalnya img=...).
+    # Mengembalikan dict berisi output yang diminta saja.
+    def run(self, outputs, params, **inputs):
+        values = dict(inputs)
+
+        def evaluate(name):
+            if name in values:
+                return values[name]
+            if name not in self.stages:
+                raise KeyError(f"Stage atau input tidak dikenal: {name}")
+            deps = self.deps_of(name, params)
+            if self.is_identity(name, params):
+                value = evaluate(deps[0])
+            else:
+                args = [evaluate(dep) for dep in deps]
+                with instrumentation.span(name):
+                    value = self.stages[name].func(params, *args)
+            values[name] = value
+            return value
+
+        return {name: evaluate(name) for name in outputs}
+
+
+# Parameter default pipeline label/GUI (dapat ditimpa per pemanggilan)
+LABEL_PARAMS = {
+    "gamma": 1.0,
+    "red_range": RED_RANGE,
+    "yellow_range": YELLOW_RANGE,
+    "kernel": 11,
+    "morphology": "exact",
+    "canny": (50, 150),
+    "matang_cutoff": 80,
+    "mentah_cutoff": 20,
+    "min_area": MIN_FRUIT_AREA,
+    "multi_object": False,
+}
+
+LABEL_GRAPH = StageGraph()
+_stage = LABEL_GRAPH.stage
+
+
+def _multi(params):
+    return params.get("multi_object", False)
+
+
+@_stage("img_gamma", deps=("img",), identity=lambda params: params["gamma"] == 1.0)
+def _img_gamma(params, img):
+    img_lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+    return cv2.cvtColor(adjust_lightness(img_lab, gamma=params["gamma"]), cv2.COLOR_LAB2BGR)
+
+
+@_stage("color_masks", deps=("img",))
+def _color_masks(params, img):
+    return color_masks(img, red_range=params["red_range"], yellow_range=params["yellow_range"])
+
+
+@_stage("mask_red", deps=("color_masks",))
+def _mask_red(params, masks):
+    return masks[0]
+
+
+@_stage("combined_mask", deps=("color_masks",))
+def _combined_mask(params, masks):
+    return masks[2]
+
+
+@_stage("cleaned_mask", deps=("combined_mask",))
+def _cleaned_mask(params, combined_mask):
+    return close_mask(combined_mask, params["kernel"], params["morphology"])
+
+
+@_stage("edges", deps=("img_gamma",))
+def _edges(params, img_gamma):
+    gray = cv2.cvtColor(img_gamma, cv2.COLOR_BGR2GRAY)
+    return cv2.Canny(gray, *params["canny"])
+
+
+@_stage("contours", deps=("cleaned_mask",))
+def _contours(params, cleaned_mask):
+    contours, _ = cv2.findContours(cleaned_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return contours
+
+
+@_stage("fruits", deps=("cleaned_mask", "mask_red"))
+def _fruits(params, cleaned_mask, mask_red):
+    return detect_fruits(cleaned_mask, mask_red, min_area=params["min_area"],
+                         matang_cutoff=params["matang_cutoff"], mentah_cutoff=params["mentah_cutoff"])
+
+
+@_stage("total_area", deps=lambda params: ("fruits",) if _multi(params) else ("contours",))
+def _total_area(params, source):
+    if _multi(params):
+        return int(source["area"].sum())
+    return sum(cv2.contourArea(cnt) for cnt in source)
+
+
+@_stage("red_area", deps=lambda params: ("fruits",) if _multi(params) else ("mask_red",))
+def _red_area(params, source):
+    if _multi(params):
+        return int(source["red_area"].sum())
+    return cv2.countNonZero(source)
+
+
+@_stage("maturity_persentase", deps=("total_area", "red_area"))
+def _maturity_persentase(params, total_area, red_area):
+    return (red_area / total_area) * 100 if total_area > 0 else 0.0
+
+
+@_stage("status_kematangan", deps=("maturity_persentase",))
+def _status_kematangan(params, maturity_persentase):
+    return classify_maturity(maturity_persentase, matang_cutoff=params["matang_cutoff"], mentah_cutoff=params["mentah_cutoff"])
+
+
+# Bbox kontur terbesar (mode satu objek); None jika tidak ada kontur
+@_stage("bbox", deps=("contours",))
+def _bbox(params, contours):
+    if not contours:
+        return None
+    return cv2.boundingRect(max(contours, key=cv2.contourArea))
+
+
+@_stage("yolo_rows", deps=lambda params: ("img", "fruits") if _multi(params) else ("img", "bbox", "status_kematangan"))
+def _yolo_rows(params, img, *source):
+    if _multi(params):
+        return yolo_rows(img.shape, source[0])
+    bbox, status_kematangan = source
+    return bbox_yolo_rows(img.shape, bbox, int(YOLO_CLASS[status_kematangan]))
+
+
+@_stage("img_with_box", deps=lambda params: ("img", "fruits") if _multi(params) else ("img", "contours"))
+def _img_with_box(params, img, source):
+    if _multi(params):
+        return draw_fruit_boxes(img, source)
+    return draw_bounding_box(img, source)[0]
+
+
+# Menjalankan pipeline label untuk citra BGR yang sudah di-resize
+def run_label_pipeline(img, outputs, params=None, **overrides):
+    params = {**LABEL_PARAMS, **(params or {}), **overrides}
+    return LABEL_GRAPH.run(outputs, params, img=img)
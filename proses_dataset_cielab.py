@@ -1,43 +1,124 @@
+import argparse
 import cv2
-import numpy as np
 import os
+from collections import Counter
+from functools import partial
 
-# Fungsi untuk gamma correction
-def adjust_gamma(img, gamma=1.0):
-    mean_intensity = np.mean(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
-    target_intensity = 128
-    gamma = target_intensity / mean_intensity
-    inv_gamma = 1.0 / gamma
-    table = np.array([((i / 255.0) ** inv_gamma) * 255 for i in np.arange(0, 256)]).astype("uint8")
-    return cv2.LUT(img, table)
-
-# Fungsi untuk memproses gambar
-def process_image(image_path, output_base_path):
-    # Load gambar
-    img = cv2.imread(image_path)
+import instrumentation
+from batch_engine import ProgressReporter, run_batch
+from image_loader import decode_image, read_image_bytes
+from image_pack import PackedImage, list_sources, load_source
+from image_sorter import SORT_MODES, sort_images
+from label_manifest import params_fingerprint
+from morphology import MORPHOLOGY_BACKENDS, close_mask
+from pipeline_cielab import MATURITY_CLASSES, adjust_gamma, classify_maturity, color_masks
+from result_cache import ResultCache
+
+# Parameter pipeline yang mempengaruhi hasil klasifikasi (bagian dari key cache)
+PIPELINE_PARAMS = {
+    "pipeline": "proses_dataset_cielab",
+    "size": (250, 300),
+    "decode": "reduced",
+    "red_range": (140, 200),
+    "kernel": 5,
+    "morphology": "exact",
+    "canny": (50, 150),
+    "matang_cutoff": 85,
+    "mentah_cutoff": 20,
+}
+
+# Folder dataset default saat skrip dijalankan langsung tanpa argumen
+DEFAULT_INPUT_FOLDER = r"D:\Materi Kuliah Debby\Project Semester 5\RoboBloom\dataset strawberry"
+
+# Cache hasil per proses worker (dibuat saat pertama dipakai)
+_result_cache = None
+
+def get_result_cache(cache_folder, morphology=PIPELINE_PARAMS["morphology"]):
+    global _result_cache
+    params = dict(PIPELINE_PARAMS, morphology=morphology)
+    if _result_cache is None or _result_cache.disk_folder != cache_folder or _result_cache.fingerprint != params_fingerprint(params):
+        _result_cache = ResultCache(params, disk_folder=cache_folder)
+    return _result_cache
+
+# Fungsi untuk memproses gambar. Jika instrumentasi aktif, metrik yang
+# terkumpul di worker ikut dikembalikan di result["metrics"].
+# morphology memilih backend closing (lihat morphology.py).
+def process_image(image_path, cache_folder=None, morphology=PIPELINE_PARAMS["morphology"]):
+    result = _process_image(image_path, cache_folder, morphology)
+    if instrumentation.enabled:
+        if "error" in result:
+            instrumentation.count("images_total", status="unreadable")
+        else:
+            instrumentation.count("images_total", status="cached" if result.get("cached") else "processed")
+            instrumentation.count("maturity_class_total", kelas=result["status_kematangan"])
+            instrumentation.observe("maturity_percent", result["maturity_persentase"])
+        result["metrics"] = instrumentation.drain()
+    return result
+
+def _process_image(image_path, cache_folder=None, morphology=PIPELINE_PARAMS["morphology"]):
+    # Gambar dari pack sudah terdecode: tanpa baca file, cache, dan decode.
+    # Path hasil adalah file asli, yang nantinya ditempatkan ke folder kelas.
+    if isinstance(image_path, PackedImage):
+        with instrumentation.span("decode"):
+            img = load_source(image_path, PIPELINE_PARAMS["size"])
+        return classify_image(img, image_path.source, morphology)
+
+    # Baca file sekali; buffer yang sama dipakai untuk decode dan key cache
+    with instrumentation.span("read"):
+        try:
+            data = read_image_bytes(image_path)
+        except OSError:
+            data = None
+    if data is None or data.size == 0:
+        return {"path": image_path, "error": "Tidak dapat membaca gambar"}
+
+    # Jika hasil untuk isi gambar yang sama sudah ada di cache, lewati decode dan pipeline
+    cache = get_result_cache(cache_folder, morphology) if cache_folder else None
+    cache_key = cache.key_for_bytes(data) if cache else None
+    cached = cache.get(cache_key) if cache else None
+    if cached is not None:
+        return {
+            "path": image_path,
+            "total_area": cached["total_area"],
+            "red_area": cached["red_area"],
+            "maturity_persentase": cached["maturity_persentase"],
+            "status_kematangan": cached["status_kematangan"],
+            "cached": True,
+        }
+
+    # Decode JPEG langsung ke skala tereduksi terdekat lalu resize ke 250x300
+    with instrumentation.span("decode"):
+        img = decode_image(data, (250, 300))
     if img is None:
-        print(f"Error: Tidak dapat membaca gambar {image_path}")
-        return
-    
-    img = cv2.resize(img, (250, 300))
-    img_gamma = adjust_gamma(img)  # gamma correction
+        return {"path": image_path, "error": "Tidak dapat membaca gambar"}
+
+    result = classify_image(img, image_path, morphology)
+    if cache:
+        cache.put(cache_key, result)
+    return result
+
+# Fungsi untuk mengklasifikasi satu citra BGR 250x300 yang sudah didecode
+def classify_image(img, image_path, morphology=PIPELINE_PARAMS["morphology"]):
+    with instrumentation.span("gamma"):
+        img_gamma = adjust_gamma(img)  # gamma correction
     
-    # Konversi ke LAB dan masking warna merah
-    img_lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-    _, a_channel, _ = cv2.split(img_lab)
+    # Masking warna merah (kanal a*) lewat tabel klasifikasi BGR
     lower_red, upper_red = 140, 200
-    mask_red = cv2.inRange(a_channel, lower_red, upper_red)
+    with instrumentation.span("color_masks"):
+        mask_red, _, _ = color_masks(img, red_range=(lower_red, upper_red))
     
     # Deteksi tepi dan kontur
-    gray = cv2.cvtColor(img_gamma, cv2.COLOR_BGR2GRAY)
-    edges = cv2.Canny(gray, 50, 150)
-    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    total_area = sum(cv2.contourArea(cnt) for cnt in contours)
+    with instrumentation.span("canny"):
+        gray = cv2.cvtColor(img_gamma, cv2.COLOR_BGR2GRAY)
+        edges = cv2.Canny(gray, 50, 150)
+    with instrumentation.span("contours"):
+        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        total_area = sum(cv2.contourArea(cnt) for cnt in contours)
     
     # Final masking area merah
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-    mask_red_cleaned = cv2.morphologyEx(mask_red, cv2.MORPH_CLOSE, kernel)
-    mask_red_area = cv2.bitwise_and(img_gamma, img_gamma, mask=mask_red_cleaned)
+    with instrumentation.span("morphology"):
+        mask_red_cleaned = close_mask(mask_red, PIPELINE_PARAMS["kernel"], morphology)
+        mask_red_area = cv2.bitwise_and(img_gamma, img_gamma, mask=mask_red_cleaned)
     
     # Hitung area merah
     red_area = cv2.countNonZero(mask_red_cleaned)
@@ -47,40 +128,95 @@ def process_image(image_path, output_base_path):
         maturity_persentase = 0.0
     
     # Klasifikasi kematangan
-    if maturity_persentase >= 85:
-        status_kematangan = "Matang"
-    elif 20 < maturity_persentase < 85:
-        status_kematangan = "Setengah Matang"
-    else:
-        status_kematangan = "Mentah"
+    status_kematangan = classify_maturity(maturity_persentase, matang_cutoff=85)
         
-    # Tampilkan hasil
-    print(f"\n----    Hasil untuk {os.path.basename(image_path)}    ----")
-    print(f"Total luas: {total_area:.2f} piksel")
-    print(f"Luas area merah: {red_area:.2f} piksel")
-    print(f"Persentase kematangan: {maturity_persentase:.2f}%")
-    print(f"Status kematangan: {status_kematangan}")
-    
-    # Buat folder output berdasarkan klasifikasi
-    klasifikasi_folder = os.path.join(output_base_path, status_kematangan)
-    if not os.path.exists(klasifikasi_folder):
-        os.makedirs(klasifikasi_folder)
-    
-    # Simpan gambar hasil olahan
-    output_path = os.path.join(klasifikasi_folder, os.path.basename(image_path))
-    cv2.imwrite(output_path, img)  # Simpan gambar asli ke folder klasifikasi
+    return {
+        "path": image_path,
+        "total_area": total_area,
+        "red_area": red_area,
+        "maturity_persentase": maturity_persentase,
+        "status_kematangan": status_kematangan,
+    }
+
+# Fungsi untuk menampilkan hasil per gambar (dipanggil di proses utama, bukan di worker)
+def print_result(result):
+    if "error" in result:
+        print(f"Error: {result['error']} {result['path']}")
+        return
+    print(f"\n----    Hasil untuk {os.path.basename(result['path'])}    ----")
+    print(f"Total luas: {result['total_area']:.2f} piksel")
+    print(f"Luas area merah: {result['red_area']:.2f} piksel")
+    print(f"Persentase kematangan: {result['maturity_persentase']:.2f}%")
+    print(f"Status kematangan: {result['status_kematangan']}")
+
+# Fungsi untuk menampilkan ringkasan seluruh batch
+def print_summary(results, elapsed):
+    counts = Counter(r.get("status_kematangan", "Error") for r in results)
+    rate = len(results) / elapsed if elapsed > 0 else 0.0
+    print(f"\n----    Ringkasan ({len(results)} gambar, {elapsed:.2f} detik, {rate:.1f} gambar/detik)    ----")
+    cached = sum(1 for r in results if r.get("cached"))
+    if cached:
+        print(f"Dari cache: {cached}")
+    for status in ("Matang", "Setengah Matang", "Mentah", "Error"):
+        if counts[status]:
+            print(f"{status}: {counts[status]}")
+
+# Fungsi untuk memproses satu folder secara paralel. Worker hanya mengklasifikasi;
+# file asli ditempatkan ke folder kelas sekaligus di proses utama (tanpa re-encode).
+def process_folder(input_folder, output_folder, workers=None, chunksize=None, verbose=False, cache_folder=None, sort_mode="hardlink",
+                   morphology=PIPELINE_PARAMS["morphology"]):
+    image_paths = list_sources(input_folder)
+
+    reporter = ProgressReporter(len(image_paths))
+    worker = partial(process_image, cache_folder=cache_folder, morphology=morphology)
+    results = run_batch(worker, image_paths, workers=workers, chunksize=chunksize, reporter=reporter)
+    elapsed = reporter.finish()
+
+    with instrumentation.span("sort"):
+        assignments = [(r["path"], r["status_kematangan"]) for r in results if "error" not in r]
+        placed = sort_images(assignments, output_folder, mode=sort_mode, classes=MATURITY_CLASSES)
+
+    # Gabungkan metrik dari semua worker ke proses utama
+    for result in results:
+        instrumentation.merge(result.pop("metrics", None))
+
+    if verbose:
+        for result in results:
+            print_result(result)
+    else:
+        for result in results:
+            if "error" in result:
+                print_result(result)
+    print_summary(results, elapsed)
+    print("Penempatan file: " + ", ".join(f"{how} {n}" for how, n in sorted(placed.items())))
+    return results
+
+# Entry point command line; dipakai juga oleh cli.py (subcommand sort)
+def main(argv=None, prog=None, default_folder=DEFAULT_INPUT_FOLDER):
+    parser = argparse.ArgumentParser(prog=prog, description="Klasifikasi kematangan strawberry untuk satu folder dataset")
+    # Folder input (wajib jika tidak ada folder default) dan output
+    parser.add_argument("input_folder", nargs="?" if default_folder else None, default=default_folder,
+                        help="Folder gambar atau pack 250x300 (image_pack.py)")
+    parser.add_argument("--output", default=None, help="Folder output (default: <input>/output)")
+    parser.add_argument("--workers", type=int, default=None, help="Jumlah proses worker (default: jumlah core)")
+    parser.add_argument("--chunksize", type=int, default=None, help="Jumlah gambar per chunk yang dikirim ke worker")
+    parser.add_argument("--verbose", action="store_true", help="Tampilkan hasil per gambar")
+    parser.add_argument("--cache", default=None, help="Folder cache hasil (gambar yang sama tidak diproses ulang)")
+    parser.add_argument("--sort-mode", choices=SORT_MODES, default="hardlink",
+                        help="Cara menempatkan gambar ke folder kelas (default: hardlink, fallback salin)")
+    parser.add_argument("--morphology", choices=MORPHOLOGY_BACKENDS, default=PIPELINE_PARAMS["morphology"],
+                        help="Backend closing (lihat morphology_report.py untuk IoU/kecepatan tiap backend)")
+    parser.add_argument("--metrics", default=None, help="Tulis metrik ke file (.jsonl atau .prom untuk format Prometheus)")
+    args = parser.parse_args(argv)
 
-# Folder input dan output
-input_folder = r"D:\Materi Kuliah Debby\Project Semester 5\RoboBloom\dataset strawberry"
-output_folder = os.path.join(input_folder, "output")  # Folder output dibuat di dalam folder input
+    if args.metrics:
+        instrumentation.configure(args.metrics)
 
-if not os.path.exists(output_folder):
-    os.makedirs(output_folder)
+    output_folder = args.output or os.path.join(args.input_folder, "output")  # Folder output dibuat di dalam folder input
+    process_folder(args.input_folder, output_folder, workers=args.workers, chunksize=args.chunksize, verbose=args.verbose, cache_folder=args.cache, sort_mode=args.sort_mode,
+                   morphology=args.morphology)
 
-# Proses semua gambar di folder input
-for file_name in os.listdir(input_folder):
-    file_path = os.path.join(input_folder, file_name)
-    if os.path.isfile(file_path) and file_name.lower().endswith((".jpg", ".png", ".jpeg")):
-        process_image(file_path, output_folder)
+    print("\nSemua gambar telah diproses dan disimpan di folder output.")
 
-print("\nSemua gambar telah diproses dan disimpan di folder output.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import hashlib
+import io
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from label_manifest import file_hash, params_fingerprint
+
+# Folder default cache di disk
+CACHE_FOLDER = os.path.join(os.path.expanduser("~"), ".cache", "pcv_kematangan")
+
+# Batas default cache: jumlah hasil di memori dan total ukuran file di disk
+MEMORY_ITEMS = 256
+DISK_MAX_BYTES = 512 * 1024 * 1024
+# Total ukuran disk dihitung ulang dari folder setiap kali proses ini sudah
+# menulis 1/DISK_RESCAN_FRACTION dari batas: worker lain (pool) menulis ke folder
+# yang sama, jadi hitungan lokal saja bisa membuat folder tumbuh N x batas
+DISK_RESCAN_FRACTION = 16
+
+# Field skalar hasil pipeline yang disimpan di cache
+RESULT_FIELDS = ("maturity_persentase", "status_kematangan", "total_area", "red_area", "bbox", "yolo_label")
+
+
+# Nama subfolder shard: 2 karakter pertama key (hex)
+def _is_shard(name):
+    return len(name) == 2 and all(char in "0123456789abcdef" for char in name)
+
+
+def _optional_float(value):
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+# Cache hasil pipeline dua level dengan key = hash isi gambar + hash parameter.
+# Level 1: LRU di memori (dibatasi jumlah item). Level 2: file .npz di disk
+# (dibatasi total byte, file yang paling lama tidak dipakai dihapus lebih dulu).
+# Hasil dapat menyertakan mask perantara (opsional) untuk ditampilkan di GUI.
+class ResultCache:
+    def __init__(self, params, disk_folder=None, memory_items=MEMORY_ITEMS, disk_max_bytes=DISK_MAX_BYTES):
+        self.fingerprint = params_fingerprint(params)
+        self.disk_folder = disk_folder
+        self.memory_items = memory_items
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self._disk_bytes = 0
+        self._written_since_scan = 0
+        if disk_folder:
+            os.makedirs(disk_folder, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    # Key cache untuk file gambar. variant dipakai untuk parameter yang bisa
+    # berubah saat runtime (misalnya mode multi-objek di GUI).
+    def key_for_file(self, path, **variant):
+        return self._key(file_hash(path), variant)
+
+    # Key cache untuk buffer gambar (misalnya bytes yang diterima dari jaringan)
+    def key_for_bytes(self, data, **variant):
+        return self._key(hashlib.blake2b(data, digest_size=16).hexdigest(), variant)
+
+    # Key cache dari path + (ukuran, mtime_ns) tanpa membaca isi file; untuk
+    # lookup yang harus murah per file (misalnya thumbnail ribuan gambar)
+    def key_for_stat(self, path, stat, **variant):
+        identity = f"{os.path.abspath(path)}:{stat[0]}:{stat[1]}".encode("utf-8")
+        return self._key(hashlib.blake2b(identity, digest_size=16).hexdigest(), variant)
+
+    def _key(self, content_hash, variant):
+        if variant:
+            return f"{content_hash}-{self.fingerprint}-{params_fingerprint(variant)}"
+        return f"{content_hash}-{self.fingerprint}"
+
+    def get(self, key, with_masks=False):
+        result = self._memory.get(key)
+        if result is not None and (not with_masks or result.get("masks") is not None):
+            self._memory.move_to_end(key)
+            self.hits_memory += 1
+            return result
+
+        result = self._read_disk(key, with_masks)
+        if result is not None:
+            self.hits_disk += 1
+            self._remember(key, result)
+            return result
+
+        self.misses += 1
+        return None
+
+    def put(self, key, result, masks=None):
+        result = {field: result.get(field) for field in RESULT_FIELDS}
+        result["masks"] = masks
+        self._remember(key, result)
+        self._write_disk(key, result)
+        return result
+
+    def stats(self):
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        hits = self.hits_memory + self.hits_disk
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_items": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+        }
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key):
+        # Subfolder 2 karakter pertama agar satu folder tidak berisi terlalu banyak file
+        return os.path.join(self.disk_folder, key[:2], f"{key}.npz")
+
+    # Hanya file di subfolder shard milik cache ini (2 karakter hex); subfolder
+    # lain di folder yang sama (tabel warna, thumbnail) tidak ikut dihitung
+    # terhadap batas ukuran dan tidak pernah dihapus oleh eviction
+    def _disk_entries(self):
+        try:
+            shards = [entry.path for entry in os.scandir(self.disk_folder) if entry.is_dir() and _is_shard(entry.name)]
+        except FileNotFoundError:
+            return
+        for shard in shards:
+            try:
+                files = list(os.scandir(shard))
+            except FileNotFoundError:
+                continue
+            for entry in files:
+                if entry.name.endswith(".npz"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield entry.path, stat.st_mtime, stat.st_size
+
+    def _read_disk(self, key, with_masks):
+        if not self.disk_folder:
+            return None
+        path = self._disk_path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if with_masks and "mask_names" not in data:
+                    return None
+                result = {
+                    "maturity_persentase": float(data["maturity_persentase"]),
+                    "status_kematangan": str(data["status_kematangan"]),
+                    "total_area": _optional_float(data["total_area"]),
+                    "red_area": _optional_float(data["red_area"]),
+                    "bbox": tuple(int(v) for v in data["bbox"]) if data["bbox"].size else None,
+                    "yolo_label": str(data["yolo_label"]) or None,
+                    "masks": None,
+                }
+                if "mask_names" in data:
+                    result["masks"] = {str(name): data[f"mask_{name}"] for name in data["mask_names"]}
+        except (FileNotFoundError, OSError, ValueError, KeyError):
+            return None
+        # Tandai sebagai baru dipakai (untuk urutan eviction)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return result
+
+    def _write_disk(self, key, result):
+        if not self.disk_folder:
+            return
+        arrays = {
+            "maturity_persentase": np.float64(result["maturity_persentase"]),
+            "status_kematangan": np.str_(result["status_kematangan"]),
+            "total_area": np.float64(np.nan if result["total_area"] is None else result["total_area"]),
+            "red_area": np.float64(np.nan if result["red_area"] is None else result["red_area"]),
+            "bbox": np.array(result["bbox"] or (), dtype=np.int32),
+            "yolo_label": np.str_(result["yolo_label"] or ""),
+        }
+        if result["masks"]:
+            arrays["mask_names"] = np.array(list(result["masks"]), dtype=np.str_)
+            for name, mask in result["masks"].items():
+                arrays[f"mask_{name}"] = mask
+
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        data = buffer.getvalue()
+
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # File lama dengan key yang sama digantikan: ukurannya tidak lagi terpakai
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+        self._disk_bytes += len(data) - replaced
+        self._written_since_scan += len(data)
+        if self._written_since_scan > self.disk_max_bytes / DISK_RESCAN_FRACTION:
+            self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+            self._written_since_scan = 0
+        if self._disk_bytes > self.disk_max_bytes:
+            self._evict_disk()
+
+    # Hapus file paling lama dipakai sampai total ukuran di bawah 90% batas
+    def _evict_disk(self):
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        target = self.disk_max_bytes * 0.9
+        for path, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._disk_bytes = total
+        self._written_since_scan = 0
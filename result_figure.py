@@ -0,0 +1,47 @@
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Ukuran figure hasil analisis (inci) dan resolusi render
+FIGURE_SIZE = (12, 8)
+FIGURE_DPI = 100
+
+# Ukuran awal panel (diganti otomatis jika citra yang ditampilkan berbeda ukuran)
+PANEL_SHAPE = (300, 300)
+
+
+# Figure 2x3 panel hasil analisis yang dibuat sekali lalu dipakai ulang.
+# Figure, axes, artist imshow dan layout dibuat di __init__; render() hanya
+# mengganti data citra (set_data) dan judul, lalu menggambar ulang ke buffer Agg.
+# Memakai Figure + FigureCanvasAgg (bukan pyplot), sehingga aman dipanggil dari
+# thread latar belakang dan tidak ada figure yang terdaftar di pyplot, jadi
+# memori tetap datar walaupun analisis dijalankan ribuan kali.
+# Satu objek hanya boleh dipakai oleh satu thread (worker analisis GUI).
+class ResultFigure:
+    def __init__(self, titles, figsize=FIGURE_SIZE, dpi=FIGURE_DPI, panel_shape=PANEL_SHAPE):
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self._images = []
+        for ax, title in zip(self.figure.subplots(2, 3).ravel(), titles):
+            ax.set_title(title)
+            ax.axis("off")
+            self._images.append(ax.imshow(np.zeros(panel_shape + (3,), dtype=np.uint8)))
+        # Judul placeholder agar tight_layout menyisakan ruang untuk suptitle
+        self._suptitle = self.figure.suptitle("Kematangan", fontsize=16)
+        self.figure.tight_layout()
+
+    # images: citra per panel sesuai urutan titles; citra 2D ditampilkan dengan
+    # colormap abu-abu, citra 3 kanal diasumsikan sudah RGB. Mengembalikan array
+    # RGB uint8 (salinan, karena buffer Agg ditimpa pada render berikutnya).
+    def render(self, images, suptitle):
+        for artist, image in zip(self._images, images):
+            height, width = image.shape[:2]
+            if artist.get_array().shape[:2] != (height, width):
+                artist.set_extent((-0.5, width - 0.5, height - 0.5, -0.5))
+            artist.set_data(image)
+            if image.ndim == 2:
+                artist.set_cmap("gray")
+                artist.autoscale()
+        self._suptitle.set_text(suptitle)
+        self.canvas.draw()
+        return np.asarray(self.canvas.buffer_rgba())[:, :, :3].copy()
@@ -0,0 +1,80 @@
+import os
+
+import cv2
+import numpy as np
+
+from image_pack import load_source, source_path, source_stat
+from pipeline_cielab import format_yolo_rows
+from pipeline_graph import run_label_pipeline
+from result_cache import CACHE_FOLDER, ResultCache
+
+# Cache thumbnail + hasil label otomatis untuk browser folder (folder_browser.py).
+# Disimpan lewat ResultCache (LRU memori + .npz di disk) di folder sendiri; key
+# diambil dari path + ukuran + mtime file sehingga lookup thumbnail yang sudah
+# ada cukup os.stat, tanpa membaca seluruh isi gambar. Thumbnail disimpan
+# sebagai JPEG agar 10rb gambar tetap muat dalam puluhan MB.
+THUMBNAIL_FOLDER = os.path.join(CACHE_FOLDER, "thumbnails")
+THUMBNAIL_SIZE = 96
+THUMBNAIL_QUALITY = 85
+THUMBNAIL_MEMORY_ITEMS = 1024
+THUMBNAIL_DISK_MAX_BYTES = 256 * 1024 * 1024
+
+# Output pipeline yang dibutuhkan untuk kelas dan bbox overlay
+THUMBNAIL_OUTPUTS = ("status_kematangan", "maturity_persentase", "yolo_rows")
+
+
+# Thumbnail BGR dengan sisi terpanjang `size` piksel
+def make_thumbnail(img, size=THUMBNAIL_SIZE):
+    height, width = img.shape[:2]
+    scale = size / max(height, width)
+    thumb_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(img, thumb_size, interpolation=cv2.INTER_AREA)
+
+
+class ThumbnailCache:
+    def __init__(self, params, multi_object=False, folder=THUMBNAIL_FOLDER, size=THUMBNAIL_SIZE,
+                 memory_items=THUMBNAIL_MEMORY_ITEMS, disk_max_bytes=THUMBNAIL_DISK_MAX_BYTES):
+        self.params = params
+        self.multi_object = multi_object
+        self.size = size
+        self.cache = ResultCache(dict(params, thumbnail=size), disk_folder=folder,
+                                 memory_items=memory_items, disk_max_bytes=disk_max_bytes)
+
+    # Thumbnail (BGR) dan label otomatis satu sumber (path atau PackedImage).
+    # Gambar yang tidak dapat dibaca menghasilkan thumbnail None. Tidak
+    # thread-safe: panggil dari satu thread latar belakang saja.
+    def load(self, item):
+        key = self.cache.key_for_stat(source_path(item), source_stat(item), multi_object=self.multi_object)
+        cached = self.cache.get(key, with_masks=True)
+        if cached is not None:
+            thumbnail = cv2.imdecode(cached["masks"]["thumbnail"], cv2.IMREAD_COLOR)
+            return self._entry(cached, thumbnail)
+
+        img = load_source(item, self.params["size"])
+        if img is None:
+            return {"thumbnail": None, "status_kematangan": None, "maturity_persentase": 0.0, "yolo_label": ""}
+        stages = run_label_pipeline(img, THUMBNAIL_OUTPUTS, dict(self.params, multi_object=self.multi_object))
+        thumbnail = make_thumbnail(img, self.size)
+        _, encoded = cv2.imencode(".jpg", thumbnail, (cv2.IMWRITE_JPEG_QUALITY, THUMBNAIL_QUALITY))
+        result = self.cache.put(
+            key,
+            {
+                "maturity_persentase": stages["maturity_persentase"],
+                "status_kematangan": stages["status_kematangan"],
+                "yolo_label": "\n".join(format_yolo_rows(stages["yolo_rows"])),
+            },
+            masks={"thumbnail": np.asarray(encoded, dtype=np.uint8).ravel()},
+        )
+        return self._entry(result, thumbnail)
+
+    @staticmethod
+    def _entry(result, thumbnail):
+        return {
+            "thumbnail": thumbnail,
+            "status_kematangan": result["status_kematangan"],
+            "maturity_persentase": result["maturity_persentase"],
+            "yolo_label": result["yolo_label"] or "",
+        }
+
+    def stats(self):
+        return self.cache.stats()
@@ -0,0 +1,203 @@
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from image_loader import load_image
+from morphology import MORPHOLOGY_BACKENDS, close_halo, close_mask
+from pipeline_cielab import (
+    FRUIT_DTYPE,
+    MIN_FRUIT_AREA,
+    RED_RANGE,
+    YELLOW_RANGE,
+    classify_maturity_array,
+    color_masks,
+    detect_fruits,
+    format_yolo_labels,
+)
+
+# Mode tile untuk citra resolusi penuh (tanpa resize ke 300x300). Citra dibagi
+# menjadi tile inti yang tidak tumpang tindih; setiap tile diproses bersama
+# halo selebar 2 x radius kernel closing (lihat morphology.close_halo), sehingga
+# mask bersih di bagian inti sama persis dengan closing pada citra utuh. Connected components dihitung per
+# tile, lalu komponen yang bersambung melewati batas tile (8-terhubung) digabung
+# dengan union-find. Memori kerja per tile (LAB/mask/label) dibatasi ukuran
+# tile; yang disimpan dari setiap tile hanya statistik komponen dan label di
+# keempat tepinya. Citra BGR masukan sendiri tetap utuh di memori (decode
+# tidak per tile), jadi puncak memori tetap mengikuti resolusi gambar.
+
+TILE_SIZE = 1024
+
+
+def _tile_grid(height, width, tile_size):
+    return [
+        (y0, min(y0 + tile_size, height), x0, min(x0 + tile_size, width))
+        for y0 in range(0, height, tile_size)
+        for x0 in range(0, width, tile_size)
+    ]
+
+
+# Worker satu tile: komponen di bagian inti tile beserta statistiknya
+# (koordinat citra penuh) dan label pada baris/kolom tepi untuk penggabungan
+def _process_tile(img, tile, kernel_size, morphology, halo, red_range, yellow_range):
+    y0, y1, x0, x1 = tile
+    height, width = img.shape[:2]
+    top, left = max(0, y0 - halo), max(0, x0 - halo)
+    crop = img[top:min(height, y1 + halo), left:min(width, x1 + halo)]
+
+    mask_red, _, combined_mask = color_masks(crop, red_range=red_range, yellow_range=yellow_range)
+    cleaned_mask = close_mask(combined_mask, kernel_size, morphology)
+    core = (slice(y0 - top, y1 - top), slice(x0 - left, x1 - left))
+
+    n_labels, labels, stats, _ = cv2.connectedComponentsWithStats(cleaned_mask[core], connectivity=8)
+    red_counts = np.bincount(labels[mask_red[core] > 0], minlength=n_labels)
+    stats = stats[1:].copy()
+    stats[:, cv2.CC_STAT_LEFT] += x0
+    stats[:, cv2.CC_STAT_TOP] += y0
+    return {
+        "stats": stats,
+        "red": red_counts[1:],
+        "top": labels[0].copy(),
+        "bottom": labels[-1].copy(),
+        "left": labels[:, 0].copy(),
+        "right": labels[:, -1].copy(),
+    }
+
+
+# Pasangan komponen yang bersentuhan (8-terhubung) antara dua garis tepi yang
+# berhadapan. Label lokal dikonversi ke id global dengan offset tile.
+def _seam_pairs(edge_a, offset_a, edge_b, offset_b):
+    length = len(edge_a)
+    pairs = []
+    for shift in (-1, 0, 1):
+        lo, hi = max(0, -shift), min(length, length - shift)
+        a = edge_a[lo:hi]
+        b = edge_b[lo + shift:hi + shift]
+        touching = (a > 0) & (b > 0)
+        if touching.any():
+            pairs.append(np.stack((a[touching] - 1 + offset_a, b[touching] - 1 + offset_b), axis=1))
+    return pairs
+
+
+def _find(parent, node):
+    root = node
+    while parent[root] != root:
+        root = parent[root]
+    while parent[node] != root:
+        parent[node], node = root, parent[node]
+    return root
+
+
+# Deteksi per buah pada citra resolusi penuh. Hasilnya sama dengan
+# detect_fruits pada closing citra utuh (urutan: bbox atas ke bawah, kiri ke kanan).
+def tiled_detect_fruits(img, tile_size=TILE_SIZE, kernel_size=11, red_range=RED_RANGE, yellow_range=YELLOW_RANGE,
+                        min_area=MIN_FRUIT_AREA, matang_cutoff=80, mentah_cutoff=20, workers=None, morphology="exact"):
+    height, width = img.shape[:2]
+    halo, align = close_halo(kernel_size, morphology)
+    if tile_size % align:
+        raise ValueError(f"Ukuran tile untuk backend {morphology} harus kelipatan {align}")
+    tiles = _tile_grid(height, width, tile_size)
+    rows = -(-height // tile_size)
+    cols = -(-width // tile_size)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        results = list(executor.map(
+            lambda tile: _process_tile(img, tile, kernel_size, morphology, halo, tuple(red_range), tuple(yellow_range)),
+            tiles,
+        ))
+
+    offsets = np.cumsum([0] + [len(result["stats"]) for result in results])
+    pairs = []
+    for index, result in enumerate(results):
+        row, col = divmod(index, cols)
+        if col + 1 < cols:
+            right = results[index + 1]
+            pairs += _seam_pairs(result["right"], offsets[index], right["left"], offsets[index + 1])
+        if row + 1 < rows:
+            below = results[index + cols]
+            pairs += _seam_pairs(result["bottom"], offsets[index], below["top"], offsets[index + cols])
+            # Sudut diagonal: piksel pojok tile bersentuhan dengan pojok tile diagonal
+            if col + 1 < cols:
+                a, b = result["bottom"][-1], results[index + cols + 1]["top"][0]
+                if a and b:
+                    pairs.append(np.array([[a - 1 + offsets[index], b - 1 + offsets[index + cols + 1]]]))
+            if col > 0:
+                a, b = result["bottom"][0], results[index + cols - 1]["top"][-1]
+                if a and b:
+                    pairs.append(np.array([[a - 1 + offsets[index], b - 1 + offsets[index + cols - 1]]]))
+
+    total = int(offsets[-1])
+    parent = list(range(total))
+    if pairs:
+        for a, b in np.unique(np.concatenate(pairs), axis=0).tolist():
+            root_a, root_b = _find(parent, a), _find(parent, b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+    roots = np.array([_find(parent, node) for node in range(total)], dtype=np.int64)
+
+    if total == 0:
+        return np.zeros(0, dtype=FRUIT_DTYPE)
+    stats = np.concatenate([result["stats"] for result in results]).astype(np.int64)
+    red_counts = np.concatenate([result["red"] for result in results]).astype(np.int64)
+
+    # Gabungkan statistik per akar: luas/piksel merah dijumlah, bbox digabung
+    unique_roots, component = np.unique(roots, return_inverse=True)
+    n = len(unique_roots)
+    area = np.bincount(component, weights=stats[:, cv2.CC_STAT_AREA], minlength=n).astype(np.int64)
+    red_area = np.bincount(component, weights=red_counts, minlength=n).astype(np.int64)
+    x_min = np.full(n, width, dtype=np.int64)
+    y_min = np.full(n, height, dtype=np.int64)
+    x_max = np.zeros(n, dtype=np.int64)
+    y_max = np.zeros(n, dtype=np.int64)
+    np.minimum.at(x_min, component, stats[:, cv2.CC_STAT_LEFT])
+    np.minimum.at(y_min, component, stats[:, cv2.CC_STAT_TOP])
+    np.maximum.at(x_max, component, stats[:, cv2.CC_STAT_LEFT] + stats[:, cv2.CC_STAT_WIDTH])
+    np.maximum.at(y_max, component, stats[:, cv2.CC_STAT_TOP] + stats[:, cv2.CC_STAT_HEIGHT])
+
+    keep = area >= min_area
+    order = np.lexsort((x_min[keep], y_min[keep]))
+    fruits = np.zeros(int(keep.sum()), dtype=FRUIT_DTYPE)
+    fruits["x"] = x_min[keep][order]
+    fruits["y"] = y_min[keep][order]
+    fruits["w"] = (x_max - x_min)[keep][order]
+    fruits["h"] = (y_max - y_min)[keep][order]
+    fruits["area"] = area[keep][order]
+    fruits["red_area"] = red_area[keep][order]
+    fruits["maturity"] = fruits["red_area"] / np.maximum(fruits["area"], 1) * 100
+    fruits["kelas"] = classify_maturity_array(fruits["maturity"], matang_cutoff, mentah_cutoff)
+    return fruits
+
+
+# Referensi tanpa tile: closing dan connected components pada citra utuh
+def full_detect_fruits(img, kernel_size=11, red_range=RED_RANGE, yellow_range=YELLOW_RANGE,
+                       min_area=MIN_FRUIT_AREA, matang_cutoff=80, mentah_cutoff=20, morphology="exact"):
+    mask_red, _, combined_mask = color_masks(img, red_range=red_range, yellow_range=yellow_range)
+    cleaned_mask = close_mask(combined_mask, kernel_size, morphology)
+    fruits = detect_fruits(cleaned_mask, mask_red, min_area=min_area, matang_cutoff=matang_cutoff, mentah_cutoff=mentah_cutoff)
+    return fruits[np.lexsort((fruits["x"], fruits["y"]))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deteksi buah per tile pada citra resolusi penuh")
+    parser.add_argument("image", help="Path gambar")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE)
+    parser.add_argument("--kernel", type=int, default=11, help="Ukuran kernel closing (piksel resolusi penuh)")
+    parser.add_argument("--min-area", type=int, default=MIN_FRUIT_AREA, help="Luas minimum buah (piksel resolusi penuh)")
+    parser.add_argument("--morphology", choices=MORPHOLOGY_BACKENDS, default="exact", help="Backend closing (morphology.py)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--check", action="store_true", help="Bandingkan dengan pemrosesan citra utuh")
+    args = parser.parse_args()
+
+    img = load_image(args.image, None)
+    if img is None:
+        raise SystemExit(f"Error: Tidak dapat membaca gambar {args.image}")
+    options = {"kernel_size": args.kernel, "min_area": args.min_area, "morphology": args.morphology}
+    fruits = tiled_detect_fruits(img, tile_size=args.tile_size, workers=args.workers, **options)
+    print(f"{img.shape[1]}x{img.shape[0]}: {len(fruits)} buah")
+    print("\n".join(format_yolo_labels(img.shape, fruits)))
+
+    if args.check:
+        reference = full_detect_fruits(img, **options)
+        print("Sama dengan citra utuh" if np.array_equal(fruits, reference) else "BERBEDA dari citra utuh")
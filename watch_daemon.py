@@ -0,0 +1,337 @@
+import argparse
+import ctypes
+import ctypes.util
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+import instrumentation
+from batch_engine import IMAGE_EXTENSIONS
+from generate_label import DEFAULT_LABEL_FOLDER, PIPELINE_PARAMS, label_file_path, label_image
+from image_loader import load_image
+from image_sorter import SORT_MODES, place_file
+from label_manifest import LabelManifest, write_atomic
+from morphology import MORPHOLOGY_BACKENDS
+from pipeline_cielab import MATURITY_CLASSES, color_mask_table, format_yolo_rows
+from pipeline_graph import run_label_pipeline
+from proses_dataset_cielab import PIPELINE_PARAMS as SORT_PARAMS, classify_image
+
+# Daemon watch-folder: gambar baru di folder input langsung dilabeli
+# (generate_label) dan, jika diminta, diklasifikasi serta ditempatkan ke folder
+# kelas (proses_dataset_cielab). File baru dideteksi dengan inotify (Linux,
+# lewat ctypes) atau polling sebagai fallback, dan baru diantrikan setelah
+# selesai ditulis. Antrian dibatasi: jika penuh, watcher menunggu (event tetap
+# tertahan di kernel / terdeteksi lagi pada polling berikutnya).
+#
+# At-least-once: manifest label yang sama dengan generate_label dicatat
+# setelah label dan penempatan selesai. Saat start, semua file yang belum
+# tercatat (atau berubah) diproses ulang, jadi file yang sedang diproses saat
+# daemon mati akan dikerjakan lagi; label ditulis atomik sehingga aman diulang.
+
+QUEUE_SIZE = 256
+POLL_INTERVAL = 0.25
+
+# Konstanta inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Penanda "scan ulang seluruh folder" (antrian event kernel overflow)
+RESCAN = object()
+
+
+def _is_image(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith(".")
+
+
+# Watcher inotify: nama file yang selesai ditulis (close setelah write) atau
+# dipindahkan ke folder (rename atomik dari folder lain / file sementara)
+class InotifyWatcher:
+    def __init__(self, folder):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 gagal")
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"inotify_add_watch gagal untuk {folder}")
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                names.append(RESCAN)
+            elif mask & IN_IGNORED:
+                raise FileNotFoundError("Folder input yang diawasi hilang")
+            elif _is_image(name):
+                names.append(name)
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+# Watcher polling: file dianggap selesai ditulis jika ukuran dan mtime-nya
+# sama pada dua scan berturut-turut. File yang sudah ada saat start tidak
+# dilaporkan (ditangani scan awal daemon) kecuali berubah setelahnya.
+class PollingWatcher:
+    def __init__(self, folder, interval=POLL_INTERVAL):
+        self.folder = folder
+        self.interval = interval
+        self._last = self._scan()
+        self._emitted = dict(self._last)
+
+    def _scan(self):
+        current = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.is_file() and _is_image(entry.name):
+                    stat = entry.stat()
+                    current[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return current
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        current = self._scan()
+        ready = []
+        for name, signature in current.items():
+            if signature[0] and self._last.get(name) == signature and self._emitted.get(name) != signature:
+                self._emitted[name] = signature
+                ready.append(name)
+        self._last = current
+        self._emitted = {name: signature for name, signature in self._emitted.items() if name in current}
+        return ready
+
+    def close(self):
+        pass
+
+
+def make_watcher(folder, polling=False):
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError) as error:
+            print(f"inotify tidak tersedia ({error}), memakai polling")
+    return PollingWatcher(folder)
+
+
+class IngestDaemon:
+    def __init__(self, input_folder, label_folder, sort_folder=None, sort_mode="hardlink",
+                 workers=2, queue_size=QUEUE_SIZE, multi_object=False, polling=False, params=PIPELINE_PARAMS):
+        self.input_folder = input_folder
+        self.params = params
+        self.label_folder = label_folder
+        self.sort_folder = sort_folder
+        self.sort_mode = sort_mode
+        self.workers = workers
+        self.multi_object = multi_object
+        self.polling = polling
+        self.queue = queue.Queue(maxsize=queue_size)
+        os.makedirs(label_folder, exist_ok=True)
+        # Dengan --sort, penempatan ke folder kelas ikut menjadi bagian hasil:
+        # label yang dibuat generate_label.py di folder yang sama (fingerprint
+        # sama tanpa sort) tidak boleh membuat gambar dilewati tanpa ditempatkan
+        manifest_params = dict(params, multi_object=multi_object)
+        if sort_folder:
+            manifest_params.update(sort_folder=os.path.abspath(sort_folder), sort_mode=sort_mode)
+        self.manifest = LabelManifest(label_folder, manifest_params)
+        self._manifest_lock = threading.Lock()
+        # Nama yang sedang antri/diproses -> waktu terdeteksi (hindari duplikat).
+        # File yang ditulis ulang selama diproses ditandai dan diproses lagi.
+        self._pending = {}
+        self._rewritten = set()
+        self._pending_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _label_path(self, name):
+        return label_file_path(self.label_folder, name)
+
+    def _enqueue(self, name):
+        with self._pending_lock:
+            if name in self._pending:
+                self._rewritten.add(name)
+                return
+            self._pending[name] = time.perf_counter()
+        # Blok jika antrian penuh (backpressure ke watcher)
+        self.queue.put(name)
+
+    # File yang sudah ada saat start dan belum tercatat di manifest (atau berubah)
+    def _scan_existing(self):
+        queued = 0
+        for name in sorted(os.listdir(self.input_folder)):
+            path = os.path.join(self.input_folder, name)
+            if not _is_image(name) or not os.path.isfile(path):
+                continue
+            with self._manifest_lock:
+                changed, _, _ = self.manifest.needs_processing(name, path)
+            if changed or not os.path.exists(self._label_path(name)):
+                self._enqueue(name)
+                queued += 1
+        return queued
+
+    def _worker(self):
+        while True:
+            name = self.queue.get()
+            if name is None:
+                break
+            while True:
+                try:
+                    self._process(name)
+                except Exception as error:  # satu file rusak tidak boleh menghentikan worker
+                    print(f"Error: {name}: {error}")
+                    instrumentation.count("images_total", status="failed")
+                with self._pending_lock:
+                    if name not in self._rewritten:
+                        self._pending.pop(name, None)
+                        break
+                    self._rewritten.discard(name)
+                    self._pending[name] = time.perf_counter()
+
+    def _process(self, name):
+        path = os.path.join(self.input_folder, name)
+        with self._pending_lock:
+            detected = self._pending.get(name, time.perf_counter())
+        try:
+            with self._manifest_lock:
+                changed, stat, content_hash = self.manifest.needs_processing(name, path)
+        except FileNotFoundError:
+            return
+        label_path = self._label_path(name)
+        if not changed and os.path.exists(label_path):
+            instrumentation.count("images_total", status="skipped")
+            return
+
+        rows, ringkasan = label_image(path, multi_object=self.multi_object, params=self.params)
+        if rows is None:
+            # Mungkin belum lengkap; file akan diantrikan lagi saat ditulis ulang
+            print(f"Error: Tidak dapat membaca gambar {path}")
+            instrumentation.count("images_total", status="unreadable")
+            return
+        write_atomic(label_path, "\n".join(format_yolo_rows(rows)))
+
+        kelas = None
+        if self.sort_folder:
+            img = load_image(path, SORT_PARAMS["size"])
+            if img is not None:
+                kelas = classify_image(img, path, self.params["morphology"])["status_kematangan"]
+                self._place(path, name, kelas)
+
+        with self._manifest_lock:
+            self.manifest.record(name, path, stat, content_hash)
+        latency = time.perf_counter() - detected
+        instrumentation.count("images_total", status="processed")
+        instrumentation.observe("ingest_latency_seconds", latency, buckets=instrumentation.STAGE_BUCKETS)
+        sorted_to = f", {kelas}" if kelas else ""
+        print(f"{name}: {ringkasan}{sorted_to} ({latency * 1000:.0f} ms sejak terdeteksi)")
+
+    # Menempatkan file ke folder kelas; salinan di kelas lain (hasil
+    # klasifikasi lama dari file dengan nama sama) dihapus
+    def _place(self, path, name, kelas):
+        for other in MATURITY_CLASSES:
+            stale = os.path.join(self.sort_folder, other, name)
+            if other != kelas and os.path.lexists(stale):
+                os.unlink(stale)
+        os.makedirs(os.path.join(self.sort_folder, kelas), exist_ok=True)
+        place_file(path, os.path.join(self.sort_folder, kelas, name), self.sort_mode)
+
+    # Membangun tabel warna dan menjalankan pipeline sekali pada citra kosong
+    # sebelum file pertama (jika tidak, file pertama tertunda ~1 detik).
+    # Daemon berjalan lama, jadi tabel langsung dibangun (lihat MASK_TABLE_MIN_PIXELS).
+    def _warm_up(self):
+        color_mask_table(tuple(self.params["red_range"]), tuple(self.params["yellow_range"]))
+        width, height = self.params["size"]
+        run_label_pipeline(np.zeros((height, width, 3), dtype=np.uint8), ("yolo_rows",), self.params)
+        if self.sort_folder:
+            color_mask_table(tuple(SORT_PARAMS["red_range"]))
+            width, height = SORT_PARAMS["size"]
+            classify_image(np.zeros((height, width, 3), dtype=np.uint8), None, self.params["morphology"])
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        watcher = make_watcher(self.input_folder, self.polling)
+        threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        mode = "polling" if isinstance(watcher, PollingWatcher) else "inotify"
+        print(f"Mengawasi {self.input_folder} ({mode}, {self.workers} worker, antrian {self.queue.maxsize})")
+        try:
+            self._warm_up()
+            queued = self._scan_existing()
+            if queued:
+                print(f"{queued} file belum diproses dari sebelumnya diantrikan")
+            while not self._stop.is_set():
+                for name in watcher.wait(1.0):
+                    if name is RESCAN:
+                        self._scan_existing()
+                    else:
+                        self._enqueue(name)
+        finally:
+            watcher.close()
+            # File yang masih antri tidak ditunggu; belum tercatat di manifest,
+            # jadi akan diproses saat daemon start berikutnya
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            for _ in threads:
+                self.queue.put(None)
+            for thread in threads:
+                thread.join()
+            with self._manifest_lock:
+                self.manifest.compact()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Daemon watch-folder: label (dan klasifikasi) gambar baru secara langsung")
+    parser.add_argument("input_folder", help="Folder yang diawasi")
+    parser.add_argument("--labels", default=DEFAULT_LABEL_FOLDER,
+                        help=f"Folder output label YOLO (default: {DEFAULT_LABEL_FOLDER})")
+    parser.add_argument("--sort", default=None, help="Folder output kelas; jika diisi gambar juga diklasifikasi dan ditempatkan")
+    parser.add_argument("--sort-mode", choices=[mode for mode in SORT_MODES if mode != "manifest"], default="hardlink")
+    parser.add_argument("--workers", type=int, default=2, help="Jumlah gambar yang diproses bersamaan")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Panjang antrian maksimum")
+    parser.add_argument("--multi", action="store_true", help="Satu label per buah (connected components)")
+    parser.add_argument("--poll", action="store_true", help="Paksa polling walaupun inotify tersedia")
+    parser.add_argument("--morphology", choices=MORPHOLOGY_BACKENDS, default=PIPELINE_PARAMS["morphology"],
+                        help="Backend closing untuk label dan klasifikasi (lihat morphology_report.py)")
+    parser.add_argument("--metrics", default=None, help="Tulis metrik ke file (.jsonl atau .prom untuk format Prometheus)")
+    args = parser.parse_args()
+
+    params = dict(PIPELINE_PARAMS, morphology=args.morphology)
+
+    if args.metrics:
+        instrumentation.configure(args.metrics)
+
+    daemon = IngestDaemon(args.input_folder, args.labels, sort_folder=args.sort, sort_mode=args.sort_mode,
+                          workers=args.workers, queue_size=args.queue_size, multi_object=args.multi, polling=args.poll,
+                          params=params)
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        print("Berhenti")